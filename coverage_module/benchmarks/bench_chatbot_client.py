@@ -0,0 +1,96 @@
+"""
+Micro-benchmark: per-call overhead of ChatBot with the pooled client registry vs. a fresh OpenAI client per call.
+
+    cd coverage_module && python benchmarks/bench_chatbot_client.py [calls]
+
+在本地启动一个 OpenAI 兼容的替身服务 (立即返回固定的回复)，所以测到的几乎全是客户端自身的开销：
+创建 client、建立连接以及请求的序列化。改造之前 invoke_llm 每一轮都会新建 ChatBot 和 OpenAI client。
+"""
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.extend([".", ".."])
+from openai import OpenAI
+from core.chatbot import ChatBot, close_openai_clients
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    '''只实现 POST /v1/chat/completions，支持 keep-alive'''
+    protocol_version = 'HTTP/1.1'
+    # 关闭 Nagle，否则 header 和 body 分两次发送时会碰上 delayed ACK，每个请求多出约 40ms
+    disable_nagle_algorithm = True
+    connections = set()
+
+    def do_POST(self):
+        _StandInHandler.connections.add(self.client_address)
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        body = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "```java\n```"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fresh_client_call(api_base, prompt):
+    '''改造之前的做法：每次调用都新建 OpenAI client (新的连接池)'''
+    client = OpenAI(api_key='EMPTY', base_url=api_base)
+    response = client.chat.completions.create(
+        model='bench', messages=[{"role": "user", "content": prompt}], temperature=0, max_tokens=16)
+    return response.choices[0].message.content
+
+
+def pooled_client_call(api_base, prompt):
+    '''和 invoke_llm 一样每次新建 ChatBot，但 client 来自进程内的 registry'''
+    chat_bot = ChatBot(api_base=api_base, model='bench', api_key='EMPTY', max_tokens=16)
+    return chat_bot.chat_cache(prompt)
+
+
+def measure(func, api_base, calls):
+    _StandInHandler.connections.clear()
+    func(api_base, 'warmup')
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(api_base, f'prompt {i}')
+        timings.append(time.perf_counter() - start)
+    return timings, len(_StandInHandler.connections)
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_base = f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+    results = []
+    for name, func in (('fresh client (before)', fresh_client_call), ('pooled client', pooled_client_call)):
+        timings, connections = measure(func, api_base, calls)
+        results.append((name, timings, connections))
+    close_openai_clients()
+    server.shutdown()
+
+    print(f'{calls} calls against {api_base}')
+    print(f'{"client":<24}{"mean (ms)":>12}{"p50 (ms)":>12}{"p95 (ms)":>12}{"connections":>14}')
+    for name, timings, connections in results:
+        timings = sorted(timings)
+        print(f'{name:<24}{statistics.mean(timings) * 1000:>12.2f}{timings[len(timings) // 2] * 1000:>12.2f}'
+              f'{timings[int(len(timings) * 0.95)] * 1000:>12.2f}{connections:>14}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Micro-benchmark: streaming parse_coverage_xml vs. the previous ElementTree DOM parser.
+
+    cd coverage_module && python benchmarks/bench_parse_coverage_xml.py [report.xml[.gz]]
+
+默认使用 benchmarks/data/jacoco_sample.xml.gz (由 make_sample_report.py 生成)。
+"""
+import gc
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+import xml.etree.ElementTree as ET
+
+sys.path.extend([".", ".."])
+from utils._analyze_jacoco_output import parse_coverage_xml, parse_method_desc
+
+SAMPLE_REPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jacoco_sample.xml.gz')
+
+
+def parse_coverage_xml_dom(coverage_report):
+    '''改造之前的实现：整棵 DOM 读入内存，每个方法都重新解析描述符'''
+    root = ET.parse(coverage_report).getroot()
+    coverage_data = defaultdict()
+    for package in root.findall(".//package"):
+        package_name = package.attrib["name"].replace('/', '.')
+        coverage_data[package_name] = defaultdict()
+        for sourcefile in package.findall(".//sourcefile"):
+            sourcefile_name = sourcefile.attrib["name"]
+            if sourcefile.findall(".//line"):
+                entry = coverage_data[package_name][sourcefile_name] = {"line": defaultdict(), "branch": defaultdict()}
+                coverage_line = []
+                total_line = []
+                for line in sourcefile.findall(".//line"):
+                    nr = int(line.attrib["nr"])
+                    ci = int(line.attrib["ci"])
+                    mb = int(line.attrib["mb"])
+                    cb = int(line.attrib["cb"])
+                    if ci > 0:
+                        coverage_line.append(nr)
+                    total_line.append(nr)
+                    if mb > 0 or cb > 0:
+                        entry["branch"][nr] = {"total": mb + cb, "covered": cb}
+                entry["line"]['coverage_line'] = coverage_line
+                entry["line"]['total_line'] = total_line
+        for clazz in package.findall(".//class"):
+            clazz_name = clazz.attrib["name"]
+            if clazz.findall(".//method"):
+                coverage_data[package_name][clazz_name] = defaultdict()
+                for method in clazz.findall(".//method"):
+                    method_name = method.attrib["name"]
+                    parameter_tuple = parse_method_desc(method.attrib["desc"])
+                    methods = coverage_data[package_name][clazz_name].setdefault(method_name, defaultdict())
+                    methods[parameter_tuple] = defaultdict()
+                    line_counter = method.find('.//counter[@type="LINE"]')
+                    branch_counter = method.find('.//counter[@type="BRANCH"]')
+                    methods[parameter_tuple]["line_coverage"] = line_counter.attrib if line_counter is not None else None
+                    methods[parameter_tuple]["branch_coverage"] = branch_counter.attrib if branch_counter is not None else None
+    return coverage_data
+
+
+def _plain(value):
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def measure(func, *args, repeat=3, **kwargs):
+    '''时间取 repeat 次中的最小值；内存峰值单独用 tracemalloc 再跑一次，避免 tracemalloc 的开销影响计时'''
+    elapsed = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = min(elapsed, time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    report = sys.argv[1] if len(sys.argv) > 1 else SAMPLE_REPORT
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if report.endswith('.gz'):
+            xml_path = os.path.join(tmp_dir, 'jacoco.xml')
+            with gzip.open(report, 'rb') as src, open(xml_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            xml_path = report
+        print(f'report: {report} ({os.path.getsize(xml_path) / 1024 / 1024:.1f} MB)')
+
+        dom_result, dom_time, dom_peak = measure(parse_coverage_xml_dom, xml_path)
+        stream_result, stream_time, stream_peak = measure(parse_coverage_xml, xml_path)
+        assert _plain(dom_result) == _plain(stream_result), 'streaming parser output differs from the DOM parser'
+
+        one_package = sorted(stream_result.keys())[0]
+        _, filtered_time, filtered_peak = measure(parse_coverage_xml, xml_path, packages=[one_package])
+
+    print(f'{"parser":<28}{"time (s)":>10}{"peak (MB)":>12}')
+    print(f'{"DOM (before)":<28}{dom_time:>10.3f}{dom_peak / 1024 / 1024:>12.1f}')
+    print(f'{"iterparse":<28}{stream_time:>10.3f}{stream_peak / 1024 / 1024:>12.1f}')
+    print(f'{"iterparse, 1 package":<28}{filtered_time:>10.3f}{filtered_peak / 1024 / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: wall-clock and CPU time of get_packages on a generated source tree.
+
+    cd coverage_module && python benchmarks/bench_static_analysis.py [packages] [classes per package] [repeat] [analysis workers]
+
+分三种情况测量：关闭分析缓存 (每次都完整解析)、缓存为空 (解析并写入缓存) 以及缓存命中。
+analysis workers 大于 1 时，另外测量用进程池提取单个文件时关闭缓存的情况。
+样例项目由 make_sample_project 生成，缓存写到临时目录，不影响 data/analysis_cache。
+最后单独比较源码解码：之前对每个文件完整运行 chardet，现在先尝试 utf-8 和配置的编码 (样例转成 GBK 后测量后两种情况)。
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import chardet
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG
+from utils._encoding import _DETECTED_ENCODINGS, decode_java_source
+from utils.preprocess_project import find_java_files, get_packages
+from benchmarks.make_sample_project import make_sample_project
+
+
+def measure(project_path, repeat, before_each=None, workers=1):
+    wall, cpu = [], []
+    for _ in range(repeat):
+        if before_each is not None:
+            before_each()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        all_packages, method_map, class_map = get_packages(project_path, 'src/main/java', workers)
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+    return statistics.median(wall), statistics.median(cpu), len(method_map)
+
+
+def chardet_decode(raw_data, encoding=None):
+    '''改造之前 get_packages 的做法'''
+    return raw_data.decode(chardet.detect(raw_data)['encoding'])
+
+
+def measure_decoding(raw_datas, decode, encoding=None):
+    _DETECTED_ENCODINGS.clear()
+    start = time.process_time()
+    for raw_data in raw_datas:
+        decode(raw_data, encoding)
+    return time.process_time() - start
+
+
+def main():
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    classes_per_package = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        project_path = os.path.join(work_dir, 'project')
+        make_sample_project(project_path, packages, classes_per_package)
+        cache_dir = os.path.join(work_dir, 'analysis_cache')
+
+        def clear_cache():
+            for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+                os.remove(os.path.join(cache_dir, name))
+
+        results = []
+        CONFIG['analysis_cache'] = False
+        results.append(('no cache',) + measure(project_path, repeat))
+        if workers > 1:
+            results.append((f'{workers} workers',) + measure(project_path, repeat, workers=workers))
+        CONFIG['analysis_cache'] = True
+        CONFIG['analysis_cache_dir'] = cache_dir
+        results.append(('cache miss',) + measure(project_path, repeat, clear_cache))
+        results.append(('cache hit',) + measure(project_path, repeat))
+
+        utf8_files = []
+        for java_path in sorted(find_java_files(project_path)):
+            with open(java_path, 'rb') as f:
+                utf8_files.append(f.read())
+        gbk_files = [i.decode('utf-8').encode('gbk') for i in utf8_files]
+        decoding = [
+            ('utf-8', utf8_files, None),
+            ('gbk, configured', gbk_files, 'gbk'),
+            ('gbk, detected', gbk_files, None),
+        ]
+        decoding = [(name, measure_decoding(files, chardet_decode), measure_decoding(files, decode_java_source, encoding))
+                    for name, files, encoding in decoding]
+
+    print(f'{packages * (classes_per_package + 1)} files, median of {repeat} runs')
+    print(f'{"analysis":<14}{"wall (s)":>12}{"cpu (s)":>12}{"methods":>10}')
+    for name, wall, cpu, methods in results:
+        print(f'{name:<14}{wall:>12.2f}{cpu:>12.2f}{methods:>10}')
+    print()
+    print(f'{"decoding":<18}{"chardet (s)":>14}{"now (s)":>12}')
+    for name, before, after in decoding:
+        print(f'{name:<18}{before:>14.3f}{after:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Generate a synthetic maven source tree for the static analysis benchmarks.
+
+    cd coverage_module && python benchmarks/make_sample_project.py <output dir> [packages] [classes per package]
+
+生成的代码覆盖 get_packages 关心的各种结构：显式 import 和通配符 import、继承和接口、内部类、
+构造函数、字段、局部变量、链式调用以及分支条件中的调用；固定随机种子，每次生成的内容相同。
+"""
+import os
+import random
+import sys
+
+
+def _class_source(package, name, rng, all_classes, interfaces):
+    other = [i for i in all_classes if i != (package, name)]
+    imported = rng.sample(other, min(3, len(other)))
+    wildcard = rng.choice(other)[0]
+    lines = [f'package {package};', '']
+    for imported_package, imported_name in imported:
+        if imported_package != package:
+            lines.append(f'import {imported_package}.{imported_name};')
+    if wildcard != package:
+        lines.append(f'import {wildcard}.*;')
+    lines += ['import java.util.List;', 'import java.util.ArrayList;', '']
+
+    parent = rng.choice(imported)
+    interface = rng.choice(interfaces)
+    lines.append(f'/** Sample class {name}, 中文注释 ü. */')
+    if parent[0] == package or parent in imported:
+        lines.append(f'public class {name} extends {parent[1]} implements {interface[1]} {{')
+    else:
+        lines.append(f'public class {name} implements {interface[1]} {{')
+    field_type = imported[0][1]
+    lines += [
+        f'    private {field_type} delegate = new {field_type}();',
+        '    private int counter;',
+        '    private List<String> names = new ArrayList<>();',
+        '    private double[] weights;',
+        '',
+        f'    public {name}() {{',
+        '        this.counter = 0;',
+        '    }',
+        '',
+        f'    public {name}(int counter, String label) {{',
+        '        this.counter = counter;',
+        '        names.add(label);',
+        '    }',
+    ]
+    for index in range(rng.randint(4, 9)):
+        callee = rng.choice(imported)[1]
+        lines += [
+            '',
+            f'    public int compute{index}(int value, {callee} other) {{',
+            f'        {callee} local = new {callee}();',
+            f'        int result = local.compute{rng.randint(0, 3)}(value + counter, other);',
+            f'        if (delegate.compute{rng.randint(0, 3)}(result, other) > {rng.randint(0, 100)}) {{',
+            '            result += value * 2;',
+            '        } else {',
+            f'            result -= helper{index}(result).length();',
+            '        }',
+            '        for (int i = 0; i < value; i++) {',
+            '            counter += i;',
+            '        }',
+            '        return result;',
+            '    }',
+            '',
+            f'    private String helper{index}(int value) {{',
+            '        String text = String.valueOf(value);',
+            '        while (text.length() < 3) {',
+            '            text = "0" + text;',
+            '        }',
+            '        return text.trim();',
+            '    }',
+        ]
+    lines += [
+        '',
+        '    @Override',
+        '    public String describe(String prefix) {',
+        '        return prefix + names.size();',
+        '    }',
+        '',
+        '    public static class Builder {',
+        '        private int counter;',
+        '',
+        '        public Builder counter(int counter) {',
+        '            this.counter = counter;',
+        '            return this;',
+        '        }',
+        '',
+        f'        public {name} build() {{',
+        f'            return new {name}(counter, "built");',
+        '        }',
+        '    }',
+        '}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def make_sample_project(output_dir, packages=40, classes_per_package=25, seed=0):
+    rng = random.Random(seed)
+    src_root = os.path.join(output_dir, 'src', 'main', 'java')
+    package_names = [f'org.sample.module{i}' for i in range(packages)]
+    all_classes = [(package, f'Sample{i}Class{j}') for i, package in enumerate(package_names) for j in range(classes_per_package)]
+    interfaces = [(package, f'Describable{i}') for i, package in enumerate(package_names)]
+
+    for package, name in interfaces:
+        package_dir = os.path.join(src_root, *package.split('.'))
+        os.makedirs(package_dir, exist_ok=True)
+        with open(os.path.join(package_dir, f'{name}.java'), 'w', encoding='utf-8') as f:
+            f.write(f'package {package};\n\npublic interface {name} {{\n    String describe(String prefix);\n}}\n')
+    # 所有类都实现同一个包里的接口，避免跨包引用接口时缺少 import
+    for package, name in all_classes:
+        package_dir = os.path.join(src_root, *package.split('.'))
+        interface = [i for i in interfaces if i[0] == package]
+        with open(os.path.join(package_dir, f'{name}.java'), 'w', encoding='utf-8') as f:
+            f.write(_class_source(package, name, rng, all_classes, interface))
+    return src_root
+
+
+if __name__ == '__main__':
+    output_dir = sys.argv[1]
+    packages = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    classes_per_package = int(sys.argv[3]) if len(sys.argv) > 3 else 25
+    src_root = make_sample_project(output_dir, packages, classes_per_package)
+    print(f'generated {packages * (classes_per_package + 1)} files under {src_root}')
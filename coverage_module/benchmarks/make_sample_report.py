@@ -0,0 +1,80 @@
+"""
+Generate the synthetic JaCoCo XML report used by the coverage parser benchmark.
+
+报告的规模参照 jfreechart (约 40 个包、600+ 个类、10 万行左右)，内容由固定的随机种子生成，
+生成结果以 gzip 的形式保存在 benchmarks/data/jacoco_sample.xml.gz。
+
+    python benchmarks/make_sample_report.py
+"""
+import gzip
+import os
+import random
+
+PACKAGE_COUNT = 40
+FILES_PER_PACKAGE = 16
+METHODS_PER_CLASS = 18
+LINES_PER_METHOD = 8
+PARAM_TYPES = ['I', 'J', 'Z', 'D', 'Ljava/lang/String;', 'Ljava/util/List;', '[I', '[Ljava/lang/Object;', 'Lorg/jfree/data/Range;']
+
+OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jacoco_sample.xml.gz')
+
+
+def _counter(out, counter_type, missed, covered, indent):
+    if missed + covered > 0:
+        out.append(f'{indent}<counter type="{counter_type}" missed="{missed}" covered="{covered}"/>')
+
+
+def generate(rng):
+    out = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+           '<!DOCTYPE report PUBLIC "-//JACOCO//DTD Report 1.1//EN" "report.dtd">',
+           '<report name="sample">',
+           '<sessioninfo id="sample" start="0" dump="0"/>']
+    for p in range(PACKAGE_COUNT):
+        package_name = f'org/jfree/sample/pkg{p}'
+        out.append(f'<package name="{package_name}">')
+        sourcefiles = []
+        for f in range(FILES_PER_PACKAGE):
+            class_names = [f'Class{f}'] + ([f'Class{f}$Inner'] if f % 3 == 0 else [])
+            lines = []
+            line_nr = 20
+            for class_name in class_names:
+                out.append(f'  <class name="{package_name}/{class_name}" sourcefilename="Class{f}.java">')
+                for m in range(METHODS_PER_CLASS):
+                    params = ''.join(rng.choice(PARAM_TYPES) for _ in range(rng.randint(0, 4)))
+                    method_lines = []
+                    for _ in range(LINES_PER_METHOD):
+                        covered = rng.random() < 0.4
+                        branches = rng.choice([0, 0, 0, 2, 4])
+                        covered_branches = rng.randint(0, branches) if covered else 0
+                        instructions = rng.randint(1, 12)
+                        method_lines.append((line_nr, 0 if covered else instructions, instructions if covered else 0, branches - covered_branches, covered_branches))
+                        line_nr += rng.randint(1, 3)
+                    lines.extend(method_lines)
+                    line_missed = sum(1 for i in method_lines if i[2] == 0)
+                    out.append(f'    <method name="method{m}" desc="({params})V" line="{method_lines[0][0]}">')
+                    _counter(out, 'INSTRUCTION', sum(i[1] for i in method_lines), sum(i[2] for i in method_lines), '      ')
+                    _counter(out, 'BRANCH', sum(i[3] for i in method_lines), sum(i[4] for i in method_lines), '      ')
+                    _counter(out, 'LINE', line_missed, len(method_lines) - line_missed, '      ')
+                    _counter(out, 'METHOD', 1 if line_missed == len(method_lines) else 0, 0 if line_missed == len(method_lines) else 1, '      ')
+                    out.append('    </method>')
+                _counter(out, 'CLASS', 0, 1, '    ')
+                out.append('  </class>')
+            sourcefiles.append((f'Class{f}.java', lines))
+        for name, lines in sourcefiles:
+            out.append(f'  <sourcefile name="{name}">')
+            for nr, mi, ci, mb, cb in lines:
+                out.append(f'    <line nr="{nr}" mi="{mi}" ci="{ci}" mb="{mb}" cb="{cb}"/>')
+            _counter(out, 'LINE', sum(1 for i in lines if i[2] == 0), sum(1 for i in lines if i[2] > 0), '    ')
+            out.append('  </sourcefile>')
+        out.append('</package>')
+    out.append('</report>')
+    return '\n'.join(out) + '\n'
+
+
+if __name__ == '__main__':
+    content = generate(random.Random(20240929))
+    os.makedirs(os.path.dirname(OUTPUT), exist_ok=True)
+    # mtime=0 保证重复生成的文件完全一致
+    with open(OUTPUT, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+        f.write(content.encode('utf-8'))
+    print(f'{OUTPUT}: {len(content) / 1024 / 1024:.1f} MB uncompressed, {os.path.getsize(OUTPUT) / 1024 / 1024:.1f} MB gzipped')
@@ -5,7 +5,7 @@ from data.Config import CONFIG
 from utils._data_preparation import load_focal_method, load_packages
 from utils._run_mvn_test import run_mvn_test
 from utils._write_test_class import clear_test_class, write_test_class
-from utils._coverage_utils import analyze_method_signature_for_coverage
+from utils._coverage_utils import method_coverage_index, parse_method_signature
 from utils._analyze_jacoco_output import parse_coverage_xml
 
 
@@ -21,7 +21,8 @@ def get_all_test_use_json(project_data):
     all_uts = []
     cnt = 1
     for data in project_data:
-        if data["compiled"]:
+        # 执行超时的测试放进整个测试集里同样会卡住，跳过
+        if data["compiled"] and data.get("res") != 'Timeout':
             class_name = data['test_class_sig'].split('.')[-1]
             new_class_name = class_name[0].upper() + class_name[1:]
             all_uts.append({
@@ -38,18 +39,9 @@ def setup_single_project(date, project_name):
     return all_uts
 
 
-def get_covage_info(total_coverage_info, method_signature):
-    (package_name, package_dir, class_name, clazz_dir, method_name, parameter_tuple) = analyze_method_signature_for_coverage(method_signature)
-    data = total_coverage_info.get(package_name)
-    if data is None:
-        return None
-    data = data.get(clazz_dir)
-    if data is None:
-        return None
-    data = data.get(method_name)
-    if data is None:
-        return None
-    data = data.get(tuple(parameter_tuple))
+def get_covage_info(coverage_index, method_signature):
+    '''coverage_index: method_coverage_index(coverage_info) 的结果'''
+    data = coverage_index.get(parse_method_signature(method_signature).coverage_key)
     if data is None:
         return None
     result = {
@@ -83,13 +75,16 @@ def set_up_coveragee_info(result, focal_method, coverage_info, mark):
         }
 
 def collect_coverage_info(all_packages, project_name, coverage_info, coverage_result, mode):
+    if coverage_info is None:
+        logger.warning(f"No {mode} coverage for {project_name}, every focal method is recorded as uncovered")
+    coverage_index = method_coverage_index(coverage_info)
     for package in all_packages:
         if package not in coverage_result:
             coverage_result[package] = {}
         focal_method_sigs = load_focal_method(project_name, package)
         # focal_method_sigs = [('org.llm#NonGenericClass#createContainer(java.lang#String)', '')]
         for focal_method_sig, _ in focal_method_sigs:
-            single_coverage_info = get_covage_info(coverage_info, focal_method_sig)
+            single_coverage_info = get_covage_info(coverage_index, focal_method_sig)
             set_up_coveragee_info(coverage_result[package], focal_method_sig, single_coverage_info, mode)
     return coverage_result
 
@@ -104,7 +99,7 @@ def run(project_name, llm_generate_case):
     # 先跑一下现有结果
     exist_result = run_mvn_test((project_root, None, None))
     
-    coverage_info = get_coverage_info(exist_result)
+    coverage_info = get_coverage_info(exist_result, set(all_packages))
     
     coverage_result = collect_coverage_info(all_packages, project_name, coverage_info, coverage_result, 'existing')
     
@@ -117,7 +112,7 @@ def run(project_name, llm_generate_case):
     # for case in llm_generate_case:
     #     clear_test_class(project_root, test_root_dir, case['test_class_sig'])
     
-    coverage_info = get_coverage_info(llm_result)
+    coverage_info = get_coverage_info(llm_result, set(all_packages))
     
     coverage_result = collect_coverage_info(all_packages, project_name, coverage_info, coverage_result, 'llm')
     
@@ -148,13 +143,14 @@ def run(project_name, llm_generate_case):
     
     return line_improve, branch_improve, existing_line_rate, existing_branch_rate, llm_line_rate, llm_branch_rate
 
-def get_coverage_info(result):
+def get_coverage_info(result, packages=None):
+    # 只统计 focal method 所在的包
     if result['result'] == 'Passed':
-        coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'))
-    elif result['result'] == 'Failed Compilation':
+        coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'), packages=packages)
+    elif result['result'] == 'Failed Compilation' or result['result'] == 'Timeout':
         coverage_info = None
     elif result['result'] == 'Failed Execution':
-        coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'))
+        coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'), packages=packages)
     else:
         coverage_info = None
         raise NotImplementedError("Unknown result. Please check.")
@@ -11,6 +11,7 @@ class File(Item):
         self.methods = set()
         self.import_map = {}
         self.belong_package = package
+        self.parsed_file = None # 调用分析时复用的 ParsedFile (tree-sitter 解析结果)
         # self.package_path = 'package_path'
         
     
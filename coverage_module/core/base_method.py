@@ -1,9 +1,15 @@
 from collections import defaultdict
 import copy
 from .base_item import Item
+from .line_bitmap import LineSet, lines_to_bits, span_to_bits
 
 
 class Method(Item):
+    # 行号集合都以 bitset 保存 (line_bits / covered_bits / llm_bits)，这几个属性读出来是 frozenset
+    line_range = LineSet('line_bits')
+    covered_lines = LineSet('covered_bits')
+    newly_covered_by_llm = LineSet('llm_bits')
+
     def __init__(self, name_no_package, name, belong_package, belong_class, parameters_list, content, return_type, node):
         self.name_no_package = name_no_package
         self.name = name
@@ -16,7 +22,7 @@ class Method(Item):
         self.signature = ''
         
         self.content = content
-        self.line_range = set()
+        self.line_bits = 0
         self.return_type = return_type
         self.return_class = None
         self.node = node # tree-sitter node
@@ -24,8 +30,6 @@ class Method(Item):
         self.called_method_name = set()
         self.called_methods = set()
         self.callee_methods = set()
-        self.called_chains = []
-        self.callee_chains = []
         self.branch_related_called_methods_name = set()
         self.branch_related_called_methods = set()
         
@@ -34,7 +38,7 @@ class Method(Item):
         
         self.import_map = {}
         
-        self.used_callee_chains = list()
+        self.used_callee_chains = set() # 用过的调用链的 chain_id
         self.using_callee_chains = list()
         
         self.is_target = False
@@ -44,9 +48,9 @@ class Method(Item):
         #测试
         self.test_head = None
         self.new_programs = list()
-        self.covered_lines = set()
+        self.covered_bits = 0
         
-        self.newly_covered_by_llm = set()
+        self.llm_bits = 0
         self.line_number = set()
         
         self.covered_tests = set()
@@ -78,12 +82,6 @@ class Method(Item):
     def add_callee_method(self, method):
         self.callee_methods.add(method)
         
-    def add_called_chain(self, chain):
-        self.called_chains.append(chain)
-    
-    def add_callee_chain(self, chain):
-        self.callee_chains.append(chain)
-    
     def add_branch_related_called_method_name(self, signature):
         self.branch_related_called_methods_name.add(signature)
         
@@ -100,17 +98,28 @@ class Method(Item):
         self.new_programs.append(new_program)
     
     def add_variable_map(self, variable_map):
-        self.variable_map = copy.deepcopy(variable_map)
+        # 变量名 -> 类型名，值都是字符串，浅拷贝即可
+        self.variable_map = dict(variable_map)
             
             
     def get_covered_lines(self):
         return self.covered_lines
     
     def add_covered_lines(self, new_line):
-        self.covered_lines = self.covered_lines.union(new_line)
+        self.covered_bits |= lines_to_bits(new_line)
         
     def add_covered_by_llm(self, new_line):
-        self.newly_covered_by_llm = self.newly_covered_by_llm.union(new_line)
+        self.llm_bits |= lines_to_bits(new_line)
+    
+    def set_line_span(self, first_line, last_line):
+        self.line_bits = span_to_bits(first_line, last_line)
+        self.line_number = set(str(i) for i in range(first_line, last_line + 1))
+    
+    def line_count(self):
+        return self.line_bits.bit_count()
+    
+    def covered_count(self):
+        return self.covered_bits.bit_count()
     
     def set_method_signature(self):
         help_parameters_list = []
@@ -179,5 +188,6 @@ class Class(Item):
         self.father_class_name = father_class_name
         
     def add_variable_map(self, variable_map):
-        self.variable_map = copy.deepcopy(variable_map)
+        # 变量名 -> 类型名，值都是字符串，浅拷贝即可
+        self.variable_map = dict(variable_map)
 
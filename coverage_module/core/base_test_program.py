@@ -1,4 +1,5 @@
 from .base_item import Item
+from .line_bitmap import lines_to_bits
     
     
 class TestProgram(Item):
@@ -12,7 +13,7 @@ class TestProgram(Item):
         self.total_time = total_time
         
         self.coverage = coverage if coverage is not None else dict()
-        
+        self._line_bits = {} # (包名, 源文件名, coverage_line / total_line) -> bitset
         
         self.single_func_cov_rate = 0
         self.single_func_cov_lines = set()
@@ -33,6 +34,35 @@ class TestProgram(Item):
     
     def set_coverage(self, coverage: set):
         self.coverage = coverage
+        self._line_bits = {}
+    
+    def covered_line_bits(self, package_name, sourcefile_name):
+        """
+        这个测试在某个源文件上覆盖的行 (coverage_line) 对应的 bitset；覆盖率中没有这个文件时返回 None。
+        每个文件只转换一次。
+        """
+        return self._file_line_bits(package_name, sourcefile_name, 'coverage_line')
+    
+    def total_line_bits(self, package_name, sourcefile_name):
+        '''jacoco 统计到的全部行 (total_line) 对应的 bitset'''
+        return self._file_line_bits(package_name, sourcefile_name, 'total_line')
+    
+    def _file_line_bits(self, package_name, sourcefile_name, field):
+        key = (package_name, sourcefile_name, field)
+        if key in self._line_bits:
+            return self._line_bits[key]
+        bits = None
+        covered_all = self.coverage.get(package_name)
+        if covered_all:
+            covered_all = covered_all.get(sourcefile_name)
+        if covered_all:
+            if 'line' in covered_all.keys():
+                covered_all = covered_all.get('line')
+            # 和之前一样，没有 coverage_line 时整个文件当作不在覆盖率中
+            if covered_all.get('coverage_line') is not None:
+                bits = lines_to_bits(covered_all.get(field) or ())
+        self._line_bits[key] = bits
+        return bits
     
     def set_single_func_cov_rate(self, single_func_cov_rate):
         self.single_func_cov_rate = single_func_cov_rate
@@ -1,5 +1,57 @@
+import random
+import threading
+import time
+
+import httpx
 from loguru import logger
-from openai import OpenAI
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 进程内共享的 OpenAI client，按 (api_base, api_key) 复用连接池，避免每一轮都重新建立连接和 TLS 握手
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# 这些错误重试之后可能成功，其余错误 (参数错误、鉴权失败等) 直接抛出
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+def get_openai_client(api_base, api_key, timeout=120.0, connect_timeout=10.0, max_connections=32):
+    """
+    Return the process-wide OpenAI client for (api_base, api_key), creating it on first use.
+
+    底层的 httpx.Client 开启 keep-alive 连接池，安装了 h2 时使用 HTTP/2。
+    重试由 ChatBot 自己完成 (带抖动的指数退避)，所以 client 的 max_retries 为 0。
+    """
+    key = (api_base, api_key)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=60),
+            )
+            client = _CLIENTS[key] = OpenAI(api_key=api_key, base_url=api_base, http_client=http_client, max_retries=0)
+            logger.info(f"OpenAI client initialized with base_url={api_base}, http2={HTTP2_AVAILABLE}")
+        return client
+
+
+def close_openai_clients():
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    '''full jitter：在 [0, min(cap, base * 2^attempt)] 中均匀取值，避免多个 worker 同时重试'''
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
 
 class ChatBot:
     def __init__(
@@ -8,8 +60,14 @@ class ChatBot:
         model: str = "Qwen/Qwen3-Next-80B-A3B-Instruct",
         api_key: str = "EMPTY",         
         temperature: float = 0,
-        max_tokens: int = 4096
+        max_tokens: int = 4096,
+        cache=None,
+        timeout: float = 120.0,
+        max_retries: int = 4
     ):
+        # cache: 持久化的回复缓存 (utils._llm_cache.LLMCache)，None 时不缓存
+        self.cache = cache
+        self.max_retries = max_retries
         self.history = []
         self.model = model
         self.max_context = 10
@@ -20,15 +78,27 @@ class ChatBot:
             "If you provide code in your response, the code you write should be in format ```java <code> ```"
         )
         try:
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=api_base
-            )
-            logger.info(f"OpenAI client initialized with base_url={api_base}, model={model}")
+            self.client = get_openai_client(api_base, api_key, timeout=timeout)
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             raise
 
+    def _create_completion(self, prompts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=prompts,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"Chat completion failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
     def chat(self, prompt, add_to_history):
         logger.info("Chat API call started")
         prompts = [{"role": "system", "content": self.system_prompt}]
@@ -40,12 +110,7 @@ class ChatBot:
         prompts.append({"role": "user", "content": prompt})
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=prompts,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-            )
+            response = self._create_completion(prompts)
             res = response.choices[0].message.content
             logger.info("Chat API call finished")
         except Exception as e:
@@ -69,18 +134,23 @@ class ChatBot:
         if stage2_prompt:
             prompts.append({"role": "user", "content": stage2_prompt})
 
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model, self.temperature, self.max_tokens, prompts)
+            res = self.cache.get(cache_key)
+            if res is not None:
+                logger.info("Chat cache API call hit the response cache")
+                return res
+
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=prompts,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-            )
+            response = self._create_completion(prompts)
             res = response.choices[0].message.content
             logger.info("Chat cache API call finished")
         except Exception as e:
             logger.error(f"Error during chat_cache completion: {e}")
             raise
+        if cache_key is not None and res is not None:
+            self.cache.put(cache_key, self.model, res)
         return res
 
 
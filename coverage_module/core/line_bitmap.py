@@ -0,0 +1,58 @@
+"""
+行号集合的位图表示：用 Python int 做 bitset，第 i 位为 1 表示第 i 行。
+
+交、并和计数分别是 &、| 和 int.bit_count()，一个源文件的覆盖率只需要转换一次，
+之后和文件中每个方法的行范围做一次 & 即可。
+"""
+
+
+def lines_to_bits(lines):
+    '''行号的可迭代对象 (set / list / range) -> bitset'''
+    if isinstance(lines, int):
+        return lines
+    if isinstance(lines, range) and lines.step == 1:
+        return span_to_bits(lines.start, lines.stop - 1)
+    bits = 0
+    for line in lines:
+        bits |= 1 << line
+    return bits
+
+
+def span_to_bits(first_line, last_line):
+    '''[first_line, last_line] 这些行对应的 bitset'''
+    if last_line < first_line:
+        return 0
+    return ((1 << (last_line - first_line + 1)) - 1) << first_line
+
+
+def bits_to_lines(bits):
+    '''bitset -> 行号的 frozenset'''
+    # bin(bits) 是 '0b...'，倒过来之后第 i 个字符对应第 i 行
+    return frozenset(i for i, bit in enumerate(bin(bits)[:1:-1]) if bit == '1')
+
+
+class LineSet:
+    """
+    把 bitset 属性包装成行号集合的描述符。
+
+    读取时返回 frozenset (按 bitset 缓存，bitset 不变时不会重新生成)，赋值时接受行号的可迭代对象或者 bitset。
+    需要修改时用 bitset 属性 (例如 Method.covered_bits) 或者对应的 add_xxx 方法。
+    """
+    def __init__(self, bits_attr):
+        self.bits_attr = bits_attr
+
+    def __set_name__(self, owner, name):
+        self.view_attr = f'_{name}_view'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        bits = instance.__dict__.get(self.bits_attr, 0)
+        view = instance.__dict__.get(self.view_attr)
+        if view is None or view[0] != bits:
+            view = (bits, bits_to_lines(bits))
+            instance.__dict__[self.view_attr] = view
+        return view[1]
+
+    def __set__(self, instance, lines):
+        instance.__dict__[self.bits_attr] = lines_to_bits(lines)
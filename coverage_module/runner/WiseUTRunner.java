@@ -0,0 +1,688 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.io.PrintWriter;
+import java.io.StringWriter;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+import java.util.Set;
+
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+import org.jacoco.core.analysis.Analyzer;
+import org.jacoco.core.analysis.CoverageBuilder;
+import org.jacoco.core.analysis.IBundleCoverage;
+import org.jacoco.core.analysis.IClassCoverage;
+import org.jacoco.core.analysis.ICounter;
+import org.jacoco.core.analysis.ILine;
+import org.jacoco.core.analysis.IMethodCoverage;
+import org.jacoco.core.analysis.IPackageCoverage;
+import org.jacoco.core.analysis.ISourceFileCoverage;
+import org.jacoco.core.data.ExecutionData;
+import org.jacoco.core.data.ExecutionDataReader;
+import org.jacoco.core.data.ExecutionDataStore;
+import org.jacoco.core.data.SessionInfoStore;
+import org.junit.platform.engine.TestExecutionResult;
+import org.junit.platform.engine.TestSource;
+import org.junit.platform.engine.DiscoverySelector;
+import org.junit.platform.engine.discovery.DiscoverySelectors;
+import org.junit.platform.engine.support.descriptor.ClassSource;
+import org.junit.platform.engine.support.descriptor.MethodSource;
+import org.junit.platform.launcher.Launcher;
+import org.junit.platform.launcher.LauncherDiscoveryRequest;
+import org.junit.platform.launcher.TestExecutionListener;
+import org.junit.platform.launcher.TestIdentifier;
+import org.junit.platform.launcher.TestPlan;
+import org.junit.platform.launcher.core.LauncherDiscoveryRequestBuilder;
+import org.junit.platform.launcher.core.LauncherFactory;
+
+/**
+ * 常驻的 JUnit Platform 测试执行进程，由 utils/_test_runner_service.py 启动和驱动。
+ *
+ * 进程启动时挂载 JaCoCo agent (output=none)，之后从 stdin 逐行读取请求，
+ * 每个请求对应 stdout 上一行以 RESPONSE_PREFIX 开头的 JSON 响应：
+ *
+ *   COMPILE\t<source>   用进程内的 javac 把单个测试源文件编译到 scratch 目录，返回结构化的诊断信息
+ *   RUN\t<test class>[\t<source files>]
+ *                       执行一个测试类，返回执行结果、失败信息以及覆盖率；给出逗号分隔的源文件
+ *                       (org/foo/Bar.java) 时只分析这些源文件所在包的 class 文件
+ *   RUNEACH\t<test class>[\t<source files>]
+ *                       同 RUN，但是按测试方法分别返回覆盖率：每个测试开始前后 dump 并重置 agent，
+ *                       测试之外 (例如 @BeforeAll) 产生的覆盖率合并到每个测试方法中
+ *   RUNSUITE\t<test classes>[\t<source files>]
+ *                       在一次 launcher 执行中运行逗号分隔的多个测试类 (例如项目中已有的全部测试)，
+ *                       按测试类分别返回执行结果和覆盖率：每个顶层测试类开始前后 dump 并重置 agent，
+ *                       测试类之外产生的覆盖率丢弃；测试类只从 target/test-classes 加载，无法加载的类在 missing 中返回
+ *   QUIT                退出
+ *
+ * 测试代码自身的 System.out / System.err 会被截获并放进响应里，不会污染协议输出。
+ */
+public class WiseUTRunner {
+    private static final String RESPONSE_PREFIX = "@@WISEUT@@ ";
+
+    private final File classesDir;
+    private final File testClassesDir;
+    private final File scratchDir;
+    private final PrintStream protocolOut;
+    private final ByteArrayOutputStream capturedOut = new ByteArrayOutputStream();
+    private final ByteArrayOutputStream capturedErr = new ByteArrayOutputStream();
+    private final Object agent;
+    private final Method agentReset;
+    private final Method agentGetExecutionData;
+    private final Launcher launcher;
+    private final JavaCompiler compiler;
+    private StandardJavaFileManager fileManager;
+
+    public static void main(String[] args) throws Exception {
+        if (args.length < 3) {
+            System.err.println("usage: WiseUTRunner <classes dir> <test classes dir> <scratch dir>");
+            System.exit(2);
+        }
+        PrintStream protocolOut = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        WiseUTRunner runner = new WiseUTRunner(new File(args[0]), new File(args[1]), new File(args[2]), protocolOut);
+        runner.serve(new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8)));
+    }
+
+    WiseUTRunner(File classesDir, File testClassesDir, File scratchDir, PrintStream protocolOut) throws Exception {
+        this.classesDir = classesDir;
+        this.testClassesDir = testClassesDir;
+        this.scratchDir = scratchDir;
+        this.protocolOut = protocolOut;
+        System.setOut(new PrintStream(capturedOut, true, "UTF-8"));
+        System.setErr(new PrintStream(capturedErr, true, "UTF-8"));
+
+        // agent 的 jar 由 -javaagent 挂到 system class path 上，这里通过反射访问，避免编译期依赖
+        Class<?> rt = Class.forName("org.jacoco.agent.rt.RT");
+        Class<?> agentInterface = Class.forName("org.jacoco.agent.rt.IAgent");
+        this.agent = rt.getMethod("getAgent").invoke(null);
+        this.agentReset = agentInterface.getMethod("reset");
+        this.agentGetExecutionData = agentInterface.getMethod("getExecutionData", boolean.class);
+        this.launcher = LauncherFactory.create();
+        // 只有 JRE 时为 null，COMPILE 请求会返回 error，由调用方退回到 mvn test-compile
+        this.compiler = ToolProvider.getSystemJavaCompiler();
+    }
+
+    void serve(BufferedReader in) throws IOException {
+        respond("{\"ready\":true}");
+        String line;
+        while ((line = in.readLine()) != null) {
+            line = line.trim();
+            if (line.isEmpty()) {
+                continue;
+            }
+            if (line.equals("QUIT")) {
+                break;
+            }
+            String[] parts = line.split("\t");
+            try {
+                if (parts[0].equals("COMPILE") && parts.length >= 2) {
+                    respond(compileTestSource(parts[1]));
+                } else if (parts[0].equals("RUN") && parts.length >= 2) {
+                    respond(runTestClass(parts[1], parts.length >= 3 ? parseSourceFiles(parts[2]) : null));
+                } else if (parts[0].equals("RUNEACH") && parts.length >= 2) {
+                    respond(runTestMethods(parts[1], parts.length >= 3 ? parseSourceFiles(parts[2]) : null));
+                } else if (parts[0].equals("RUNSUITE") && parts.length >= 2) {
+                    respond(runTestSuite(parts[1].split(","), parts.length >= 3 ? parseSourceFiles(parts[2]) : null));
+                } else {
+                    respond(error("unknown request: " + line));
+                }
+            } catch (Throwable t) {
+                respond(error(stackTrace(t)));
+            }
+        }
+    }
+
+    private void respond(String json) {
+        protocolOut.println(RESPONSE_PREFIX + json);
+        protocolOut.flush();
+    }
+
+    /**
+     * 编译单个测试源文件。classpath 为 runner 自身的 classpath (target/classes 与全部依赖) 加上 target/test-classes，
+     * 输出写到 scratch 目录，每次编译前清空，保证 RUN 时加载的是最新的测试类。
+     */
+    private String compileTestSource(String sourcePath) throws IOException {
+        deleteRecursively(scratchDir);
+        scratchDir.mkdirs();
+        if (compiler == null) {
+            return error("no system java compiler available");
+        }
+        if (fileManager == null) {
+            // 复用同一个 file manager，jar 的索引只需要建立一次
+            fileManager = compiler.getStandardFileManager(null, Locale.ROOT, StandardCharsets.UTF_8);
+        }
+        List<String> options = Arrays.asList(
+                "-encoding", "UTF-8",
+                "-g",
+                "-nowarn",
+                "-d", scratchDir.getPath(),
+                "-classpath", System.getProperty("java.class.path") + File.pathSeparator + testClassesDir.getPath());
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        StringWriter output = new StringWriter();
+        Iterable<? extends JavaFileObject> units = fileManager.getJavaFileObjects(new File(sourcePath));
+        boolean success = compiler.getTask(output, fileManager, diagnostics, options, null, units).call();
+
+        StringBuilder json = new StringBuilder();
+        json.append("{\"success\":").append(success);
+        json.append(",\"diagnostics\":[");
+        boolean first = true;
+        for (Diagnostic<? extends JavaFileObject> diagnostic : diagnostics.getDiagnostics()) {
+            if (!first) {
+                json.append(",");
+            }
+            first = false;
+            json.append("{\"kind\":").append(quote(diagnostic.getKind().name()))
+                    .append(",\"source\":").append(quote(diagnostic.getSource() == null ? null : diagnostic.getSource().getName()))
+                    .append(",\"line\":").append(diagnostic.getLineNumber())
+                    .append(",\"column\":").append(diagnostic.getColumnNumber())
+                    .append(",\"code\":").append(quote(diagnostic.getCode()))
+                    .append(",\"message\":").append(quote(diagnostic.getMessage(Locale.ROOT)))
+                    .append("}");
+        }
+        json.append("],\"output\":").append(quote(output.toString()));
+        json.append("}");
+        return json.toString();
+    }
+
+    private static void deleteRecursively(File file) {
+        File[] children = file.listFiles();
+        if (children != null) {
+            for (File child : children) {
+                deleteRecursively(child);
+            }
+        }
+        file.delete();
+    }
+
+    private static Set<String> parseSourceFiles(String value) {
+        Set<String> sourceFiles = new HashSet<>();
+        for (String sourceFile : value.split(",")) {
+            if (!sourceFile.isEmpty()) {
+                sourceFiles.add(sourceFile);
+            }
+        }
+        return sourceFiles;
+    }
+
+    private String runTestClass(String testClassName, Set<String> sourceFiles) throws Exception {
+        capturedOut.reset();
+        capturedErr.reset();
+        agentReset.invoke(agent);
+
+        ResultCollector collector = new ResultCollector();
+        execute(testClassName, collector);
+        byte[] executionData = (byte[]) agentGetExecutionData.invoke(agent, true);
+
+        StringBuilder json = new StringBuilder();
+        json.append("{\"result\":").append(quote(collector.resultCategory()));
+        json.append(",\"tests\":");
+        collector.writeJson(json);
+        json.append(",\"coverage\":");
+        writeCoverage(json, analyze(readExecutionData(executionData, new ExecutionDataStore()), sourceFiles), sourceFiles);
+        json.append(",\"stdout\":").append(quote(capturedOut.toString("UTF-8")));
+        json.append(",\"stderr\":").append(quote(capturedErr.toString("UTF-8")));
+        json.append("}");
+        return json.toString();
+    }
+
+    private String runTestMethods(String testClassName, Set<String> sourceFiles) throws Exception {
+        capturedOut.reset();
+        capturedErr.reset();
+        agentReset.invoke(agent);
+
+        PerMethodCollector collector = new PerMethodCollector();
+        execute(testClassName, collector);
+        collector.dumpShared();
+
+        StringBuilder json = new StringBuilder();
+        json.append("{\"result\":").append(quote(collector.resultCategory()));
+        json.append(",\"tests\":");
+        collector.writeJson(json);
+        json.append(",\"methods\":{");
+        boolean first = true;
+        for (Map.Entry<String, ExecutionDataStore> entry : collector.methodData.entrySet()) {
+            if (!first) {
+                json.append(",");
+            }
+            first = false;
+            ExecutionDataStore store = entry.getValue();
+            for (ExecutionData shared : collector.sharedData.getContents()) {
+                store.put(new ExecutionData(shared.getId(), shared.getName(), shared.getProbes().clone()));
+            }
+            json.append(quote(entry.getKey())).append(":{\"result\":")
+                    .append(quote(collector.failedMethods.contains(entry.getKey()) ? "Failed Execution" : "Passed"))
+                    .append(",\"coverage\":");
+            writeCoverage(json, analyze(store, sourceFiles), sourceFiles);
+            json.append("}");
+        }
+        json.append("}");
+        json.append(",\"stdout\":").append(quote(capturedOut.toString("UTF-8")));
+        json.append(",\"stderr\":").append(quote(capturedErr.toString("UTF-8")));
+        json.append("}");
+        return json.toString();
+    }
+
+    private String runTestSuite(String[] testClassNames, Set<String> sourceFiles) throws Exception {
+        capturedOut.reset();
+        capturedErr.reset();
+
+        PerClassCollector collector = new PerClassCollector();
+        List<String> missing = new ArrayList<>();
+        // 已有的测试都编译在 target/test-classes 中，不使用 scratch 目录，避免被之前生成的同名测试类覆盖
+        URL[] urls = new URL[] {testClassesDir.toURI().toURL()};
+        ClassLoader previous = Thread.currentThread().getContextClassLoader();
+        try (URLClassLoader loader = new URLClassLoader(urls, WiseUTRunner.class.getClassLoader())) {
+            Thread.currentThread().setContextClassLoader(loader);
+            List<DiscoverySelector> selectors = new ArrayList<>();
+            for (String testClassName : testClassNames) {
+                if (testClassName.isEmpty()) {
+                    continue;
+                }
+                try {
+                    selectors.add(DiscoverySelectors.selectClass(Class.forName(testClassName, false, loader)));
+                } catch (ClassNotFoundException | LinkageError e) {
+                    missing.add(testClassName);
+                }
+            }
+            agentReset.invoke(agent);
+            if (!selectors.isEmpty()) {
+                launcher.execute(LauncherDiscoveryRequestBuilder.request().selectors(selectors).build(), collector);
+            }
+        } finally {
+            Thread.currentThread().setContextClassLoader(previous);
+        }
+
+        StringBuilder json = new StringBuilder();
+        json.append("{\"result\":").append(quote(collector.resultCategory()));
+        json.append(",\"tests\":");
+        collector.writeJson(json);
+        json.append(",\"classes\":{");
+        boolean first = true;
+        for (Map.Entry<String, ExecutionDataStore> entry : collector.classData.entrySet()) {
+            if (!first) {
+                json.append(",");
+            }
+            first = false;
+            json.append(quote(entry.getKey())).append(":{\"result\":").append(quote(collector.classResultCategory(entry.getKey())))
+                    .append(",\"coverage\":");
+            writeCoverage(json, analyze(entry.getValue(), sourceFiles), sourceFiles);
+            json.append("}");
+        }
+        json.append("},\"missing\":[");
+        for (int i = 0; i < missing.size(); i++) {
+            if (i > 0) {
+                json.append(",");
+            }
+            json.append(quote(missing.get(i)));
+        }
+        json.append("]");
+        json.append(",\"stdout\":").append(quote(capturedOut.toString("UTF-8")));
+        json.append(",\"stderr\":").append(quote(capturedErr.toString("UTF-8")));
+        json.append("}");
+        return json.toString();
+    }
+
+    private void execute(String testClassName, TestExecutionListener listener) throws Exception {
+        ClassLoader previous = Thread.currentThread().getContextClassLoader();
+        // 每次请求新建 classloader，保证重新编译过的测试类不会命中旧的缓存
+        // scratch 目录放在前面，刚编译的测试类优先于 target/test-classes 中的同名类
+        URL[] urls = new URL[] {scratchDir.toURI().toURL(), testClassesDir.toURI().toURL()};
+        try (URLClassLoader loader = new URLClassLoader(urls, WiseUTRunner.class.getClassLoader())) {
+            Thread.currentThread().setContextClassLoader(loader);
+            Class<?> testClass = Class.forName(testClassName, false, loader);
+            LauncherDiscoveryRequest request = LauncherDiscoveryRequestBuilder.request()
+                    .selectors(DiscoverySelectors.selectClass(testClass))
+                    .build();
+            launcher.execute(request, listener);
+        } finally {
+            Thread.currentThread().setContextClassLoader(previous);
+        }
+    }
+
+    /** 把 agent dump 出来的数据合并进 store，同一个类的 probe 取并集。 */
+    private static ExecutionDataStore readExecutionData(byte[] executionData, ExecutionDataStore store) throws IOException {
+        ExecutionDataReader reader = new ExecutionDataReader(new ByteArrayInputStream(executionData));
+        reader.setExecutionDataVisitor(store);
+        reader.setSessionInfoVisitor(new SessionInfoStore());
+        reader.read();
+        return store;
+    }
+
+    private IBundleCoverage analyze(ExecutionDataStore executionDataStore, Set<String> sourceFiles) throws IOException {
+        CoverageBuilder coverageBuilder = new CoverageBuilder();
+        Analyzer analyzer = new Analyzer(executionDataStore, coverageBuilder);
+        if (sourceFiles == null) {
+            analyzer.analyzeAll(classesDir);
+        } else {
+            // 只分析关心的包目录下的 class 文件 (不递归子包)，代价和项目大小无关
+            for (String packageName : packagesOf(sourceFiles)) {
+                File[] classFiles = new File(classesDir, packageName).listFiles();
+                if (classFiles == null) {
+                    continue;
+                }
+                for (File classFile : classFiles) {
+                    if (classFile.isFile() && classFile.getName().endsWith(".class")) {
+                        analyzer.analyzeAll(classFile);
+                    }
+                }
+            }
+        }
+        return coverageBuilder.getBundle("wiseut");
+    }
+
+    private static Set<String> packagesOf(Set<String> sourceFiles) {
+        Set<String> packages = new HashSet<>();
+        for (String sourceFile : sourceFiles) {
+            int index = sourceFile.lastIndexOf('/');
+            packages.add(index < 0 ? "" : sourceFile.substring(0, index));
+        }
+        return packages;
+    }
+
+    /**
+     * 和 jacoco.xml 的组织方式保持一致：
+     * {package: {"sourcefiles": {name: [[nr, mi, ci, mb, cb], ...]},
+     *            "classes": {name: [[method, desc, line missed, line covered, branch missed, branch covered], ...]}}}
+     * sourceFiles 不为 null 时只输出其中的源文件，类级别的数据保留所在包中的全部类。
+     */
+    private static void writeCoverage(StringBuilder json, IBundleCoverage bundle, Set<String> sourceFiles) {
+        json.append("{");
+        boolean firstPackage = true;
+        for (IPackageCoverage pkg : bundle.getPackages()) {
+            if (!firstPackage) {
+                json.append(",");
+            }
+            firstPackage = false;
+            json.append(quote(pkg.getName())).append(":{\"sourcefiles\":{");
+            boolean firstSource = true;
+            for (ISourceFileCoverage source : pkg.getSourceFiles()) {
+                String sourcePath = pkg.getName().isEmpty() ? source.getName() : pkg.getName() + "/" + source.getName();
+                if (sourceFiles != null && !sourceFiles.contains(sourcePath)) {
+                    continue;
+                }
+                if (!firstSource) {
+                    json.append(",");
+                }
+                firstSource = false;
+                json.append(quote(source.getName())).append(":[");
+                boolean firstLine = true;
+                for (int nr = source.getFirstLine(); nr <= source.getLastLine() && nr > 0; nr++) {
+                    ILine line = source.getLine(nr);
+                    if (line.getStatus() == ICounter.EMPTY) {
+                        continue;
+                    }
+                    if (!firstLine) {
+                        json.append(",");
+                    }
+                    firstLine = false;
+                    json.append("[").append(nr)
+                            .append(",").append(line.getInstructionCounter().getMissedCount())
+                            .append(",").append(line.getInstructionCounter().getCoveredCount())
+                            .append(",").append(line.getBranchCounter().getMissedCount())
+                            .append(",").append(line.getBranchCounter().getCoveredCount())
+                            .append("]");
+                }
+                json.append("]");
+            }
+            json.append("},\"classes\":{");
+            boolean firstClass = true;
+            for (IClassCoverage clazz : pkg.getClasses()) {
+                if (!firstClass) {
+                    json.append(",");
+                }
+                firstClass = false;
+                json.append(quote(clazz.getName())).append(":[");
+                boolean firstMethod = true;
+                for (IMethodCoverage method : clazz.getMethods()) {
+                    if (!firstMethod) {
+                        json.append(",");
+                    }
+                    firstMethod = false;
+                    json.append("[").append(quote(method.getName()))
+                            .append(",").append(quote(method.getDesc()))
+                            .append(",").append(method.getLineCounter().getMissedCount())
+                            .append(",").append(method.getLineCounter().getCoveredCount())
+                            .append(",").append(method.getBranchCounter().getMissedCount())
+                            .append(",").append(method.getBranchCounter().getCoveredCount())
+                            .append("]");
+                }
+                json.append("]");
+            }
+            json.append("}}");
+        }
+        json.append("}");
+    }
+
+    private static String error(String message) {
+        return "{\"error\":" + quote(message) + "}";
+    }
+
+    private static String stackTrace(Throwable t) {
+        StringWriter writer = new StringWriter();
+        t.printStackTrace(new PrintWriter(writer));
+        return writer.toString();
+    }
+
+    static String quote(String value) {
+        if (value == null) {
+            return "null";
+        }
+        StringBuilder sb = new StringBuilder(value.length() + 2);
+        sb.append('"');
+        for (int i = 0; i < value.length(); i++) {
+            char c = value.charAt(i);
+            switch (c) {
+                case '"':
+                    sb.append("\\\"");
+                    break;
+                case '\\':
+                    sb.append("\\\\");
+                    break;
+                case '\n':
+                    sb.append("\\n");
+                    break;
+                case '\r':
+                    sb.append("\\r");
+                    break;
+                case '\t':
+                    sb.append("\\t");
+                    break;
+                default:
+                    if (c < 0x20) {
+                        sb.append(String.format("\\u%04x", (int) c));
+                    } else {
+                        sb.append(c);
+                    }
+            }
+        }
+        sb.append('"');
+        return sb.toString();
+    }
+
+    /** 收集每个测试的执行状态，失败时附带异常栈。 */
+    static class ResultCollector implements TestExecutionListener {
+        private final List<String[]> tests = new ArrayList<>();
+        private boolean failed = false;
+        private int executed = 0;
+
+        @Override
+        public void testPlanExecutionStarted(TestPlan testPlan) {
+            tests.clear();
+            failed = false;
+            executed = 0;
+        }
+
+        @Override
+        public void executionSkipped(TestIdentifier testIdentifier, String reason) {
+            if (testIdentifier.isTest()) {
+                tests.add(new String[] {testIdentifier.getUniqueId(), testIdentifier.getDisplayName(), "SKIPPED", reason});
+            }
+        }
+
+        @Override
+        public void executionFinished(TestIdentifier testIdentifier, TestExecutionResult result) {
+            String trace = result.getThrowable().map(WiseUTRunner::stackTrace).orElse(null);
+            if (result.getStatus() == TestExecutionResult.Status.FAILED) {
+                failed = true;
+            }
+            // 容器级别的失败 (例如 @BeforeAll 抛异常) 也需要记录下来
+            if (testIdentifier.isTest() || result.getStatus() == TestExecutionResult.Status.FAILED) {
+                if (testIdentifier.isTest()) {
+                    executed++;
+                }
+                tests.add(new String[] {testIdentifier.getUniqueId(), testIdentifier.getDisplayName(),
+                        result.getStatus().name(), trace});
+            }
+        }
+
+        String resultCategory() {
+            // surefire 在没有执行任何测试时同样按失败处理
+            return failed || executed == 0 ? "Failed Execution" : "Passed";
+        }
+
+        void writeJson(StringBuilder json) {
+            json.append("[");
+            for (int i = 0; i < tests.size(); i++) {
+                String[] test = tests.get(i);
+                if (i > 0) {
+                    json.append(",");
+                }
+                json.append("{\"id\":").append(quote(test[0]))
+                        .append(",\"name\":").append(quote(test[1]))
+                        .append(",\"status\":").append(quote(test[2]))
+                        .append(",\"trace\":").append(quote(test[3]))
+                        .append("}");
+            }
+            json.append("]");
+        }
+    }
+
+    /** 在 ResultCollector 的基础上，按测试方法切分覆盖率。 */
+    final class PerMethodCollector extends ResultCollector {
+        private final Map<String, ExecutionDataStore> methodData = new LinkedHashMap<>();
+        private final Set<String> failedMethods = new HashSet<>();
+        private final ExecutionDataStore sharedData = new ExecutionDataStore();
+
+        /** 测试之外的执行 (类初始化、@BeforeAll 等) 记入 sharedData。 */
+        void dumpShared() {
+            try {
+                readExecutionData((byte[]) agentGetExecutionData.invoke(agent, true), sharedData);
+            } catch (Exception e) {
+                throw new IllegalStateException(e);
+            }
+        }
+
+        @Override
+        public void executionStarted(TestIdentifier testIdentifier) {
+            if (testIdentifier.isTest()) {
+                dumpShared();
+            }
+        }
+
+        @Override
+        public void executionFinished(TestIdentifier testIdentifier, TestExecutionResult result) {
+            super.executionFinished(testIdentifier, result);
+            if (!testIdentifier.isTest()) {
+                return;
+            }
+            // 参数化测试的多次调用合并到同一个方法上
+            String methodName = methodName(testIdentifier);
+            ExecutionDataStore store = methodData.computeIfAbsent(methodName, k -> new ExecutionDataStore());
+            try {
+                readExecutionData((byte[]) agentGetExecutionData.invoke(agent, true), store);
+            } catch (Exception e) {
+                throw new IllegalStateException(e);
+            }
+            if (result.getStatus() == TestExecutionResult.Status.FAILED) {
+                failedMethods.add(methodName);
+            }
+        }
+
+        private String methodName(TestIdentifier testIdentifier) {
+            TestSource source = testIdentifier.getSource().orElse(null);
+            if (source instanceof MethodSource) {
+                return ((MethodSource) source).getMethodName();
+            }
+            return testIdentifier.getDisplayName();
+        }
+    }
+
+    /** 在 ResultCollector 的基础上，按顶层测试类切分覆盖率和执行结果。 */
+    final class PerClassCollector extends ResultCollector {
+        private final Map<String, ExecutionDataStore> classData = new LinkedHashMap<>();
+        private final Set<String> failedClasses = new HashSet<>();
+        private final Map<String, Integer> executedTests = new HashMap<>();
+        /** 正在执行的顶层测试类及其容器的 unique id，内部类 (@Nested) 记在外层类上。 */
+        private String currentClass = null;
+        private String currentClassId = null;
+
+        private byte[] dump() {
+            try {
+                return (byte[]) agentGetExecutionData.invoke(agent, true);
+            } catch (Exception e) {
+                throw new IllegalStateException(e);
+            }
+        }
+
+        @Override
+        public void executionStarted(TestIdentifier testIdentifier) {
+            TestSource source = testIdentifier.getSource().orElse(null);
+            if (currentClass == null && testIdentifier.isContainer() && source instanceof ClassSource) {
+                // 丢弃上一个测试类结束之后、这个测试类开始之前产生的覆盖率
+                dump();
+                currentClass = ((ClassSource) source).getClassName();
+                currentClassId = testIdentifier.getUniqueId();
+            }
+        }
+
+        @Override
+        public void executionFinished(TestIdentifier testIdentifier, TestExecutionResult result) {
+            super.executionFinished(testIdentifier, result);
+            if (currentClass == null) {
+                return;
+            }
+            if (result.getStatus() == TestExecutionResult.Status.FAILED) {
+                failedClasses.add(currentClass);
+            }
+            if (testIdentifier.isTest()) {
+                executedTests.merge(currentClass, 1, Integer::sum);
+            }
+            if (testIdentifier.getUniqueId().equals(currentClassId)) {
+                ExecutionDataStore store = classData.computeIfAbsent(currentClass, k -> new ExecutionDataStore());
+                try {
+                    readExecutionData(dump(), store);
+                } catch (IOException e) {
+                    throw new IllegalStateException(e);
+                }
+                currentClass = null;
+                currentClassId = null;
+            }
+        }
+
+        String classResultCategory(String className) {
+            // 和 resultCategory 一样，没有执行任何测试时按失败处理
+            return failedClasses.contains(className) || executedTests.getOrDefault(className, 0) == 0 ? "Failed Execution" : "Passed";
+        }
+    }
+}
@@ -1,18 +1,25 @@
 import os
+import asyncio
 import copy
 import json
+import queue
 import sys
+import threading
 import time
 import traceback
 import sys
+from concurrent.futures import ThreadPoolExecutor
 sys.path.extend(['.', '..'])
 
 from data.Config import CONFIG, logger, code_base
 from utils.preprocess_project import analyze_project, delete_existing_case_and_save, get_callable_methods, recovery_existing_case
 from utils.llm_util_java import construct_prompt, invoke_llm
+from utils._llm_cache import get_llm_cache
 from utils.test_construct_utils import assembly_test_class_component, construct_test_class
 from utils.strategy_utils import update_strategies
-from utils.test_excute_utils import build_project, compile_and_collect_coverage_test
+from utils.test_excute_utils import batch_compile_and_collect_coverage_tests, build_project, compile_and_collect_coverage_test, process_test_case
+from utils._test_runner_service import close_test_runner, shutdown_test_runners
+from utils._workspace import STATE_LOCK, create_workspaces, remove_workspaces
 
 
 # 记录时间
@@ -37,21 +44,81 @@ def setup_expr_info(package_name, single_target):
         "processed_imports": '',
         'line_number': ','.join([str(i) for i in list(single_target.line_range)]),
         'origin_covered_lines':  ','.join([str(i) for i in list(single_target.get_covered_lines())]),
-        'origin_covered_rate': len(single_target.get_covered_lines()) / len(single_target.line_range) if len(single_target.line_range) != 0 else 0,
+        'origin_covered_rate': single_target.covered_count() / single_target.line_count() if single_target.line_count() != 0 else 0,
         'covered_lines': ','.join([str(i) for i in list(single_target.get_covered_lines())]),
-        'covered_rate': len(single_target.get_covered_lines()) / len(single_target.line_range) if len(single_target.line_range) != 0 else 0,
+        'covered_rate': single_target.covered_count() / single_target.line_count() if single_target.line_count() != 0 else 0,
     }
     return expr_info
 
-def run_method(single_target, project_name, all_packages, method_map, class_map, json_writer, debugging_mode=False):
-    project_root = CONFIG['path_mappings'][project_name]['loc']
+def _prefetch_snapshot(single_target):
+    '''决定第一轮策略和 prompt 的状态，执行前和预取时不一致说明预取的结果已经过期'''
+    return (
+        frozenset(single_target.get_covered_lines()),
+        len(single_target.direct_programs),
+        len(single_target.covered_tests),
+    )
+
+def _release_chains(single_target, chains):
+    '''撤销预取时选择的调用链 (chain_id)：只移除这几条，不影响之后其他地方加入的；调用方持有 STATE_LOCK'''
+    single_target.used_callee_chains.difference_update(chains)
+
+def prefetch_first_round(single_target, class_map, debugging_mode=False):
+    '''
+    提前为待测函数选择第一轮的策略并调用大模型，在前面的待测函数执行测试时进行。
+    只预取第一轮：之后每一轮的策略都依赖本函数最新的覆盖率，仍然在 run_method 中串行选择。
+
+    Returns:
+        dict: 交给 run_method 的 prefetched；没有可用的策略时返回 None
+    '''
+    strtegies_rounds = {
+        'direct': list(),
+        'indirect': list(),  
+        'new': list()
+    }
+    direct_selected_examples = list()
+    prompt_cache_dict = {}
+    with STATE_LOCK:
+        snapshot = _prefetch_snapshot(single_target)
+        used_chains = set(single_target.used_callee_chains)
+        all_conditions = update_strategies(strtegies_rounds, single_target, direct_selected_examples)
+        if not any(all_conditions):
+            return None
+        try:
+            prompt, context, chosen_strategy, selected_examples = construct_prompt(single_target, all_conditions, direct_selected_examples, class_map)
+        except BaseException:
+            _release_chains(single_target, single_target.used_callee_chains - used_chains)
+            raise
+        # construct_prompt 选择 indirect 策略时把调用链加入 used_callee_chains
+        chosen_chains = single_target.used_callee_chains - used_chains
+        if chosen_strategy is None:
+            return None
+    try:
+        llm_result = invoke_llm(single_target, context, prompt, prompt_cache_dict, debugging_mode)
+    except BaseException:
+        # 预取失败时选择的调用链没有真正用到，还给 run_method
+        with STATE_LOCK:
+            _release_chains(single_target, chosen_chains)
+        raise
+    return {
+        'snapshot': snapshot,
+        'chosen_chains': chosen_chains,
+        'all_conditions': all_conditions,
+        'direct_selected_examples': direct_selected_examples,
+        'prompt_cache_dict': prompt_cache_dict,
+        'first_round': (context, chosen_strategy, selected_examples, llm_result),
+    }
+
+def run_method(single_target, project_name, all_packages, method_map, class_map, json_writer, debugging_mode=False, project_root=None, prefetched=None):
+    '''
+    project_root 为 None 时在原项目中执行；并行时每个 worker 传入自己的 workspace
+    prefetched 为 prefetch_first_round 的结果，仍然有效时直接作为第一轮的大模型回复
+    '''
+    if project_root is None:
+        project_root = CONFIG['path_mappings'][project_name]['loc']
     test_root_dir = CONFIG['path_mappings'][project_name]['test']
     src_root_dir = CONFIG['path_mappings'][project_name]['src']
 
     package_name = single_target.get_package_name()
-    # 记录结果
-    expr_info = setup_expr_info(package_name, single_target)
-    
     # 记录各种策略使用的情况
     strtegies_rounds = {
         'direct': list(),
@@ -62,28 +129,51 @@ def run_method(single_target, project_name, all_packages, method_map, class_map,
     prompt_cache_dict = {}
     generated = False
     
-    # 可选择的策略
-    all_conditions = update_strategies(strtegies_rounds, single_target, direct_selected_examples)
-    before_llm_cov_rate = len(single_target.get_covered_lines()) / len(single_target.line_range)
+    # 共享状态 (覆盖率、策略、调用关系) 的读写都在 STATE_LOCK 内，调用大模型和执行测试时释放
+    first_round = None
+    with STATE_LOCK:
+        # 记录结果
+        expr_info = setup_expr_info(package_name, single_target)
+        if prefetched is not None and prefetched['snapshot'] == _prefetch_snapshot(single_target):
+            direct_selected_examples = prefetched['direct_selected_examples']
+            prompt_cache_dict = prefetched['prompt_cache_dict']
+            all_conditions = prefetched['all_conditions']
+            first_round = prefetched['first_round']
+        else:
+            if prefetched is not None:
+                # 预取之后其他函数的测试改变了本函数的覆盖率或者可用的测试，丢弃预取的结果，撤销其选择的调用链
+                logger.debug(f"Prefetched response for {single_target.signature} is stale, discarding")
+                _release_chains(single_target, prefetched['chosen_chains'])
+            # 可选择的策略
+            all_conditions = update_strategies(strtegies_rounds, single_target, direct_selected_examples)
+        before_llm_cov_rate = single_target.covered_count() / single_target.line_count()
     
     while any(all_conditions):
-        prompt, context, chosen_strategy, selected_examples = construct_prompt(single_target, all_conditions, direct_selected_examples, class_map)
-        if chosen_strategy is None:
-            logger.debug(f"Target does not chosen a strategy, stop generating")
-            break  # As no strategy was chosen, exit the loop.
-            
-        logger.debug(f"Invoking the LLM")
-        stage1_prompt, stage1_response, stage2_prompt, stage2_response, generated = invoke_llm(single_target, context, prompt, prompt_cache_dict, debugging_mode)
+        if first_round is not None:
+            context, chosen_strategy, selected_examples, llm_result = first_round
+            first_round = None
+            logger.debug(f"Using the prefetched LLM response")
+            stage1_prompt, stage1_response, stage2_prompt, stage2_response, generated = llm_result
+        else:
+            with STATE_LOCK:
+                prompt, context, chosen_strategy, selected_examples = construct_prompt(single_target, all_conditions, direct_selected_examples, class_map)
+            if chosen_strategy is None:
+                logger.debug(f"Target does not chosen a strategy, stop generating")
+                break  # As no strategy was chosen, exit the loop.
+                
+            logger.debug(f"Invoking the LLM")
+            stage1_prompt, stage1_response, stage2_prompt, stage2_response, generated = invoke_llm(single_target, context, prompt, prompt_cache_dict, debugging_mode)
         
         if generated == False:
             logger.debug(f'LLM not generated, stop generating')
             break
         logger.debug(f"Get the LLM response, executing the tests")
         
-        total_imports, fields, setup_methods, classes, uts = assembly_test_class_component(single_target, stage2_response, selected_examples, os.path.join(project_root, src_root_dir))
-        
-        origin_target_coverage = copy.deepcopy(single_target.get_covered_lines())
-        origin_target_rate = len(single_target.get_covered_lines()) / len(single_target.line_range)
+        with STATE_LOCK:
+            total_imports, fields, setup_methods, classes, uts = assembly_test_class_component(single_target, stage2_response, selected_examples, os.path.join(project_root, src_root_dir))
+            
+            origin_target_coverage = copy.deepcopy(single_target.get_covered_lines())
+            origin_target_rate = single_target.covered_count() / single_target.line_count()
         
         # 先进行一次mvn编译
         logger.debug(f"Compiling the project")
@@ -95,65 +185,78 @@ def run_method(single_target, project_name, all_packages, method_map, class_map,
             logger.debug(f"Project compiled")
         
         logger.debug(f"LLM generated test cases: {len(uts)}")
+        # 同一次回复中的测试方法放进一个测试类，一次编译、执行，按测试方法分别得到覆盖率；不可用时逐个执行
+        batch_results = None
+        if CONFIG.get('batch_tests', True) and len(uts) > 1:
+            batch_results = batch_compile_and_collect_coverage_tests(single_target, project_root, test_root_dir, total_imports, fields, setup_methods, classes, uts, all_packages, method_map, class_map)
+        
         for id, single_ut in enumerate(uts):
             logger.debug(f"Processing test case {id + 1} / {len(uts)}")
             
-            single_origin_coverage_lines = copy.deepcopy(single_target.get_covered_lines())
-            if single_origin_coverage_lines == 1:
-                logger.debug(f"Target already fully covered, stop compiling")
-                break
-            test_class_content, test_class_sig = construct_test_class(single_target, total_imports, fields, setup_methods, classes, single_ut)
-            compile_err, exec_err, is_compiled, res = compile_and_collect_coverage_test(single_target, project_root, test_root_dir, test_class_content, test_class_sig, all_packages, method_map, class_map)
+            with STATE_LOCK:
+                single_origin_coverage_lines = copy.deepcopy(single_target.get_covered_lines())
+                if single_origin_coverage_lines == 1:
+                    logger.debug(f"Target already fully covered, stop compiling")
+                    break
+                if batch_results is not None:
+                    test_class_content, test_class_sig, case_called_functions, compile_res = batch_results[id]
+                    compile_err, exec_err, is_compiled, res = process_test_case(single_target, all_packages, method_map, class_map, test_class_content, compile_res, case_called_functions)
+                else:
+                    test_class_content, test_class_sig = construct_test_class(single_target, total_imports, fields, setup_methods, classes, single_ut)
+            if batch_results is None:
+                compile_err, exec_err, is_compiled, res = compile_and_collect_coverage_test(single_target, project_root, test_root_dir, test_class_content, test_class_sig, all_packages, method_map, class_map)
             
             logger.debug(f"{id + 1}-th test case compiled : {is_compiled}")
             
-            expr_info.update({
-                        "test_class_sig": test_class_sig,
-                        "strategy": chosen_strategy,
-                        "res": res,
-                        "compiled": is_compiled,
-                        'compile_err': compile_err,
-                        'execution_err': exec_err,
-                        "generated_test": test_class_content,
-                        "stage1_prompt": stage1_prompt,
-                        "stage1_response": stage1_response,
-                        "stage2_prompt": stage2_prompt,
-                        "stage2_response": stage2_response,
-                        "processed_imports": '\n'.join(total_imports),
-                        'covered_lines': ','.join([str(i) for i in list(single_target.get_covered_lines())]),
-                        'covered_rate': len(single_target.get_covered_lines()) / len(single_target.line_range) if len(single_target.line_range) != 0 else 0,
-                    })
-            json_writer.write(json.dumps(expr_info) + '\n')
-            json_writer.flush()
+            with STATE_LOCK:
+                expr_info.update({
+                            "test_class_sig": test_class_sig,
+                            "strategy": chosen_strategy,
+                            "res": res,
+                            "compiled": is_compiled,
+                            'compile_err': compile_err,
+                            'execution_err': exec_err,
+                            "generated_test": test_class_content,
+                            "stage1_prompt": stage1_prompt,
+                            "stage1_response": stage1_response,
+                            "stage2_prompt": stage2_prompt,
+                            "stage2_response": stage2_response,
+                            "processed_imports": '\n'.join(total_imports),
+                            'covered_lines': ','.join([str(i) for i in list(single_target.get_covered_lines())]),
+                            'covered_rate': single_target.covered_count() / single_target.line_count() if single_target.line_count() != 0 else 0,
+                        })
+                json_writer.write(json.dumps(expr_info) + '\n')
+                json_writer.flush()
             
             logger.debug(f"Finish processing test case {id + 1} / {len(uts)}")
         
-        if len(single_target.get_covered_lines() - origin_target_coverage) > 0:
-            res = 'better!'
-        else:
-            res = 'useless!'
+        with STATE_LOCK:
+            if len(single_target.get_covered_lines() - origin_target_coverage) > 0:
+                res = 'better!'
+            else:
+                res = 'useless!'
+                
+            # print(res)
+            # logger.debug(f"Coverage for target is {res}")
+            # logger.debug(f"Origin coverage rate is {origin_target_rate}")
+            # logger.debug(f"After LLM generate coverage rate is {expr_info['covered_rate']}\n\n")
+                
+            after_cov_rate = single_target.covered_count() / single_target.line_count()
             
-        # print(res)
-        # logger.debug(f"Coverage for target is {res}")
-        # logger.debug(f"Origin coverage rate is {origin_target_rate}")
-        # logger.debug(f"After LLM generate coverage rate is {expr_info['covered_rate']}\n\n")
+            if after_cov_rate == 1:
+                break
             
-        after_cov_rate = len(single_target.get_covered_lines()) / len(single_target.line_range)
-        
-        if after_cov_rate == 1:
-            break
-        
-        strtegies_rounds[chosen_strategy].append(copy.deepcopy(single_target.get_covered_lines()))
-        
-        all_conditions = update_strategies(strtegies_rounds, single_target, direct_selected_examples)
+            strtegies_rounds[chosen_strategy].append(copy.deepcopy(single_target.get_covered_lines()))
+            
+            all_conditions = update_strategies(strtegies_rounds, single_target, direct_selected_examples)
         
     
-    if not generated:
-        expr_info.update({"res": 'No program generated.'})
-        json_writer.write(json.dumps(expr_info) + '\n')
-        json_writer.flush()
-    pass
-    after_llm_cov_rate = len(single_target.get_covered_lines()) / len(single_target.line_range)
+    with STATE_LOCK:
+        if not generated:
+            expr_info.update({"res": 'No program generated.'})
+            json_writer.write(json.dumps(expr_info) + '\n')
+            json_writer.flush()
+        after_llm_cov_rate = single_target.covered_count() / single_target.line_count()
     if after_llm_cov_rate > before_llm_cov_rate:
         res = 'better!'
     else:
@@ -171,7 +274,108 @@ def run_package(project_name, single_package, collect_type):
         return []
     return callable_methods
     
-def run_projcet(project_name, json_res_dir, tmp_test_dir, debugging_mode=False):
+def run_targets_in_parallel(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, workers, debugging_mode=False):
+    '''
+    每个 worker 在自己的 workspace (项目的硬链接副本，独立的 target/) 中执行，从共享队列中领取待测函数；
+    覆盖率等共享状态的更新通过 STATE_LOCK 合并回同一批 Method 对象
+    '''
+    project_root = CONFIG['path_mappings'][project_name]['loc']
+    test_root_dir = CONFIG['path_mappings'][project_name]['test']
+    
+    logger.debug(f"Creating {workers} workspaces for {project_name}")
+    workspaces = create_workspaces(project_name, project_root, workers, copied_dirs=[test_root_dir])
+    
+    try:
+        if CONFIG.get('llm_prefetch', 2) > 0:
+            run_targets_pipelined(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, workspaces, debugging_mode)
+        else:
+            target_queue = queue.Queue()
+            for target_index, single_target in enumerate(all_callable_methods):
+                target_queue.put((target_index, single_target))
+            
+            def worker(workspace):
+                while True:
+                    try:
+                        target_index, single_target = target_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    _run_target(project_name, single_target, target_index, len(all_callable_methods), package_name, all_packages, method_map, class_map, json_writer, workspace, None, debugging_mode)
+            
+            threads = [threading.Thread(target=worker, args=(workspace,), name=f'worker-{index}', daemon=True) for index, workspace in enumerate(workspaces)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        for workspace in workspaces:
+            close_test_runner(workspace)
+        remove_workspaces(workspaces)
+
+def _run_target(project_name, single_target, target_index, total, package_name, all_packages, method_map, class_map, json_writer, project_root, prefetched, debugging_mode):
+    logger.debug(f"Processing target: {single_target.signature}, {target_index + 1} / {total}")
+    
+    run_time = time.time()
+    try:
+        run_method(single_target, project_name, all_packages, method_map, class_map, json_writer, debugging_mode, project_root=project_root, prefetched=prefetched)
+    except Exception as e:
+        print('Exception:', e)
+        traceback.print_exc()
+    run_time = time.time() - run_time
+    logger.debug(f"Time elapsed: {run_time}")
+    
+    with STATE_LOCK:
+        time_dict[project_name][package_name][single_target.signature] = run_time
+    logger.debug(f"Generation for target: {single_target.signature}, {target_index + 1} / {total} finished!\n\n")
+
+async def _run_targets_pipelined(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, project_roots, prefetch, llm_concurrency, debugging_mode):
+    llm_semaphore = asyncio.Semaphore(llm_concurrency)
+    # 最多领先 prefetch 个待测函数：消费者取走一个之后生产者才能开始下一个的预取 (backpressure)
+    prefetch_slots = asyncio.Semaphore(prefetch)
+    target_queue = asyncio.Queue()
+    
+    async def prefetch_target(single_target):
+        async with llm_semaphore:
+            try:
+                return await asyncio.to_thread(prefetch_first_round, single_target, class_map, debugging_mode)
+            except Exception as e:
+                logger.warning(f"Prefetching {single_target.signature} failed: {e}")
+                return None
+    
+    async def producer():
+        for target_index, single_target in enumerate(all_callable_methods):
+            await prefetch_slots.acquire()
+            await target_queue.put((target_index, single_target, asyncio.create_task(prefetch_target(single_target))))
+        for _ in project_roots:
+            await target_queue.put(None)
+    
+    async def consumer(project_root):
+        while True:
+            item = await target_queue.get()
+            if item is None:
+                return
+            prefetch_slots.release()
+            target_index, single_target, prefetch_task = item
+            prefetched = await prefetch_task
+            await asyncio.to_thread(_run_target, project_name, single_target, target_index, len(all_callable_methods), package_name, all_packages, method_map, class_map, json_writer, project_root, prefetched, debugging_mode)
+    
+    # 每个消费者占一个线程执行测试，预取最多占 llm_concurrency 个线程
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=len(project_roots) + llm_concurrency))
+    await asyncio.gather(producer(), *[consumer(project_root) for project_root in project_roots])
+
+def run_targets_pipelined(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, project_roots=(None,), debugging_mode=False):
+    '''
+    把大模型的调用和测试的执行流水线化：执行第 N 个待测函数的测试时，第 N+1 ... N+k 个待测函数的第一轮
+    (stage1 + stage2) 已经在请求大模型。同一个待测函数的后续轮次仍然串行，策略选择总能看到最新的覆盖率。
+
+    k 和同时进行的大模型请求数分别由配置中的 llm_prefetch 和 llm_concurrency 控制。
+    project_roots 中每个路径对应一个执行测试的消费者，None 表示原项目
+    '''
+    prefetch = max(1, CONFIG.get('llm_prefetch', 2))
+    llm_concurrency = max(1, CONFIG.get('llm_concurrency', 2))
+    logger.debug(f"Pipelining {len(all_callable_methods)} targets, prefetching {prefetch} targets with {llm_concurrency} concurrent LLM requests")
+    asyncio.run(_run_targets_pipelined(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, list(project_roots), prefetch, llm_concurrency, debugging_mode))
+
+def run_projcet(project_name, json_res_dir, tmp_test_dir, debugging_mode=False, workers=1, analysis_workers=None):
     json_res_file = os.path.join(json_res_dir, project_name + '.jsonl')
     json_writer = open(json_res_file, "w",)
     
@@ -183,7 +387,7 @@ def run_projcet(project_name, json_res_dir, tmp_test_dir, debugging_mode=False):
     
     # 通过静态分析提取到项目中的代码调用关系, 以及现有测试程序对应方法的映射
     logger.debug(f"Begin static analysis project for {project_name}")
-    all_packages, method_map, class_map = analyze_project(project_name, debugging_mode)
+    all_packages, method_map, class_map = analyze_project(project_name, debugging_mode, analysis_workers)
     logger.debug(f"Finish static analysis project for {project_name}")
     
     # 在项目中把已有的test都删掉，节省编译时间
@@ -207,28 +411,37 @@ def run_projcet(project_name, json_res_dir, tmp_test_dir, debugging_mode=False):
         pass
 
         logger.debug(f"Collected {len(all_callable_methods)} target methods.")
-        for target_index, single_target in enumerate(all_callable_methods):
-            logger.debug(f"Processing target: {single_target.signature}, {target_index + 1} / {len(all_callable_methods)}")
+        if workers > 1:
+            run_targets_in_parallel(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, workers, debugging_mode)
+        elif CONFIG.get('llm_prefetch', 2) > 0:
+            run_targets_pipelined(project_name, all_callable_methods, package_name, all_packages, method_map, class_map, json_writer, debugging_mode=debugging_mode)
+        else:
+            for target_index, single_target in enumerate(all_callable_methods):
+                logger.debug(f"Processing target: {single_target.signature}, {target_index + 1} / {len(all_callable_methods)}")
             
-            run_time = time.time()
-            run_method(single_target, project_name, all_packages, method_map, class_map, json_writer, debugging_mode)
-            run_time = time.time() - run_time
-            logger.debug(f"Time elapsed: {run_time}")
+                run_time = time.time()
+                run_method(single_target, project_name, all_packages, method_map, class_map, json_writer, debugging_mode)
+                run_time = time.time() - run_time
+                logger.debug(f"Time elapsed: {run_time}")
             
-            time_dict[project_name][package_name][single_target.signature] = run_time
-            logger.debug(f"Generation for target: {single_target.signature}, {target_index + 1} / {len(all_callable_methods)} finished!\n\n")
+                time_dict[project_name][package_name][single_target.signature] = run_time
+                logger.debug(f"Generation for target: {single_target.signature}, {target_index + 1} / {len(all_callable_methods)} finished!\n\n")
 
     except Exception as e:
         print('Exception:', e)
         traceback.print_exc()
     finally:
+        shutdown_test_runners()
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            logger.debug(f"LLM response cache: {llm_cache.stats()}")
         # 把所有的测试程序写回原项目
         logger.debug(f"Begin recovery existing case in projcet {project_name}")
         recovery_existing_case(project_name, tmp_test_dir)
         logger.debug(f"Finish recovery existing case in projcet {project_name}")
         pass
 
-def run(json_res_dir, tmp_test_dir, debugging_mode=False):
+def run(json_res_dir, tmp_test_dir, debugging_mode=False, workers=1, analysis_workers=None):
     # 获取需要执行的project列表
     # done_projs = []
     # if os.path.exists(done_proj_file):
@@ -244,7 +457,7 @@ def run(json_res_dir, tmp_test_dir, debugging_mode=False):
     for proj_index, project_name in enumerate(todo_projects):
         logger.debug(f"Begin processing project {project_name}")
         
-        run_projcet(project_name, json_res_dir, tmp_test_dir, debugging_mode)
+        run_projcet(project_name, json_res_dir, tmp_test_dir, debugging_mode, workers, analysis_workers)
         
         # with open(done_proj_file, 'a+') as f:
         #     f.write(project_name + '\n')
@@ -280,7 +493,13 @@ def record_time(time_dict, date):
         json.dump(time_dict, f)
 
 
-def coverage_entry():
+def coverage_entry(workers=None, analysis_workers=None):
+    '''
+    workers: 并行处理待测函数的 worker 数量，None 时读取配置中的 workers (默认 1，串行)
+    analysis_workers: 静态分析时提取单个文件的进程数，None 时读取配置中的 analysis_workers (默认 1)
+    '''
+    if workers is None:
+        workers = CONFIG.get('workers', 1)
     # 获取当前时间的时间戳
     timestamp = time.time()
     # 将时间戳转换为可读的时间字符串（例如：2023-04-01 12:34:56）
@@ -304,7 +523,7 @@ def coverage_entry():
     os.makedirs(tmp_test_dir, exist_ok=True)
     
     logger.debug("Generation begins!")
-    run(json_res_dir, tmp_test_dir, debugging_mode=False)
+    run(json_res_dir, tmp_test_dir, debugging_mode=False, workers=workers, analysis_workers=analysis_workers)
     logger.debug("Generation completed!")
     
     record_time(time_dict, date)
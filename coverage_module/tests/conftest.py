@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 和运行 starter_mvn.py 时一样，从 coverage_module 目录导入 utils / core / data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+"""parse_coverage_xml (iterparse) 和改造之前的 DOM 解析结果一致"""
+import gzip
+import shutil
+
+import pytest
+
+from benchmarks.bench_parse_coverage_xml import SAMPLE_REPORT, _plain, parse_coverage_xml_dom
+from utils._analyze_jacoco_output import parse_coverage_xml
+
+
+@pytest.fixture(scope='module')
+def sample_report(tmp_path_factory):
+    xml_path = tmp_path_factory.mktemp('jacoco') / 'jacoco.xml'
+    with gzip.open(SAMPLE_REPORT, 'rb') as src, open(xml_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return str(xml_path)
+
+
+@pytest.fixture(scope='module')
+def dom_result(sample_report):
+    return _plain(parse_coverage_xml_dom(sample_report))
+
+
+def test_full_parse_matches_dom(sample_report, dom_result):
+    assert _plain(parse_coverage_xml(sample_report)) == dom_result
+
+
+def test_package_allow_list(sample_report, dom_result):
+    packages = sorted(dom_result)[:2]
+    result = _plain(parse_coverage_xml(sample_report, packages=packages))
+    assert result == {package: dom_result[package] for package in packages}
+
+
+def test_class_allow_list(sample_report, dom_result):
+    # 选一个带内部类的类，内部类应和顶层类一起保留
+    package, class_name = next(
+        (package, key.split('$')[0]) for package in sorted(dom_result)
+        for key in dom_result[package] if '$' in key
+    )
+    result = _plain(parse_coverage_xml(sample_report, classes=[class_name.replace('/', '.')]))
+
+    sourcefile = class_name.split('/')[-1] + '.java'
+    expected = {
+        key: value for key, value in dom_result[package].items()
+        if key.split('$')[0] == class_name or key == sourcefile
+    }
+    assert any('$' in i for i in expected)
+    assert result == {package: expected}
+
+
+def test_unknown_package_is_empty(sample_report):
+    assert parse_coverage_xml(sample_report, packages=['org.does.not.exist']) == {}
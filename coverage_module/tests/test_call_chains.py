@@ -0,0 +1,176 @@
+"""CallChainEngine 的 chain_id 和改造之前按 Method tuple 枚举的调用链一致"""
+import random
+from collections import defaultdict
+
+from utils._call_chains import CallChainEngine
+
+
+class FakeMethod:
+    def __init__(self, name):
+        self.name = name
+        self.called_methods = set()
+
+    def __repr__(self):
+        return self.name
+
+
+class OldCallChainEngine:
+    '''改造之前的实现：调用链是 Method 的 tuple，exclude 是调用链的集合'''
+    def __init__(self, methods, max_depth, max_chains, callers, cyclic):
+        self.starts = set(methods)
+        self.max_length = max_depth + 2
+        self.max_chains = max_chains
+        self.callers = callers
+        self.cyclic = cyclic
+
+    def _generate(self, target):
+        if target in self.cyclic and target in self.starts:
+            yield (target,)
+        layer = [(target,)]
+        while layer and len(layer[0]) < self.max_length:
+            next_layer = []
+            for suffix in layer:
+                for caller in self.callers.get(suffix[0], ()):
+                    if caller in suffix:
+                        continue
+                    chain = (caller,) + suffix
+                    if caller in self.starts:
+                        yield chain
+                    next_layer.append(chain)
+            layer = next_layer
+
+    def callee_chains(self, target):
+        chains = []
+        for chain in self._generate(target):
+            if len(chains) >= self.max_chains:
+                break
+            chains.append(chain)
+        return chains
+
+    def shortest_chains(self, target, exclude=()):
+        best_length = {}
+        startpoint_chains = defaultdict(list)
+        for chain in self.callee_chains(target):
+            if chain in exclude:
+                continue
+            startpoint = chain[0]
+            if best_length.setdefault(startpoint, len(chain)) == len(chain):
+                startpoint_chains[startpoint].append(chain)
+        return [chain for chains in startpoint_chains.values() for chain in chains]
+
+
+def _random_graph(rng, size, edges):
+    methods = [FakeMethod(f'm{i}') for i in range(size)]
+    for _ in range(edges):
+        rng.choice(methods).called_methods.add(rng.choice(methods))
+    return methods
+
+
+def _old_engine(engine, methods, max_depth, max_chains):
+    # 调用者的顺序和环上的方法直接取新引擎的，两边按同样的顺序生成
+    callers = {engine.methods[i]: [engine.methods[j] for j in engine.callers[i]] for i in range(len(engine.methods))}
+    cyclic = set(engine.methods[i] for i in engine.cyclic)
+    return OldCallChainEngine(methods, max_depth, max_chains, callers, cyclic)
+
+
+def _simple_paths(methods, target, max_length):
+    '''暴力枚举：从 methods 出发到 target 的简单路径；target 是起点并且在环上 (环的长度不限) 时还有 (target,)'''
+    starts = set(methods)
+    paths = set()
+
+    def visit(path):
+        if path[-1] is target:
+            if len(path) > 1:
+                paths.add(tuple(path))
+            return
+        if len(path) == max_length:
+            return
+        for called_method in path[-1].called_methods:
+            if called_method not in path:
+                visit(path + [called_method])
+
+    for start in starts:
+        if start is not target:
+            visit([start])
+
+    if target in starts:
+        visited = set()
+        work = list(target.called_methods)
+        while work:
+            method = work.pop()
+            if method is target:
+                paths.add((target,))
+                break
+            if method not in visited:
+                visited.add(method)
+                work.extend(method.called_methods)
+    return paths
+
+
+def _graphs(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        size = rng.randint(2, 12)
+        all_methods = _random_graph(rng, size, rng.randint(size, size * 3))
+        # 只有一部分方法作为起点，其余的只能出现在链的中间
+        methods = rng.sample(all_methods, rng.randint(1, size))
+        yield rng, all_methods, methods
+
+
+def test_chains_match_simple_paths():
+    for rng, all_methods, methods in _graphs(0, 100):
+        max_depth = rng.randint(0, 4)
+        engine = CallChainEngine(methods, max_depth=max_depth, max_chains=10 ** 6)
+        for target in all_methods:
+            chains = [tuple(chain) for chain in engine.callee_chains(target)]
+            assert len(chains) == len(set(chains))
+            if target in engine.reachable:
+                assert set(chains) == _simple_paths(methods, target, max_depth + 2)
+            else:
+                assert chains == []
+
+
+def test_chain_ids_match_old_enumeration():
+    for rng, all_methods, methods in _graphs(1, 100):
+        max_depth, max_chains = rng.randint(0, 5), rng.randint(1, 40)
+        engine = CallChainEngine(methods, max_depth=max_depth, max_chains=max_chains)
+        old_engine = _old_engine(engine, methods, max_depth, max_chains)
+        for target in engine.methods:
+            chains = list(engine.callee_chains(target))
+            assert [tuple(chain) for chain in chains] == old_engine.callee_chains(target)
+            # 再次取出时复用同样的 chain_id
+            assert [chain.chain_id for chain in engine.callee_chains(target)] == [chain.chain_id for chain in chains]
+            for chain in chains:
+                assert len(chain) == len(tuple(chain))
+                assert chain[0] is tuple(chain)[0]
+                assert chain[-1] is target
+
+
+def test_shortest_chains_match_old_filtering():
+    for rng, all_methods, methods in _graphs(2, 100):
+        max_depth, max_chains = rng.randint(0, 5), rng.randint(1, 60)
+        # 一个引擎先生成完全部调用链 (按起点分组缓存的路径)，另一个每次新建 (边生成边停止的路径)
+        engine = CallChainEngine(methods, max_depth=max_depth, max_chains=max_chains)
+        old_engine = _old_engine(engine, methods, max_depth, max_chains)
+        for target in all_methods:
+            chains = list(engine.callee_chains(target))
+            for _ in range(5):
+                used = rng.sample(chains, rng.randint(0, len(chains)))
+                exclude = set(chain.chain_id for chain in used)
+                expected = old_engine.shortest_chains(target, set(tuple(chain) for chain in used))
+
+                assert [tuple(chain) for chain in engine.shortest_chains(target, exclude)] == expected
+
+                fresh_engine = CallChainEngine(methods, max_depth=max_depth, max_chains=max_chains)
+                fresh_chains = {tuple(chain): chain.chain_id for chain in fresh_engine.callee_chains(target)}
+                fresh_engine = CallChainEngine(methods, max_depth=max_depth, max_chains=max_chains)
+                # chain_id 按生成的顺序分配，新建的引擎中这个目标的编号和 fresh_chains 相同
+                fresh_exclude = set(fresh_chains[tuple(chain)] for chain in used)
+                assert [tuple(chain) for chain in fresh_engine.shortest_chains(target, fresh_exclude)] == expected
+
+
+def test_unknown_target():
+    method = FakeMethod('a')
+    engine = CallChainEngine([method])
+    assert engine.shortest_chains(FakeMethod('b')) == []
+    assert list(engine.callee_chains(FakeMethod('b'))) == []
@@ -0,0 +1,108 @@
+"""parse_method_signature 和 method_coverage_index 的查询结果和原来逐层查找 coverage_data 一致"""
+import gzip
+import random
+import re
+import shutil
+
+import pytest
+
+from benchmarks.bench_parse_coverage_xml import SAMPLE_REPORT
+from collect_coverage import get_covage_info
+from utils._analyze_jacoco_output import parse_coverage_xml
+from utils._coverage_utils import analyze_method_signature_for_coverage, method_coverage_index, parse_method_signature
+
+
+def old_analyze_method_signature(method_signature):
+    '''改造之前的 analyze_method_signature_for_coverage'''
+    parameters = re.findall(r"\(.*?\)", method_signature)[0][1:-1]
+    parameter_list = [i for i in parameters.split(",") if i != ""]
+    parameter_tuple = tuple(i.replace("#", ".").strip().lower() for i in parameter_list)
+    package_name = method_signature.split("#")[0]
+    class_name = ".".join(method_signature.split("#")[:2])
+    method_name = re.sub(r"\(.*?\)", "", "".join(method_signature.split("#")[2:]))
+    return (
+        package_name,
+        package_name.replace(".", "/"),
+        class_name,
+        class_name.replace(".", "/"),
+        method_name,
+        parameter_tuple,
+    )
+
+
+def old_get_covage_info(total_coverage_info, method_signature):
+    '''改造之前 collect_coverage.get_covage_info 逐层查找的做法'''
+    package_name, _, _, clazz_dir, method_name, parameter_tuple = old_analyze_method_signature(method_signature)
+    data = total_coverage_info.get(package_name)
+    if data is None:
+        return None
+    data = data.get(clazz_dir)
+    if data is None:
+        return None
+    data = data.get(method_name)
+    if data is None:
+        return None
+    data = data.get(tuple(parameter_tuple))
+    if data is None:
+        return None
+    return {
+        'LINE': data.get('line_coverage') if data.get('line_coverage') else {'covered': 0, 'missed': 0},
+        'BRANCH': data.get('branch_coverage') if data.get('branch_coverage') else {'covered': 0, 'missed': 0}
+    }
+
+
+@pytest.fixture(scope='module')
+def coverage_data(tmp_path_factory):
+    xml_path = tmp_path_factory.mktemp('jacoco') / 'jacoco.xml'
+    with gzip.open(SAMPLE_REPORT, 'rb') as src, open(xml_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return parse_coverage_xml(str(xml_path))
+
+
+def _signature(rng, package_name, clazz_dir, method_name, parameter_tuple):
+    # 参数类型用 # 分隔包名、大小写和空格不固定，解析时统一
+    parameters = []
+    for parameter in parameter_tuple:
+        if '.' in parameter and rng.random() < 0.5:
+            parameter = '#'.join(parameter.rsplit('.', 1))
+        if rng.random() < 0.5:
+            parameter = parameter.upper()
+        parameters.append(parameter if rng.random() < 0.7 else f' {parameter}')
+    class_name = clazz_dir[len(package_name) + 1:] if package_name else clazz_dir
+    return f"{package_name}#{class_name}#{method_name}({','.join(parameters)})"
+
+
+def _signatures(coverage_data):
+    rng = random.Random(0)
+    for package_name, package_data in coverage_data.items():
+        for clazz_dir, class_data in package_data.items():
+            if clazz_dir.endswith('.java'):
+                continue
+            for method_name, method_data in class_data.items():
+                for parameter_tuple in method_data:
+                    yield _signature(rng, package_name, clazz_dir, method_name, parameter_tuple)
+                    # 找不到的方法：参数个数不同或者方法名不同
+                    yield _signature(rng, package_name, clazz_dir, method_name, parameter_tuple + ('int',))
+                    yield _signature(rng, package_name, clazz_dir, method_name + 'X', parameter_tuple)
+    yield 'org.missing#Gone#foo()'
+
+
+def test_signature_lookup_matches_nested_lookup(coverage_data):
+    coverage_index = method_coverage_index(coverage_data)
+    found = 0
+    for method_signature in _signatures(coverage_data):
+        assert analyze_method_signature_for_coverage(method_signature) == old_analyze_method_signature(method_signature)
+        expected = old_get_covage_info(coverage_data, method_signature)
+        assert get_covage_info(coverage_index, method_signature) == expected
+        found += expected is not None
+    assert found > 0
+
+
+def test_coverage_key():
+    signature = parse_method_signature('org.a#B#foo(java.lang#String, INT)')
+    assert signature.coverage_key == ('org.a', 'org/a/B', 'foo', ('java.lang.string', 'int'))
+    assert parse_method_signature('org.a#B#foo(java.lang#String, INT)') is signature
+
+
+def test_empty_coverage():
+    assert method_coverage_index(None) == {}
@@ -0,0 +1,158 @@
+"""行号 bitset 和原来基于 set 的覆盖率计算结果一致"""
+import random
+from types import SimpleNamespace
+
+from core.base_method import Method
+# 不直接导入 TestProgram，否则 pytest 会把它当作测试类收集
+from core import base_test_program
+from core.line_bitmap import bits_to_lines, lines_to_bits, span_to_bits
+from utils._coverage_utils import get_coverage_data, really_called, update_coverage
+
+
+def _random_lines(rng, size=200):
+    return set(rng.sample(range(1, size), rng.randint(0, min(40, size - 1))))
+
+
+def test_bitset_operations_match_set_operations():
+    rng = random.Random(0)
+    for _ in range(500):
+        left, right = _random_lines(rng), _random_lines(rng)
+        left_bits, right_bits = lines_to_bits(left), lines_to_bits(right)
+        assert bits_to_lines(left_bits) == left
+        assert bits_to_lines(lines_to_bits(sorted(left))) == left
+        assert bits_to_lines(left_bits & right_bits) == left & right
+        assert bits_to_lines(left_bits | right_bits) == left | right
+        assert left_bits.bit_count() == len(left)
+
+
+def test_span_matches_range():
+    for first_line in range(0, 6):
+        for last_line in range(first_line - 2, 10):
+            expected = set(range(first_line, last_line + 1))
+            assert bits_to_lines(span_to_bits(first_line, last_line)) == expected
+            assert bits_to_lines(lines_to_bits(range(first_line, last_line + 1))) == expected
+
+
+def _new_method(first_line, last_line, package_name='org.p', file_name='A.java'):
+    method = Method('foo', 'org.p.A.foo', SimpleNamespace(name=package_name), None, [], '', 'void', None)
+    method.belong_file = SimpleNamespace(file_name=file_name)
+    method.set_line_span(first_line, last_line)
+    return method
+
+
+def test_line_set_views():
+    method = _new_method(3, 6)
+    assert method.line_range == frozenset({3, 4, 5, 6})
+    assert method.covered_lines == frozenset()
+
+    expected = set()
+    rng = random.Random(1)
+    for _ in range(20):
+        new_lines = _random_lines(rng, 20)
+        method.add_covered_lines(new_lines)
+        expected |= new_lines
+        assert method.covered_lines == expected
+    method.add_covered_lines(lines_to_bits({50}))
+    assert 50 in method.covered_lines
+
+    method.line_range = [1, 2, 8]
+    assert method.line_bits == lines_to_bits({1, 2, 8})
+    assert method.line_range == {1, 2, 8}
+
+
+def old_really_called(method, test_case):
+    '''改造之前基于 set 的实现'''
+    coverage = test_case.coverage
+    if not method.belong_package or not method.belong_file:
+        return False
+    covered_all = coverage.get(method.belong_package.name)
+    if not covered_all:
+        return False
+    covered_all = covered_all.get(method.belong_file.file_name)
+    if not covered_all:
+        return False
+    if 'line' in covered_all.keys():
+        covered_all = covered_all.get('line')
+    covered_by_case = covered_all.get('coverage_line')
+    if covered_by_case is None:
+        return False
+    return len(set(covered_by_case).intersection(set(method.line_range))) > 0
+
+
+def _random_coverage(rng, total_lines):
+    '''total_lines: {(包名, 源文件名): total_line}，同一个源文件在每个测试中的 total_line 相同'''
+    coverage = {}
+    for (package_name, file_name), total_line in total_lines.items():
+        if rng.random() < 0.2:
+            continue
+        line = {'total_line': sorted(total_line)}
+        if rng.random() < 0.9:
+            line['coverage_line'] = sorted(i for i in total_line if rng.random() < 0.3)
+        coverage.setdefault(package_name, {})[file_name] = {'line': line, 'branch': {}}
+    return coverage
+
+
+FILES = [('org.p', 'A.java'), ('org.p', 'B.java'), ('org.q', 'A.java')]
+
+
+def _random_total_lines(rng):
+    return {key: set(i for i in range(1, 120) if rng.random() < 0.6) for key in FILES}
+
+
+def test_really_called_matches_set_intersection():
+    rng = random.Random(2)
+    total_lines = _random_total_lines(rng)
+    for _ in range(300):
+        first_line = rng.randint(1, 110)
+        package_name, file_name = rng.choice(FILES + [('org.r', 'C.java')])
+        method = _new_method(first_line, first_line + rng.randint(-1, 15), package_name, file_name)
+        test_case = base_test_program.TestProgram('', None, coverage=_random_coverage(rng, total_lines))
+        assert really_called(method, test_case) == old_really_called(method, test_case)
+
+
+def old_update_file_coverage(all_methods_in_package, new_test_case, is_llm=False):
+    '''改造之前 update_coverage 中按方法逐个计算覆盖行的部分'''
+    for single_target in all_methods_in_package:
+        covered_all = get_coverage_data(new_test_case.coverage, single_target.get_package_name(), single_target.belong_file.file_name)
+        if covered_all is None:
+            continue
+        covered_by_case = covered_all.get('coverage_line')
+        if covered_by_case is None:
+            continue
+        total_line = covered_all.get('total_line')
+        single_target.line_range = list(set(single_target.line_range).intersection(set(total_line)))
+        covered_by_case_in_target = set(covered_by_case).intersection(set(single_target.line_range))
+        if len(covered_by_case_in_target) > 0:
+            single_target.add_covered_tests(new_test_case)
+            new_test_case.add_covered_function(single_target)
+            single_target.add_covered_lines(covered_by_case_in_target)
+            if is_llm:
+                single_target.add_covered_by_llm(covered_by_case_in_target)
+
+
+def test_update_coverage_matches_set_based_coverage():
+    rng = random.Random(3)
+    for _ in range(10):
+        total_lines = _random_total_lines(rng)
+        spans = []
+        for _ in range(30):
+            first_line = rng.randint(1, 110)
+            spans.append((first_line, first_line + rng.randint(0, 15)) + rng.choice(FILES))
+        old_methods = [_new_method(*span) for span in spans]
+        new_methods = [_new_method(*span) for span in spans]
+
+        for _ in range(8):
+            coverage = _random_coverage(rng, total_lines)
+            is_llm = rng.random() < 0.5
+            old_case = base_test_program.TestProgram('', None, coverage=coverage)
+            new_case = base_test_program.TestProgram('', None, coverage=coverage)
+            old_update_file_coverage(old_methods, old_case, is_llm)
+            update_coverage(new_methods, {}, {}, new_case, [], is_llm)
+
+            assert sorted(map(old_methods.index, old_case.covered_functions)) == \
+                sorted(map(new_methods.index, new_case.covered_functions))
+            for old_method, new_method in zip(old_methods, new_methods):
+                assert new_method.line_range == set(old_method.line_range)
+                assert new_method.covered_lines == old_method.covered_lines
+                assert new_method.newly_covered_by_llm == old_method.newly_covered_by_llm
+                assert len(new_method.covered_tests) == len(old_method.covered_tests)
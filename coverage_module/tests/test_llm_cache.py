@@ -0,0 +1,70 @@
+"""LLMCache 的 LRU 淘汰和不扫描整张表的条目计数"""
+import itertools
+
+import pytest
+
+import utils._llm_cache as llm_cache_module
+from utils._llm_cache import LLMCache
+
+
+@pytest.fixture(autouse=True)
+def fake_clock(monkeypatch):
+    # 每次取时间都严格递增，淘汰顺序不依赖系统时钟的精度
+    clock = itertools.count(1)
+    monkeypatch.setattr(llm_cache_module.time, 'time', lambda: float(next(clock)))
+
+
+def _table_count(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _keys(cache):
+    return set(row[0] for row in cache._conn.execute("SELECT key FROM responses"))
+
+
+def test_count_follows_inserts_and_replacements(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'), max_entries=10)
+    for i in range(5):
+        cache.put(f'k{i}', 'model', f'r{i}')
+    cache.put('k2', 'model', 'replaced')
+    assert len(cache) == _table_count(cache) == 5
+    assert cache.get('k2') == 'replaced'
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'), max_entries=3)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, 'model', key)
+    # 读过的 a 比 b 更新，插入 d 时淘汰 b
+    assert cache.get('a') == 'a'
+    cache.put('d', 'model', 'd')
+    assert _keys(cache) == {'a', 'c', 'd'}
+    assert cache.get('b') is None
+    assert len(cache) == _table_count(cache) == 3
+    cache.close()
+
+
+def test_count_survives_reopen_and_shrinking_limit(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    cache = LLMCache(db_path, max_entries=10)
+    for i in range(8):
+        cache.put(f'k{i}', 'model', f'r{i}')
+    cache.close()
+
+    cache = LLMCache(db_path, max_entries=4)
+    assert len(cache) == 8
+    # 超出上限的部分在下一次插入时一起淘汰，只保留最近的条目
+    cache.put('k8', 'model', 'r8')
+    assert len(cache) == _table_count(cache) == 4
+    assert _keys(cache) == {'k5', 'k6', 'k7', 'k8'}
+    cache.close()
+
+
+def test_stats(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'), max_entries=10)
+    cache.put('a', 'model', 'a')
+    cache.get('a')
+    cache.get('missing')
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+    cache.close()
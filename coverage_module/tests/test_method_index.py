@@ -0,0 +1,85 @@
+"""MethodIndex.resolve 和原来 update_coverage 中按名字、参数个数逐个比较的做法结果一致"""
+import random
+
+from core.base_method import Class, Method
+from utils._method_index import MethodIndex
+
+
+def old_resolve(method_map, class_map, func):
+    '''改造之前 update_coverage 中的查找'''
+    called_function = method_map.get(func)
+    if called_function is not None:
+        return [called_function]
+    called_class = class_map.get('.'.join(func[0].split('.')[:-1]))
+    if called_class is None:
+        return []
+    return [
+        maybe_method for maybe_method in called_class.methods
+        if func[0] == maybe_method.name and len(func[1]) == len(maybe_method.parameters_list)
+    ]
+
+
+TYPES = ['int', 'java.lang.string', 'long', 'java.util.list']
+
+
+def _new_method(class_name, method_name, parameters):
+    return Method(method_name, f'{class_name}.{method_name}', None, None, list(parameters), '', 'void', None)
+
+
+def _random_class(rng, class_name, method_map):
+    classs = Class(class_name, None, class_name.split('.')[-1], '', None)
+    for _ in range(rng.randint(0, 8)):
+        parameters = tuple(rng.choice(TYPES) for _ in range(rng.randint(0, 3)))
+        method = _new_method(class_name, rng.choice(['foo', 'bar', 'baz']), parameters)
+        classs.add_method(method)
+        # 有的方法不在 method_map 中，只能通过所属的类找到
+        if rng.random() < 0.7:
+            method_map[(method.name, parameters)] = method
+    return classs
+
+
+def _random_queries(rng, class_names):
+    for _ in range(200):
+        class_name = rng.choice(class_names + ['org.missing.Gone'])
+        parameters = tuple(rng.choice(TYPES) for _ in range(rng.randint(0, 3)))
+        yield (f"{class_name}.{rng.choice(['foo', 'bar', 'baz', 'qux'])}", parameters)
+
+
+def _same(left, right):
+    return sorted(map(id, left)) == sorted(map(id, right))
+
+
+def test_resolve_matches_name_and_arity_fallback():
+    rng = random.Random(0)
+    for _ in range(20):
+        method_map, class_map = {}, {}
+        class_names = [f'org.p{i % 2}.C{i}' for i in range(5)]
+        for class_name in class_names:
+            class_map[class_name] = _random_class(rng, class_name, method_map)
+        index = MethodIndex(method_map, class_map)
+        for func in _random_queries(rng, class_names):
+            assert _same(index.resolve(func), old_resolve(method_map, class_map, func))
+
+
+def test_resolve_follows_class_map_updates():
+    rng = random.Random(1)
+    method_map, class_map = {}, {}
+    class_names = ['org.p.A', 'org.p.B']
+    for class_name in class_names:
+        class_map[class_name] = _random_class(rng, class_name, method_map)
+    index = MethodIndex(method_map, class_map)
+    list(index.resolve(func) for func in _random_queries(rng, class_names))
+
+    # 类对象被替换 (例如生成的测试类加入 class_map)、已有的类新增方法、新增类
+    class_map['org.p.A'] = _random_class(rng, 'org.p.A', method_map)
+    class_map['org.p.B'].add_method(_new_method('org.p.B', 'qux', ('int',)))
+    class_map['org.p.C'] = _random_class(rng, 'org.p.C', method_map)
+    class_names.append('org.p.C')
+    for func in _random_queries(rng, class_names):
+        assert _same(index.resolve(func), old_resolve(method_map, class_map, func))
+
+
+def test_owner_name():
+    index = MethodIndex({}, {})
+    assert index.owner_name('org.a.B.foo') == 'org.a.B'
+    assert index.owner_name('foo') == ''
@@ -549,8 +549,8 @@ def add_maven_plugin(
         return False
 
 
-def update_surefire_plugin_configuration(pom_path: str) -> bool:
-    """更新 maven-surefire-plugin 的 configuration。"""
+def update_surefire_plugin_configuration(pom_path: str, fork_timeout: int = 600) -> bool:
+    """更新 maven-surefire-plugin 的 configuration。fork_timeout 为 forkedProcessTimeoutInSeconds。"""
     if not os.path.exists(pom_path):
         logger.error(f"pom.xml not found: {pom_path}")
         return False
@@ -609,7 +609,7 @@ def update_surefire_plugin_configuration(pom_path: str) -> bool:
             config = etree.SubElement(surefire, f"{ns}configuration")
 
         for key, value in [
-            ("forkedProcessTimeoutInSeconds", "600"),
+            ("forkedProcessTimeoutInSeconds", str(fork_timeout)),
             ("reuseForks", "false"),
         ]:
             elem = config.find(f"maven:{key}", namespaces)
@@ -629,7 +629,7 @@ def update_surefire_plugin_configuration(pom_path: str) -> bool:
 # ================================
 # 5. 主接口函数
 # ================================
-def add_maven_dependencies_for_jdk(jdk_version: str, pom_path: str) -> bool:
+def add_maven_dependencies_for_jdk(jdk_version: str, pom_path: str, surefire_fork_timeout: int = 600) -> bool:
     """
     为指定 JDK 版本添加所有测试依赖。
     使用预扫描机制，确保幂等性和避免版本冲突。
@@ -693,7 +693,7 @@ def add_maven_dependencies_for_jdk(jdk_version: str, pom_path: str) -> bool:
                 )
 
         # 5. 更新 Surefire 配置
-        update_surefire_plugin_configuration(pom_path)
+        update_surefire_plugin_configuration(pom_path, surefire_fork_timeout)
 
         return True, pom_content
 
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG, code_base, logger
+
+
+# 修改了 extract_file_facts / find_call_method 等分析逻辑之后需要递增，旧的缓存随之失效
+ANALYZER_VERSION = '2'
+
+
+def content_hash(raw_data):
+    return hashlib.sha256(raw_data).hexdigest()
+
+
+def project_fingerprint(file_hashes):
+    '''file_hashes: {相对路径: 内容 hash}；跨文件的调用分析结果只有在所有文件都不变时才能复用'''
+    digest = hashlib.sha256(ANALYZER_VERSION.encode('utf-8'))
+    for rel_path in sorted(file_hashes):
+        digest.update(f'{rel_path}\0{file_hashes[rel_path]}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    On-disk cache of the static analysis of one source tree.
+
+    files: {内容 hash: extract_file_facts 的结果}，文件内容不变时跳过解码之外的全部解析
+    calls: 调用分析的结果，以 project_fingerprint 为 key，只保留最近一次
+    整个缓存是一个 pickle 文件，写入时先写临时文件再替换，中途退出不会留下损坏的缓存。
+    """
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.files = {}
+        self.calls_fingerprint = None
+        self.calls = None
+        self.used_hashes = set()
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable analysis cache {self.cache_path}: {e}")
+            return
+        if data.get('version') != ANALYZER_VERSION:
+            return
+        self.files = data['files']
+        self.calls_fingerprint = data['calls_fingerprint']
+        self.calls = data['calls']
+
+    def get_file_facts(self, file_hash):
+        facts = self.files.get(file_hash)
+        if facts is not None:
+            self.used_hashes.add(file_hash)
+        return facts
+
+    def put_file_facts(self, file_hash, facts):
+        self.files[file_hash] = facts
+        self.used_hashes.add(file_hash)
+        self.dirty = True
+
+    def get_calls(self, fingerprint):
+        return self.calls if self.calls_fingerprint == fingerprint else None
+
+    def put_calls(self, fingerprint, calls):
+        self.calls_fingerprint = fingerprint
+        self.calls = calls
+        self.dirty = True
+
+    def save(self):
+        # 只保留这次用到的文件，删除的和改动之前的版本不再占空间
+        if set(self.files) != self.used_hashes:
+            self.files = {k: v for k, v in self.files.items() if k in self.used_hashes}
+            self.dirty = True
+        if not self.dirty:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    'version': ANALYZER_VERSION,
+                    'files': self.files,
+                    'calls_fingerprint': self.calls_fingerprint,
+                    'calls': self.calls,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.dirty = False
+
+
+def get_analysis_cache(source_root):
+    '''每个源码目录一个缓存文件；配置中 analysis_cache 为 false 时返回 None'''
+    if not CONFIG.get('analysis_cache', True):
+        return None
+    cache_dir = CONFIG.get('analysis_cache_dir', os.path.join(code_base, 'data', 'analysis_cache'))
+    source_root = os.path.abspath(source_root)
+    cache_name = f'{os.path.basename(source_root)}-{hashlib.sha1(source_root.encode("utf-8")).hexdigest()[:12]}.pkl'
+    return AnalysisCache(os.path.join(cache_dir, cache_name))
@@ -40,12 +40,94 @@ def to_jave_bytecode_types(c_str: str):
         raise NotImplementedError("class type %s not implemented yet" % c_str)
 
 
-def parse_coverage_xml(coverage_report):
+
+def parse_method_desc(desc: str):
+    """
+    Converts a JaCoCo method descriptor to the parameter tuple used as key in coverage_data.
+
+    Args:
+        desc (str): 字节码形式的方法描述符，例如 (Ljava/lang/String;I)V
+
+    Raises:
+        NotImplementedError: 不支持的变量类型，请联系开发人员
+
+    Returns:
+        tuple: 小写的参数类型元组，例如 ('java.lang.string', 'java.lang.integer')
+    """
+    pattern = r"\(.*?\)"
+    parameters = re.findall(pattern, desc)[0][1:-1]
+    raw_param_list = parameters.split(";")
+    parameter_list = []
+
+    for param_str in raw_param_list:
+        if param_str == "":
+            continue
+        else:
+            param_stack = []
+
+            for i in range(len(param_str)):
+                c_str = param_str[i]
+                if c_str == "[":
+                    param_stack.append(c_str)
+                    continue
+                elif c_str == "L":
+                    param_stack.append(param_str[i:])
+                    res = "".join(param_stack)
+                    parameter_list.append(
+                        to_jave_bytecode_types(res).lower()
+                    )
+                    param_stack.clear()
+                    break
+                elif c_str in ["B", "C", "D", "F", "I", "J", "Z", "S"]:
+                    param_stack.append(c_str)
+                    pass
+                else:
+                    raise NotImplementedError(
+                        "Class Type %s not implemented yet." % c_str
+                    )
+                res = "".join(param_stack)
+                parameter_list.append(
+                    to_jave_bytecode_types(res).lower()
+                )
+                param_stack.clear()
+
+    tmp_list = []
+    for i in parameter_list:
+        if "/" in i:
+            tmp_list.append(i.split("/")[-1])
+        else:
+            tmp_list.append(i)
+    return tuple(tmp_list)
+
+
+def _normalize_allow_list(packages, classes):
+    """
+    allow-list 同时接受 . 和 / 两种形式，统一转成 jacoco 报告中的形式
+
+    Returns:
+        allowed_packages: / 形式的包名集合，None 表示不过滤
+        allowed_classes: / 形式的顶层类名集合，None 表示包内所有类
+    """
+    if packages is None and classes is None:
+        return None, None
+    allowed_packages = set(i.replace('.', '/') for i in packages) if packages is not None else set()
+    allowed_classes = None
+    if classes is not None:
+        allowed_classes = set(i.replace('.', '/').split('$')[0] for i in classes)
+        allowed_packages.update(i.rsplit('/', 1)[0] if '/' in i else '' for i in allowed_classes)
+    return allowed_packages, allowed_classes
+
+
+def parse_coverage_xml(coverage_report, packages=None, classes=None):
     """
     Load and parse the JaCoCo XML coverage report
 
+    报告按 iterparse 流式读取，每个类和源文件处理完之后立刻释放；allow-list 之外的包和类直接跳过。
+
     Args:
         coverage_report (str): jacoco生成的覆盖率报告路径
+        packages (Iterable[str], optional): 只保留这些包，例如 org.jfree.chart
+        classes (Iterable[str], optional): 只保留这些类 (包括其内部类)，例如 org.jfree.chart.JFreeChart
 
     Raises:
         NotImplementedError: 不支持的变量类型，请联系开发人员
@@ -53,134 +135,162 @@ def parse_coverage_xml(coverage_report):
     Returns:
         dict: 经过分析之后的jacoco覆盖率指标
     """
-    tree = ET.parse(coverage_report)
-    root = tree.getroot()
+    allowed_packages, allowed_classes = _normalize_allow_list(packages, classes)
+    allowed_sourcefiles = None
+    if allowed_classes is not None and not packages:
+        allowed_sourcefiles = set(i.split('/')[-1] + '.java' for i in allowed_classes)
+
+    coverage_data = defaultdict()
+    # 同一个报告中描述符大量重复，只在这次解析中缓存
+    desc_cache = {}
+    package_data = None
+    for event, elem in ET.iterparse(coverage_report, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == "package":
+                package_dir = elem.attrib["name"]
+                if allowed_packages is not None and package_dir not in allowed_packages:
+                    package_data = None
+                else:
+                    package_data = coverage_data[package_dir.replace('/', '.')] = defaultdict()
+            continue
+        # class / sourcefile 处理完之后立刻释放子树，内存峰值只和最大的类或源文件有关
+        if tag == "class":
+            if package_data is not None:
+                _collect_class(elem, package_data, allowed_classes, desc_cache)
+            elem.clear()
+        elif tag == "sourcefile":
+            if package_data is not None:
+                _collect_sourcefile(elem, package_data, allowed_sourcefiles)
+            elem.clear()
+        elif tag == "package":
+            package_data = None
+            elem.clear()
+    return coverage_data
+
+
+def _collect_class(clazz, package_data, allowed_classes, desc_cache):
+    clazz_name = clazz.attrib["name"]
+    if allowed_classes is not None and clazz_name.split('$')[0] not in allowed_classes:
+        return
+    class_data = None
+    for method in clazz.iter("method"):
+        if class_data is None:
+            class_data = package_data[clazz_name] = defaultdict()
+        method_name = method.attrib["name"]
+        desc = method.attrib["desc"]
+        parameter_tuple = desc_cache.get(desc)
+        if parameter_tuple is None:
+            parameter_tuple = desc_cache[desc] = parse_method_desc(desc)
+        if method_name not in class_data:
+            class_data[method_name] = defaultdict()
+        method_data = class_data[method_name][parameter_tuple] = defaultdict()
+        method_data["line_coverage"] = None
+        method_data["branch_coverage"] = None
+        for counter in method.iter("counter"):
+            counter_type = counter.attrib["type"]
+            if counter_type == "LINE" and method_data["line_coverage"] is None:
+                method_data["line_coverage"] = counter.attrib
+            elif counter_type == "BRANCH" and method_data["branch_coverage"] is None:
+                method_data["branch_coverage"] = counter.attrib
+
+
+def _collect_sourcefile(sourcefile, package_data, allowed_sourcefiles):
+    '''
+    <line nr="52" mi="5" ci="0" mb="0" cb="0"/>
+    nr 属性：表示代码中的行号。
+    mi 属性：missed instruction
+    ci 属性：covered instruction
+    mb 属性：missed branch
+    cb 属性：covered branch
+    '''
+    sourcefile_name = sourcefile.attrib["name"]
+    if allowed_sourcefiles is not None and sourcefile_name not in allowed_sourcefiles:
+        return
+    coverage_line = []
+    total_line = []
+    branch_data = defaultdict()
+    for line in sourcefile.iter("line"):
+        attrib = line.attrib
+        nr = int(attrib["nr"])
+        if attrib["ci"] != "0":
+            coverage_line.append(nr)
+        total_line.append(nr)
+        if attrib["mb"] != "0" or attrib["cb"] != "0":
+            mb = int(attrib["mb"])
+            cb = int(attrib["cb"])
+            branch_data[nr] = {
+                "total": mb + cb,
+                "covered": cb
+            }
+    if total_line:
+        line_data = defaultdict()
+        line_data['coverage_line'] = coverage_line
+        line_data['total_line'] = total_line
+        package_data[sourcefile_name] = {
+            "line" : line_data,
+            "branch" : branch_data
+        }
+
+
+def _counter_attrib(counter_type, missed, covered):
+    """jacoco.xml 中只有 missed + covered > 0 的 counter 才会出现，这里保持一致"""
+    if missed + covered == 0:
+        return None
+    return {"type": counter_type, "missed": str(missed), "covered": str(covered)}
+
+
+def parse_coverage_json(coverage_json):
+    """
+    Convert the coverage sent back by the persistent test runner (runner/WiseUTRunner.java)
+    into the same structure returned by parse_coverage_xml.
+
+    Args:
+        coverage_json (dict): {package: {"sourcefiles": {...}, "classes": {...}}}
 
+    Returns:
+        dict: 经过分析之后的jacoco覆盖率指标
+    """
     coverage_data = defaultdict()
-    # Iterate over the packages in the XML and collect data
-    for package in root.findall(".//package"):
-        package_name = package.attrib["name"]
+    desc_cache = {}
+    for package_name, package in coverage_json.items():
         package_name = package_name.replace('/', '.')
         coverage_data[package_name] = defaultdict()
 
-        '''
-        <line nr="52" mi="5" ci="0" mb="0" cb="0"/>
-        nr 属性：表示代码中的行号。
-        mi 属性：missed instruction
-        ci 属性：covered instruction
-        mb 属性：missed branch
-        cb 属性：covered branch
-        '''
-        for sourcefile in package.findall(".//sourcefile"):
-            sourcefile_name = sourcefile.attrib["name"]
-            if sourcefile.findall(".//line"):
-                coverage_data[package_name][sourcefile_name] = {
-                    "line" : defaultdict(),
-                    "branch" : defaultdict()
+        for sourcefile_name, lines in package["sourcefiles"].items():
+            if not lines:
+                continue
+            coverage_data[package_name][sourcefile_name] = {
+                "line" : defaultdict(),
+                "branch" : defaultdict()
+            }
+            coverage_line = []
+            total_line = []
+            for nr, mi, ci, mb, cb in lines:
+                if ci > 0:
+                    coverage_line.append(nr)
+                total_line.append(nr)
+
+                if mb > 0 or cb > 0:
+                    coverage_data[package_name][sourcefile_name]["branch"][nr] = {
+                        "total": mb + cb,
+                        "covered": cb
+                    }
+            coverage_data[package_name][sourcefile_name]["line"]['coverage_line'] = coverage_line
+            coverage_data[package_name][sourcefile_name]["line"]['total_line'] = total_line
+
+        for clazz_name, methods in package["classes"].items():
+            if not methods:
+                continue
+            coverage_data[package_name][clazz_name] = defaultdict()
+            for method_name, desc, line_missed, line_covered, branch_missed, branch_covered in methods:
+                parameter_tuple = desc_cache.get(desc)
+                if parameter_tuple is None:
+                    parameter_tuple = desc_cache[desc] = parse_method_desc(desc)
+                if method_name not in coverage_data[package_name][clazz_name]:
+                    coverage_data[package_name][clazz_name][method_name] = defaultdict()
+                coverage_data[package_name][clazz_name][method_name][parameter_tuple] = {
+                    "line_coverage": _counter_attrib("LINE", line_missed, line_covered),
+                    "branch_coverage": _counter_attrib("BRANCH", branch_missed, branch_covered),
                 }
-                
-                coverage_data[package_name][sourcefile_name]
-                coverage_line = []
-                total_line = []
-                
-                covered_branch = []
-                total_branch = []
-                for line in sourcefile.findall(".//line"):
-                    nr = int(line.attrib["nr"])
-                    mi = int(line.attrib["mi"])
-                    ci = int(line.attrib["ci"])
-                    mb = int(line.attrib["mb"])
-                    cb = int(line.attrib["cb"])
-                    if ci > 0:
-                        coverage_line.append(nr)
-                    total_line.append(nr)
-                    
-                    if mb > 0 or cb > 0:
-                        coverage_data[package_name][sourcefile_name]["branch"][nr] = {
-                            "total": mb + cb,
-                            "covered": cb
-                        }
-
-                coverage_data[package_name][sourcefile_name]["line"]['coverage_line'] = coverage_line
-                coverage_data[package_name][sourcefile_name]["line"]['total_line'] = total_line
-                
-        for clazz in package.findall(".//class"):
-            clazz_name = clazz.attrib["name"]
-            if clazz.findall(".//method"):
-                coverage_data[package_name][clazz_name] = defaultdict()
-
-                for method in clazz.findall(".//method"):
-                    method_name = method.attrib["name"]
-                    pattern = r"\(.*?\)"
-                    parameters = re.findall(pattern, method.attrib["desc"])[0][1:-1]
-                    raw_param_list = parameters.split(";")
-                    parameter_list = []
-
-                    for param_str in raw_param_list:
-                        if param_str == "":
-                            continue
-                        else:
-                            param_stack = []
-
-                            for i in range(len(param_str)):
-                                c_str = param_str[i]
-                                if c_str == "[":
-                                    param_stack.append(c_str)
-                                    continue
-                                elif c_str == "L":
-                                    param_stack.append(param_str[i:])
-                                    res = "".join(param_stack)
-                                    parameter_list.append(
-                                        to_jave_bytecode_types(res).lower()
-                                    )
-                                    param_stack.clear()
-                                    break
-                                elif c_str in ["B", "C", "D", "F", "I", "J", "Z", "S"]:
-                                    param_stack.append(c_str)
-                                    pass
-                                else:
-                                    raise NotImplementedError(
-                                        "Class Type %s not implemented yet." % c_str
-                                    )
-                                res = "".join(param_stack)
-                                parameter_list.append(
-                                    to_jave_bytecode_types(res).lower()
-                                )
-                                param_stack.clear()
-
-                    tmp_list = []
-                    for i in parameter_list:
-                        if "/" in i:
-                            tmp_list.append(i.split("/")[-1])
-                        else:
-                            tmp_list.append(i)
-                    parameter_tuple = tuple(tmp_list)
-
-                    if method_name not in coverage_data[package_name][clazz_name]:
-                        coverage_data[package_name][clazz_name][
-                            method_name
-                        ] = defaultdict()
-                    coverage_data[package_name][clazz_name][method_name][
-                        parameter_tuple
-                    ] = defaultdict()
-                    if method.find('.//counter[@type="LINE"]') is not None:
-                        coverage_data[package_name][clazz_name][method_name][
-                            parameter_tuple
-                        ]["line_coverage"] = method.find(
-                            './/counter[@type="LINE"]'
-                        ).attrib
-                    else:
-                        coverage_data[package_name][clazz_name][method_name][
-                            parameter_tuple
-                        ]["line_coverage"] = None
-                    if method.find('.//counter[@type="BRANCH"]') is not None:
-                        coverage_data[package_name][clazz_name][method_name][
-                            parameter_tuple
-                        ]["branch_coverage"] = method.find(
-                            './/counter[@type="BRANCH"]'
-                        ).attrib
-                    else:
-                        coverage_data[package_name][clazz_name][method_name][
-                            parameter_tuple
-                        ]["branch_coverage"] = None
     return coverage_data
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+
+sys.path.extend([".", ".."])
+from core.base_test_program import TestProgram
+from data.Config import CONFIG, code_base, logger
+from utils._fingerprint import content_tree_fingerprint
+
+
+# 快照中保存的内容或者 setup_existing_cases / update_coverage 的逻辑变化之后需要递增，旧的快照随之失效
+SNAPSHOT_VERSION = '1'
+
+
+def method_key(method):
+    '''方法在快照中的编号：(文件, 方法全名, 参数类型, 第一行)，不依赖对象的 id'''
+    first_line = min((int(i) for i in method.line_number), default=None)
+    file_path = method.belong_file.file_path if method.belong_file is not None else None
+    return (file_path, method.name, tuple(method.parameters_list), first_line)
+
+
+class BaselineSnapshot:
+    """
+    On-disk snapshot of the coverage baseline built from the existing tests of a project.
+
+    setup_existing_cases 之后每个方法的 line_bits / covered_bits / llm_bits、direct_programs 和 covered_tests，
+    以及这些 TestProgram 的内容、覆盖率和调用关系。方法用 method_key 编号，TestProgram 用在快照中的下标编号。
+    以源码 (不含测试)、测试目录的内容指纹以及影响执行结果的配置为 key，都没有变化时直接恢复，不再执行已有的测试；
+    只保存每个已有测试都得到了覆盖率的完整基线。
+    """
+    def __init__(self, snapshot_path, fingerprint):
+        self.snapshot_path = snapshot_path
+        self.fingerprint = fingerprint
+
+    def _load(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable baseline snapshot {self.snapshot_path}: {e}")
+            return None
+        if data.get('version') != SNAPSHOT_VERSION or data.get('fingerprint') != self.fingerprint:
+            return None
+        return data
+
+    def restore(self, all_methods_in_package, class_map):
+        '''把快照恢复到当前项目的方法上；没有可用的快照或者方法对应不上时返回 False，不修改任何方法'''
+        data = self._load()
+        if data is None:
+            return False
+        methods = {}
+        for method in all_methods_in_package:
+            key = method_key(method)
+            if key in methods:
+                logger.debug(f"Ambiguous method key {key}, ignoring baseline snapshot")
+                return False
+            methods[key] = method
+        snapshot_methods = [methods.get(key) for key in data['methods']]
+        if any(method is None for method in snapshot_methods):
+            logger.debug(f"Baseline snapshot does not match the analyzed methods, ignoring it")
+            return False
+
+        test_programs = []
+        for content, coverage, called_ids, covered_ids, called_method_and_class in data['tests']:
+            test_program = TestProgram(content=content, target_function=None, coverage=coverage)
+            for method_id in called_ids:
+                test_program.add_called_function(snapshot_methods[method_id])
+            for method_id in covered_ids:
+                test_program.add_covered_function(snapshot_methods[method_id])
+            for method_id, class_name in called_method_and_class:
+                test_program.add_called_method_and_class(snapshot_methods[method_id], class_map.get(class_name) if class_name is not None else None)
+            test_programs.append(test_program)
+
+        for method, (line_bits, covered_bits, llm_bits, direct_ids, covered_test_ids) in zip(snapshot_methods, data['states']):
+            method.line_bits = line_bits
+            method.covered_bits = covered_bits
+            method.llm_bits = llm_bits
+            for test_id in direct_ids:
+                method.add_direct_program(test_programs[test_id])
+            for test_id in covered_test_ids:
+                method.add_covered_tests(test_programs[test_id])
+        logger.debug(f"Restored baseline of {len(test_programs)} existing tests from {self.snapshot_path}")
+        return True
+
+    def save(self, all_methods_in_package):
+        methods = sorted(all_methods_in_package, key=lambda method: tuple('' if i is None else str(i) for i in method_key(method)))
+        method_ids = {method: method_id for method_id, method in enumerate(methods)}
+
+        # 从方法出发收集基线中的 TestProgram，按第一次出现的顺序编号
+        test_ids = {}
+        def test_id(test_program):
+            if test_program not in test_ids:
+                test_ids[test_program] = len(test_ids)
+            return test_ids[test_program]
+
+        states = []
+        for method in methods:
+            states.append((
+                method.line_bits,
+                method.covered_bits,
+                method.llm_bits,
+                [test_id(i) for i in method.direct_programs],
+                [test_id(i) for i in method.covered_tests],
+            ))
+        tests = []
+        for test_program in test_ids:
+            tests.append((
+                test_program.content,
+                test_program.coverage,
+                [method_ids[i] for i in test_program.called_functions if i in method_ids],
+                [method_ids[i] for i in test_program.covered_functions if i in method_ids],
+                [
+                    (method_ids[called_method], called_class.name if called_class is not None else None)
+                    for called_method, called_class in test_program.called_method_and_class
+                    if called_method in method_ids
+                ],
+            ))
+
+        snapshot_dir = os.path.dirname(self.snapshot_path)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    'version': SNAPSHOT_VERSION,
+                    'fingerprint': self.fingerprint,
+                    'methods': [method_key(i) for i in methods],
+                    'states': states,
+                    'tests': tests,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.debug(f"Saved baseline of {len(tests)} existing tests to {self.snapshot_path}")
+
+
+def get_baseline_snapshot(project_name, debugging_mode=False):
+    '''项目的基线快照；配置中 baseline_snapshot 为 false 时返回 None'''
+    if not CONFIG.get('baseline_snapshot', True):
+        return None
+    project_config = CONFIG['path_mappings'][project_name]
+    project_root = os.path.abspath(project_config['loc'])
+    test_root = os.path.join(project_root, project_config['test'])
+    # 源码指纹包括 pom.xml 和资源文件，不包括测试目录；测试目录单独计算
+    source_fingerprint = content_tree_fingerprint(project_root, excluded_paths=[project_config['test']])
+    test_fingerprint = content_tree_fingerprint(test_root)
+    # 影响基线结果的配置：执行方式以及超时
+    settings = json.dumps({
+        'debugging_mode': bool(debugging_mode),
+        'test_backend': CONFIG.get('test_backend', 'runner'),
+        'baseline_suite': CONFIG.get('baseline_suite', True),
+        'timeouts': CONFIG.get('timeouts', {}),
+    }, sort_keys=True)
+    settings_fingerprint = hashlib.sha1(settings.encode('utf-8')).hexdigest()[:12]
+    fingerprint = f'{source_fingerprint}-{test_fingerprint}-{settings_fingerprint}'
+
+    snapshot_dir = CONFIG.get('baseline_snapshot_dir', os.path.join(code_base, 'data', 'baseline_snapshot'))
+    snapshot_name = f'{project_name}-{hashlib.sha1(project_root.encode("utf-8")).hexdigest()[:12]}.pkl'
+    return BaselineSnapshot(os.path.join(snapshot_dir, snapshot_name), fingerprint)
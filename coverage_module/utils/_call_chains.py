@@ -0,0 +1,336 @@
+from array import array
+from collections import defaultdict
+
+
+# 和之前 find_all_chains 的 max_depth 相同：调用链最多 max_depth + 2 个方法
+MAX_CHAIN_DEPTH = 10
+# 每个目标方法最多枚举这么多条调用链，稠密的调用图上简单路径的数量是指数级的
+MAX_CHAINS_PER_TARGET = 1000
+
+
+def strongly_connected_components(nodes, successors):
+    """
+    迭代版的 Tarjan 算法 (调用链可能很深，递归版本会超过递归深度限制)。
+
+    Args:
+        nodes: 所有结点
+        successors: 结点 -> 后继结点列表
+
+    Returns:
+        dict: 结点 -> 所在强连通分量的编号
+    """
+    index = {}
+    low_link = {}
+    on_stack = set()
+    stack = []
+    component = {}
+    counter = 0
+    component_count = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low_link[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = low_link[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(successors.get(neighbor, ()))))
+                    break
+                if neighbor in on_stack:
+                    low_link[node] = min(low_link[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_link[parent] = min(low_link[parent], low_link[node])
+                if low_link[node] == index[node]:
+                    while True:
+                        top = stack.pop()
+                        on_stack.discard(top)
+                        component[top] = component_count
+                        if top is node:
+                            break
+                    component_count += 1
+    return component
+
+
+class CallChain:
+    """
+    一条调用链，按顺序是调用链上的 Method，可以像 tuple 一样取下标、遍历和求长度。
+
+    只保存引擎和 chain_id，方法在访问时才从后缀树中取出；相等和 hash 只比较 chain_id。
+    using_callee_chains 中保存的是 CallChain，used_callee_chains 只保存 chain_id。
+    """
+    __slots__ = ('engine', 'chain_id')
+
+    def __init__(self, engine, chain_id):
+        self.engine = engine
+        self.chain_id = chain_id
+
+    def __len__(self):
+        return self.engine._lengths[self.chain_id]
+
+    def __iter__(self):
+        engine = self.engine
+        node = self.chain_id
+        while node != -1:
+            yield engine.methods[engine._heads[node]]
+            node = engine._suffixes[node]
+
+    def __getitem__(self, index):
+        if index == 0:
+            return self.engine.methods[self.engine._heads[self.chain_id]]
+        return tuple(self)[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, CallChain):
+            return NotImplemented
+        return self.engine is other.engine and self.chain_id == other.chain_id
+
+    def __hash__(self):
+        return hash(self.chain_id)
+
+    def __repr__(self):
+        return f'CallChain({", ".join(method.name for method in self)})'
+
+
+class CallChainEngine:
+    """
+    按需枚举以某个方法结尾的调用链 (callee chain)，替代之前对每个方法预先 DFS 出全部路径的 find_all_chains。
+
+    调用链是 methods 中的某个方法经过若干次调用到达目标方法的简单路径，最多 max_depth + 2 个方法；
+    目标方法在环上 (所在的强连通分量有环) 时还包括只有它自己的链 (target,)，和之前的结果相同。
+    每个目标的调用链从目标出发沿调用者反向按层 (BFS) 生成，短的在前，生成过的结果缓存在引擎中，
+    之后的请求先复用缓存，不够时再继续生成；每个目标最多生成 max_chains 条。
+
+    方法按整数编号，调用链存成一棵后缀树：每条链只记录第一个方法的编号和去掉第一个方法之后那条链的编号，
+    以同一个目标结尾的链共享后缀。对外返回的 CallChain 只是 chain_id 的包装。
+    """
+    def __init__(self, methods, max_depth=MAX_CHAIN_DEPTH, max_chains=MAX_CHAINS_PER_TARGET):
+        self.max_length = max_depth + 2
+        self.max_chains = max_chains
+
+        # 调用图只包含从 methods 出发能到达的方法
+        successors = {}
+        work = list(methods)
+        while work:
+            method = work.pop()
+            if method in successors:
+                continue
+            successors[method] = list(method.called_methods)
+            work.extend(i for i in successors[method] if i not in successors)
+        self.reachable = set(successors)
+
+        # 方法 <-> 编号
+        self.methods = list(successors)
+        self.method_ids = {method: method_id for method_id, method in enumerate(self.methods)}
+        self.starts = set(self.method_ids[i] for i in methods)
+        self.callers = [[] for _ in self.methods]
+        for method, called_methods in successors.items():
+            for called_method in called_methods:
+                self.callers[self.method_ids[called_method]].append(self.method_ids[method])
+
+        component = strongly_connected_components(list(successors), successors)
+        component_size = defaultdict(int)
+        for method in successors:
+            component_size[component[method]] += 1
+        self.cyclic = set(
+            self.method_ids[method] for method, called_methods in successors.items()
+            if component_size[component[method]] > 1 or method in called_methods
+        )
+
+        # 后缀树：chain_id -> 第一个方法的编号 / 后缀的 chain_id (-1 表示没有后缀) / 链上方法的数量
+        self._heads = array('l')
+        self._suffixes = array('l')
+        self._lengths = array('B')
+        # 目标方法的编号 -> (已经生成的 chain_id, 继续生成的 generator)
+        self._chains = {}
+        # 目标方法的编号 -> 可能的起点
+        self._startpoints_cache = {}
+        # 目标方法的编号 -> 生成完之后按起点分组的调用链 (_chain_groups)
+        self._groups = {}
+
+    def is_cyclic(self, method):
+        return self.method_ids.get(method) in self.cyclic
+
+    def _new_chain(self, head, suffix):
+        self._heads.append(head)
+        self._suffixes.append(suffix)
+        self._lengths.append(self._lengths[suffix] + 1 if suffix != -1 else 1)
+        return len(self._heads) - 1
+
+    def _generate(self, target):
+        '''按长度从短到长生成以 target 结尾的调用链的 chain_id'''
+        root = self._new_chain(target, -1)
+        if target in self.cyclic and target in self.starts:
+            yield root
+        # 每一层是 (chain_id, 链上方法的编号)，后者只在生成期间用来保证是简单路径
+        layer = [(root, (target,))]
+        while layer and len(layer[0][1]) < self.max_length:
+            next_layer = []
+            for suffix, members in layer:
+                for caller in self.callers[members[0]]:
+                    if caller in members:
+                        continue
+                    chain_id = self._new_chain(caller, suffix)
+                    if caller in self.starts:
+                        yield chain_id
+                    next_layer.append((chain_id, (caller,) + members))
+            layer = next_layer
+
+    def _chain_ids(self, target):
+        '''以 target 结尾的调用链的 chain_id，短的在前；已经生成的部分直接复用'''
+        target_id = self.method_ids.get(target)
+        if target_id is None:
+            return
+        if target_id not in self._chains:
+            self._chains[target_id] = (array('l'), self._generate(target_id))
+        chain_ids = self._chains[target_id][0]
+        position = 0
+        while True:
+            if position < len(chain_ids):
+                # 已经生成的部分整段取出，生成的过程中 chain_ids 可能变长
+                end = len(chain_ids)
+                yield from chain_ids[position:end]
+                position = end
+                continue
+            generator = self._chains[target_id][1]
+            if generator is None:
+                return
+            chain_id = next(generator, None) if len(chain_ids) < self.max_chains else None
+            if chain_id is None:
+                # 生成完或者达到上限，释放 generator 持有的中间结果
+                self._chains[target_id] = (chain_ids, None)
+                return
+            chain_ids.append(chain_id)
+
+    def callee_chains(self, target):
+        '''以 target 结尾的调用链 (CallChain)，短的在前'''
+        for chain_id in self._chain_ids(target):
+            yield CallChain(self, chain_id)
+
+    def _startpoints(self, target):
+        '''
+        能作为以 target 结尾的调用链起点的方法编号：沿调用者反向 BFS 在 max_length - 1 步之内能到达的起点
+        (最短的路径一定是简单路径)，target 在环上时还包括它自己
+        '''
+        target_id = self.method_ids.get(target)
+        if target_id is None:
+            return frozenset()
+        if target_id not in self._startpoints_cache:
+            startpoints = set()
+            if target_id in self.cyclic and target_id in self.starts:
+                startpoints.add(target_id)
+            visited = {target_id}
+            layer = [target_id]
+            for _ in range(self.max_length - 1):
+                next_layer = []
+                for node in layer:
+                    for caller in self.callers[node]:
+                        if caller not in visited:
+                            visited.add(caller)
+                            next_layer.append(caller)
+                startpoints.update(i for i in next_layer if i in self.starts)
+                layer = next_layer
+            self._startpoints_cache[target_id] = frozenset(startpoints)
+        return self._startpoints_cache[target_id]
+
+    def _chain_groups(self, target_id):
+        '''
+        生成完 (或达到上限) 的调用链按起点分组，只计算一次：
+        (起点 -> [(chain_id, 长度, CallChain)]，组按起点第一次出现的顺序排列；chain_id -> 起点在组中的下标)
+        '''
+        if target_id not in self._groups:
+            heads = self._heads
+            lengths = self._lengths
+            groups = {}
+            for chain_id in self._chains[target_id][0]:
+                groups.setdefault(heads[chain_id], []).append((chain_id, lengths[chain_id], CallChain(self, chain_id)))
+            groups = list(groups.values())
+            shortest = []
+            for chains in groups:
+                shortest.append([chain for _, length, chain in chains if length == chains[0][1]])
+            owners = {chain_id: index for index, chains in enumerate(groups) for chain_id, _, _ in chains}
+            self._groups[target_id] = (groups, shortest, owners)
+        return self._groups[target_id]
+
+    def shortest_chains(self, target, exclude=()):
+        '''
+        每个起点 (调用链的第一个方法) 上最短的、不在 exclude 中的调用链，按起点第一次出现的顺序排列，
+        和之前 called_chain_filtering 对全部调用链的处理结果相同。exclude 是用过的 chain_id 的集合 (used_callee_chains)，直接查找，不复制。
+
+        调用链按长度生成，所有可能的起点都找到最短的链、并且已经越过这个长度之后就停止，不再生成更长的链；
+        只有某个起点的链全部在 exclude 中时才会一直生成到上限。生成完之后按起点分组缓存，
+        之后的请求只重新计算 exclude 涉及的起点。
+        '''
+        target_id = self.method_ids.get(target)
+        if target_id is None:
+            return []
+        entry = self._chains.get(target_id)
+        if entry is not None and entry[1] is None:
+            return self._shortest_from_groups(target_id, exclude)
+
+        heads = self._heads
+        lengths = self._lengths
+        remaining = len(self._startpoints(target))
+        shortest_length = {}
+        startpoint_chains = {}
+        longest_needed = 0
+        for chain_id in self._chain_ids(target):
+            length = lengths[chain_id]
+            if not remaining and length > longest_needed:
+                break
+            if chain_id in exclude:
+                continue
+            startpoint = heads[chain_id]
+            # chain_id 按长度排列，每个起点第一次出现时的长度就是它最短的长度
+            startpoint_length = shortest_length.get(startpoint)
+            if startpoint_length is None:
+                shortest_length[startpoint] = length
+                startpoint_chains[startpoint] = [CallChain(self, chain_id)]
+                remaining -= 1
+                if length > longest_needed:
+                    longest_needed = length
+            elif startpoint_length == length:
+                startpoint_chains[startpoint].append(CallChain(self, chain_id))
+        return [chain for chains in startpoint_chains.values() for chain in chains]
+
+    def _shortest_from_groups(self, target_id, exclude):
+        groups, shortest, owners = self._chain_groups(target_id)
+        affected = set(owners[i] for i in exclude if i in owners)
+        if not affected:
+            return [chain for chains in shortest for chain in chains]
+        # 受影响的起点从第一条没有排除的链开始取；排序的 key 是这条链的位置 (同一个起点的链按位置递增)
+        ordered = []
+        for index, chains in enumerate(groups):
+            if index not in affected:
+                ordered.append((chains[0][0], shortest[index]))
+                continue
+            kept = [(chain_id, length, chain) for chain_id, length, chain in chains if chain_id not in exclude]
+            if kept:
+                ordered.append((kept[0][0], [chain for _, length, chain in kept if length == kept[0][1]]))
+        ordered.sort(key=lambda item: item[0])
+        return [chain for _, chains in ordered for chain in chains]
+
+
+# 当前项目的调用链引擎；和 MethodIndex 一样只保留最近一个项目的
+_CALL_CHAIN_ENGINE = None
+
+
+def build_call_chain_engine(methods):
+    '''setup_single_package 建立调用关系之后调用一次'''
+    global _CALL_CHAIN_ENGINE
+    _CALL_CHAIN_ENGINE = CallChainEngine(methods)
+    return _CALL_CHAIN_ENGINE
+
+
+def get_call_chain_engine():
+    return _CALL_CHAIN_ENGINE
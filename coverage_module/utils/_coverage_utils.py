@@ -1,4 +1,10 @@
 import re
+import sys
+from functools import lru_cache
+from typing import NamedTuple
+
+from utils._method_index import get_method_index
+from utils._sourcefile_index import get_sourcefile_index
 
 def remove_content_in_parentheses(text):
     """
@@ -19,60 +25,110 @@ def remove_content_in_parentheses(text):
     return new_text
 
 
-def analyze_method_signature_for_coverage(method_signature):
+class MethodSignature(NamedTuple):
     """
-    根据待测函数签名，分析收集覆盖率时需要的一些信息，例如类名，包名，函数名，以及变量列表
-    Args:
-        method_signature: 函数签名
+    Parsed form of a method signature such as org.a#B#foo(java.lang#String,int).
 
-    Returns:
-        package_name: 包名
-        package_dir: 包名对应的jacoco路径
-        class_name: 类名
-        class_dir: 类名对应的jacoco路径
-        method_name: 函数名
-        parameter_tuple: 参数列表
+    前六项和 analyze_method_signature_for_coverage 原来返回的元组相同；字符串都经过 intern。
+    coverage_key 对应 coverage_data[package_name][clazz_dir][method_name][parameter_tuple] 这条路径，
+    配合 method_coverage_index 一次字典查询就能拿到覆盖率。
     """
+    package_name: str
+    package_dir: str
+    class_name: str
+    clazz_dir: str
+    method_name: str
+    parameter_tuple: tuple
+    coverage_key: tuple
+
+
+class ClassSignature(NamedTuple):
+    package_name: str
+    package_dir: str
+    class_name: str
+    clazz_dir: str
+
+
+@lru_cache(maxsize=None)
+def parse_method_signature(method_signature):
     parameters = re.findall(r"\(.*?\)", method_signature)[0][1:-1]
     parameter_list = [i for i in parameters.split(",") if i != ""]
     tmp_list = []
     for i in parameter_list:
         if "#" in i:
             i = i.replace("#", ".")
-        tmp_list.append(i.strip().lower())
+        tmp_list.append(sys.intern(i.strip().lower()))
 
     parameter_tuple = tuple(tmp_list)
-    package_name = method_signature.split("#")[0]
-    class_name = ".".join(method_signature.split("#")[:2])
+    package_name = sys.intern(method_signature.split("#")[0])
+    class_name = sys.intern(".".join(method_signature.split("#")[:2]))
 
     ## 测试覆盖率需要的条件
-    package_dir = package_name.replace(".", "/")
-    clazz_dir = class_name.replace(".", "/")
-    method_name = remove_content_in_parentheses(
+    package_dir = sys.intern(package_name.replace(".", "/"))
+    clazz_dir = sys.intern(class_name.replace(".", "/"))
+    method_name = sys.intern(remove_content_in_parentheses(
         "".join(method_signature.split("#")[2:])
-    )
-    return (
+    ))
+    return MethodSignature(
         package_name,
         package_dir,
         class_name,
         clazz_dir,
         method_name,
         parameter_tuple,
+        (package_name, clazz_dir, method_name, parameter_tuple),
     )
+
+
+@lru_cache(maxsize=None)
+def parse_class_signature(class_signature):
+    package_name = sys.intern(class_signature.split("#")[0])
+    class_name = sys.intern(".".join(class_signature.split("#")[:2]))
+
+    ## 测试覆盖率需要的条件
+    package_dir = sys.intern(package_name.replace(".", "/"))
+    clazz_dir = sys.intern(class_name.replace(".", "/"))
+    return ClassSignature(package_name, package_dir, class_name, clazz_dir)
+
+
+def analyze_method_signature_for_coverage(method_signature):
+    """
+    根据待测函数签名，分析收集覆盖率时需要的一些信息，例如类名，包名，函数名，以及变量列表
+    Args:
+        method_signature: 函数签名
+
+    Returns:
+        package_name: 包名
+        package_dir: 包名对应的jacoco路径
+        class_name: 类名
+        class_dir: 类名对应的jacoco路径
+        method_name: 函数名
+        parameter_tuple: 参数列表
+    """
+    return parse_method_signature(method_signature)[:6]
     
 def analyze_class_signature_for_coverage(class_signature):
-    package_name = class_signature.split("#")[0]
-    class_name = ".".join(class_signature.split("#")[:2])
+    return tuple(parse_class_signature(class_signature))
 
-    ## 测试覆盖率需要的条件
-    package_dir = package_name.replace(".", "/")
-    clazz_dir = class_name.replace(".", "/")
-    return (
-        package_name,
-        package_dir,
-        class_name,
-        clazz_dir,
-    )
+
+def method_coverage_index(coverage_data):
+    """
+    Flatten coverage_data into {MethodSignature.coverage_key: 方法的覆盖率}.
+
+    coverage_data 中和类并列的还有源文件 (xxx.java) 的行覆盖率，这里跳过。
+    coverage_data 为 None (编译失败、超时等没有覆盖率) 时返回空的 index。
+    """
+    index = {}
+    if not coverage_data:
+        return index
+    for package_name, package_data in coverage_data.items():
+        for clazz_dir, class_data in package_data.items():
+            if clazz_dir.endswith('.java'):
+                continue
+            for method_name, method_data in class_data.items():
+                for parameter_tuple, data in method_data.items():
+                    index[(package_name, clazz_dir, method_name, parameter_tuple)] = data
+    return index
 
 def get_coverage_data(coverage_data, package_name, sourcefile_name):
     '''从覆盖率数据中提取特定包和源文件的覆盖率信息'''
@@ -96,34 +152,12 @@ def really_called(method, test_case):
         bool: True if the method has been called by the test case, False otherwise.
     """
     # code implementation here
-    coverage = test_case.coverage
-    if method.belong_package:
-        package_name = method.belong_package.name
-    else:
+    if not method.belong_package or not method.belong_file:
         return False
-    if method.belong_file:
-        sourcefile_name = method.belong_file.file_name
-    else:
-        return False
-    
-    covered_all = coverage.get(package_name)
-    if not covered_all:
-        return False
-    covered_all = covered_all.get(sourcefile_name)
-    if not covered_all:
-        return False
-    if 'line' in covered_all.keys():
-        covered_all = covered_all.get('line')
-    covered_by_case = covered_all.get('coverage_line')
-    if covered_by_case is None:
+    covered_bits = test_case.covered_line_bits(method.belong_package.name, method.belong_file.file_name)
+    if covered_bits is None:
         return False
-
-    executed_lines = set(covered_by_case)
-    line_range = set(method.line_range)
-    function_executed_lines = executed_lines.intersection(line_range)
-    if len(function_executed_lines) > 0:
-        return True
-    pass
+    return bool(covered_bits & method.line_bits)
 
 def update_coverage(all_methods_in_package, method_map, class_map, new_test_case, case_called_functions, is_llm=False):
     """
@@ -137,50 +171,39 @@ def update_coverage(all_methods_in_package, method_map, class_map, new_test_case
         is_llm (bool, optional): Flag indicating whether the test case is for low-level module (LLM). Defaults to False.
     """
     # Implementation details...
+    method_index = get_method_index(method_map, class_map)
     for func in case_called_functions:
-        # 如果存在的话，在当前module的function dict里找对应的函数
-        called_function = method_map.get(func)              
-        # 如果不存在，就在class里找
-        if called_function is None:
-            called_functions = []
-            called_class_name = '.'.join(func[0].split('.')[:-1])
-            called_class = class_map.get(called_class_name)
-            if called_class is None:
-                continue
-            method_name = func[0]
-            arguments_list = list(func[1])
-            arguments_list_len = len(arguments_list)
-            for maybe_method in called_class.methods:
-                if method_name == maybe_method.name and arguments_list_len == len(maybe_method.parameters_list):
-                    called_functions.append(maybe_method)
-        else:
-            called_functions = [called_function]
-                # 如果找到了,先判断是不是覆盖了，再加入called function
+        # 先在 method_map 里精确匹配，不存在的话在所属的类里按名字和参数个数找
+        called_functions = method_index.resolve(func)
+        if not called_functions:
+            continue
+        called_class = method_index.owner_class(func[0])
+        # 如果找到了,先判断是不是覆盖了，再加入called function
         for called_function in called_functions:
             if really_called(called_function, new_test_case):
                 new_test_case.add_called_function(called_function)
                 called_function.add_direct_program(new_test_case)
-                called_class_name = '.'.join(func[0].split('.')[:-1])
-                called_class = class_map.get(called_class_name)
                 new_test_case.add_called_method_and_class(called_function, called_class)
             
-    for single_target in all_methods_in_package:
-        package_name = single_target.get_package_name()
-        sourcefile_name = single_target.belong_file.file_name
-                
-        covered_all = get_coverage_data(new_test_case.coverage, package_name, sourcefile_name)
-        if covered_all is None:
-            continue
-                
-        covered_by_case = covered_all.get('coverage_line')
-        if covered_by_case is None:
-            continue
-        total_line = covered_all.get('total_line')
-        single_target.line_range = list(set(single_target.line_range).intersection(set(total_line)))
-        covered_by_case_in_target = set(covered_by_case).intersection(set(single_target.line_range))
-        if len(covered_by_case_in_target) > 0: 
-            single_target.add_covered_tests(new_test_case)
-            new_test_case.add_covered_function(single_target)
-            single_target.add_covered_lines(covered_by_case_in_target)
-            if is_llm:
-                single_target.add_covered_by_llm(covered_by_case_in_target)
\ No newline at end of file
+    # 从覆盖率报告出发，只处理报告中出现、并且在 all_methods_in_package 中有方法的源文件
+    sourcefile_index = get_sourcefile_index(all_methods_in_package)
+    for package_name, package_data in new_test_case.coverage.items():
+        for sourcefile_name in package_data:
+            file_methods = sourcefile_index.methods_in(package_name, sourcefile_name)
+            if not file_methods:
+                continue
+            covered_bits = new_test_case.covered_line_bits(package_name, sourcefile_name)
+            if covered_bits is None:
+                continue
+            if not sourcefile_index.is_normalized(package_name, sourcefile_name):
+                sourcefile_index.normalize(package_name, sourcefile_name, new_test_case.total_line_bits(package_name, sourcefile_name))
+            if not covered_bits:
+                continue
+            for single_target in file_methods:
+                covered_by_case_in_target = covered_bits & single_target.line_bits
+                if covered_by_case_in_target:
+                    single_target.add_covered_tests(new_test_case)
+                    new_test_case.add_covered_function(single_target)
+                    single_target.add_covered_lines(covered_by_case_in_target)
+                    if is_llm:
+                        single_target.add_covered_by_llm(covered_by_case_in_target)
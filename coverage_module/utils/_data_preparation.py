@@ -1,7 +1,10 @@
 import os
 import json
+from collections import defaultdict
+from functools import lru_cache
 
 from data.Config import CONFIG
+from utils._coverage_utils import analyze_class_signature_for_coverage, analyze_method_signature_for_coverage
 
 def find_java_files(directory):
     java_files = []
@@ -74,6 +77,53 @@ def load_focal_class(project_name, package):
             # print(1)
     return fm_sigs
 
+# (文件路径, 签名字段) -> (mtime, 索引)，focal method / focal class 文件在一次运行中只读一次
+_FOCAL_INDEXES = {}
+
+
+@lru_cache(maxsize=None)
+def focal_method_key(method_signature):
+    '''(包名, 类名, 方法名, 参数个数)，get_callable_methods 按这几项把项目中的方法和 focal method 对应起来'''
+    (package_name, _, class_name, _, method_name, parameter_tuple) = analyze_method_signature_for_coverage(method_signature)
+    return package_name, class_name, method_name, len(parameter_tuple)
+
+
+@lru_cache(maxsize=None)
+def focal_class_key(class_signature):
+    (package_name, _, class_name, _) = analyze_class_signature_for_coverage(class_signature)
+    return package_name, class_name
+
+
+def _load_focal_index(source_file, signature_field, make_key):
+    if not os.path.exists(source_file):
+        print('Focal method file not found.')
+        return {}
+    mtime = os.path.getmtime(source_file)
+    cached = _FOCAL_INDEXES.get((source_file, signature_field))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    index = defaultdict(list)
+    with open(source_file, 'r', encoding='utf-8') as reader:
+        for line in reader:
+            if line.strip() == '':
+                continue
+            inst = json.loads(line.strip())
+            index[make_key(inst[signature_field])].append(inst['head_test'])
+    index = dict(index)
+    _FOCAL_INDEXES[(source_file, signature_field)] = (mtime, index)
+    return index
+
+def load_focal_method_index(project_name):
+    '''
+    整个项目的 focal method，以 focal_method_key 为 key，值是 head_test 的列表 (和文件中的顺序一致)。
+    和 load_focal_method 不同，文件只读一次，不需要每个包都读一遍。
+    '''
+    return _load_focal_index(CONFIG['path_mappings'][project_name]['focal_method'], 'sourceMethodSignature', focal_method_key)
+
+def load_focal_class_index(project_name):
+    '''整个项目的 focal class，以 focal_class_key 为 key'''
+    return _load_focal_index(CONFIG['path_mappings'][project_name]['focal_class'], 'sourceClassSignature', focal_class_key)
+
 def load_packages(project_name):
     packages = []
     source_file = CONFIG['path_mappings'][project_name]['focal_method']
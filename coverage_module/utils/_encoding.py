@@ -0,0 +1,47 @@
+import codecs
+import hashlib
+import threading
+
+import chardet
+
+
+# chardet 是纯 Python 实现，只在 utf-8 和配置的编码都失败时使用，并且只检测文件开头的这么多字节
+CHARDET_PREFIX_BYTES = 64 * 1024
+
+# 内容 hash -> chardet 检测出的编码，同一个文件 (例如 focal class) 被反复读取时只检测一次
+_DETECTED_ENCODINGS = {}
+_DETECTED_ENCODINGS_LOCK = threading.Lock()
+
+
+def detect_encoding(raw_data):
+    '''用 chardet 检测 raw_data 开头一段的编码，结果按内容 hash 缓存'''
+    file_hash = hashlib.sha256(raw_data).hexdigest()
+    with _DETECTED_ENCODINGS_LOCK:
+        if file_hash in _DETECTED_ENCODINGS:
+            return _DETECTED_ENCODINGS[file_hash]
+    encoding = chardet.detect(raw_data[:CHARDET_PREFIX_BYTES])['encoding']
+    with _DETECTED_ENCODINGS_LOCK:
+        _DETECTED_ENCODINGS[file_hash] = encoding
+    return encoding
+
+
+def decode_java_source(raw_data, encoding=None):
+    """
+    Decode the bytes of a source file.
+
+    依次尝试 utf-8 (严格模式)、项目配置的编码 (path_mappings 中的 encoding)，都失败时再用 chardet 检测。
+    返回 (源码, 实际使用的编码)，解码失败时抛出异常。
+    """
+    if raw_data.startswith(codecs.BOM_UTF8):
+        return raw_data.decode('utf-8-sig'), 'utf-8-sig'
+    try:
+        return raw_data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    if encoding:
+        try:
+            return raw_data.decode(encoding), encoding
+        except (UnicodeDecodeError, LookupError):
+            pass
+    detected = detect_encoding(raw_data)
+    return raw_data.decode(detected), detected
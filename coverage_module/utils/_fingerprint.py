@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+from utils._prepared_pom import PREPARED_POM_NAME
+
+
+SKIPPED_DIRS = {'target', '.git', '.idea', '.svn'}
+# prepare_pom 生成的 pom 只取决于 pom.xml，不参与计算
+SKIPPED_FILES = {PREPARED_POM_NAME}
+
+
+def source_tree_fingerprint(project_root, skipped_dirs=SKIPPED_DIRS):
+    """
+    Cheap fingerprint of a project tree, used to decide whether a full maven build is needed.
+
+    普通文件只看 (相对路径, 大小, mtime)；pom.xml 按内容计算，只改动 mtime 不会触发重新构建。
+    """
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(project_root):
+        dirs[:] = sorted(i for i in dirs if i not in skipped_dirs)
+        for file_name in sorted(files):
+            if file_name in SKIPPED_FILES:
+                continue
+            file_path = os.path.join(root, file_name)
+            rel_path = os.path.relpath(file_path, project_root)
+            try:
+                if file_name == 'pom.xml':
+                    with open(file_path, 'rb') as f:
+                        digest.update(f'{rel_path}\0'.encode('utf-8') + hashlib.sha1(f.read()).digest())
+                else:
+                    stat = os.stat(file_path)
+                    digest.update(f'{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode('utf-8'))
+            except OSError:
+                continue
+    return digest.hexdigest()
+
+
+def content_tree_fingerprint(root, skipped_dirs=SKIPPED_DIRS, excluded_paths=()):
+    """
+    Fingerprint of a tree by file contents, stable across runs that rewrite files with the same content.
+
+    已有测试在每次运行中都会被删除再写回，mtime 会变化，跨进程复用的结果 (例如基线覆盖率快照) 需要按内容计算。
+    excluded_paths: 不参与计算的子目录 (相对 root)
+    """
+    excluded_paths = set(os.path.normpath(i) for i in excluded_paths)
+    digest = hashlib.sha1()
+    for dir_path, dirs, files in os.walk(root):
+        dirs[:] = sorted(
+            i for i in dirs
+            if i not in skipped_dirs and os.path.normpath(os.path.relpath(os.path.join(dir_path, i), root)) not in excluded_paths
+        )
+        for file_name in sorted(files):
+            if file_name in SKIPPED_FILES:
+                continue
+            file_path = os.path.join(dir_path, file_name)
+            rel_path = os.path.relpath(file_path, root)
+            try:
+                with open(file_path, 'rb') as f:
+                    digest.update(f'{rel_path}\0'.encode('utf-8') + hashlib.sha1(f.read()).digest())
+            except OSError:
+                continue
+    return digest.hexdigest()
@@ -0,0 +1,237 @@
+import os
+import shlex
+import struct
+import sys
+from collections import namedtuple
+
+sys.path.extend([".", ".."])
+from data.Config import logger
+from utils._analyze_jacoco_output import parse_coverage_xml
+from utils._process import get_timeout, run_command
+
+
+'''
+jacoco.exec 的格式 (org.jacoco.core.data.ExecutionDataWriter)，全部为 big endian：
+
+    BLOCK_HEADER         0x01  char magic (0xC0C0)  char version (0x1007)
+    BLOCK_SESSIONINFO    0x10  UTF id  long start  long dump
+    BLOCK_EXECUTIONDATA  0x11  long class id  UTF class name  boolean[] probes
+
+UTF 为 java 的 modified UTF-8 (2 字节长度前缀)；boolean[] 先写 varint 长度，再按每字节 8 个、低位在前打包。
+'''
+BLOCK_HEADER = 0x01
+BLOCK_SESSIONINFO = 0x10
+BLOCK_EXECUTIONDATA = 0x11
+MAGIC_NUMBER = 0xC0C0
+FORMAT_VERSION = 0x1007
+
+SessionInfo = namedtuple('SessionInfo', ['id', 'start', 'dump'])
+ExecutionData = namedtuple('ExecutionData', ['id', 'name', 'probes'])
+
+
+class _ExecInput:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def eof(self):
+        return self.pos >= len(self.data)
+
+    def read(self, size):
+        if self.pos + size > len(self.data):
+            raise ValueError('Unexpected end of execution data')
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def read_byte(self):
+        return self.read(1)[0]
+
+    def read_char(self):
+        return struct.unpack('>H', self.read(2))[0]
+
+    def read_long(self):
+        return struct.unpack('>q', self.read(8))[0]
+
+    def read_utf(self):
+        raw = self.read(self.read_char())
+        # modified UTF-8: \0 编码为 C0 80，补充平面字符编码为两个代理项
+        text = raw.replace(b'\xc0\x80', b'\x00').decode('utf-8', 'surrogatepass')
+        return text.encode('utf-16', 'surrogatepass').decode('utf-16')
+
+    def read_varint(self):
+        value = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80 == 0:
+                return value
+            shift += 7
+
+    def read_boolean_array(self):
+        length = self.read_varint()
+        packed = self.read((length + 7) // 8)
+        return [bool(packed[i >> 3] & (1 << (i & 7))) for i in range(length)]
+
+
+def parse_exec_data(data):
+    """
+    Decode the content of a jacoco.exec file (or a dump received from the tcpserver output mode).
+
+    Args:
+        data (bytes): jacoco.exec 的原始内容，可能是多次 dump 拼接在一起的
+
+    Raises:
+        ValueError: 不是合法的 jacoco execution data
+
+    Returns:
+        sessions: SessionInfo 列表
+        execution_data: {class name: ExecutionData}，同一个类的多条记录按 probe 合并
+    """
+    exec_input = _ExecInput(data)
+    sessions = []
+    execution_data = {}
+    while not exec_input.eof():
+        block_type = exec_input.read_byte()
+        if block_type == BLOCK_HEADER:
+            if exec_input.read_char() != MAGIC_NUMBER:
+                raise ValueError('Invalid execution data file')
+            version = exec_input.read_char()
+            if version != FORMAT_VERSION:
+                raise ValueError(f'Incompatible execution data version 0x{version:x}')
+        elif block_type == BLOCK_SESSIONINFO:
+            sessions.append(SessionInfo(exec_input.read_utf(), exec_input.read_long(), exec_input.read_long()))
+        elif block_type == BLOCK_EXECUTIONDATA:
+            class_id = exec_input.read_long()
+            name = exec_input.read_utf()
+            probes = exec_input.read_boolean_array()
+            existing = execution_data.get(name)
+            if existing is not None and existing.id == class_id and len(existing.probes) == len(probes):
+                probes = [a or b for a, b in zip(existing.probes, probes)]
+            execution_data[name] = ExecutionData(class_id, name, probes)
+        else:
+            raise ValueError(f'Unknown block type 0x{block_type:x}')
+    return sessions, execution_data
+
+
+def read_exec_file(exec_path):
+    with open(exec_path, 'rb') as f:
+        return parse_exec_data(f.read())
+
+
+def _write_utf(out, text):
+    utf16 = text.encode('utf-16-be', 'surrogatepass')
+    # 按 UTF-16 代码单元逐个编码，补充平面字符会变成两个代理项，和 java 的 writeUTF 一致
+    code_units = ''.join(chr(i) for i in struct.unpack(f'>{len(utf16) // 2}H', utf16))
+    raw = code_units.encode('utf-8', 'surrogatepass').replace(b'\x00', b'\xc0\x80')
+    out.append(struct.pack('>H', len(raw)))
+    out.append(raw)
+
+
+def _write_varint(out, value):
+    while value & ~0x7F:
+        out.append(bytes([0x80 | (value & 0x7F)]))
+        value >>= 7
+    out.append(bytes([value]))
+
+
+def dump_exec_data(sessions, execution_data):
+    '''parse_exec_data 的逆过程，返回 jacoco.exec 格式的 bytes'''
+    out = [struct.pack('>BHH', BLOCK_HEADER, MAGIC_NUMBER, FORMAT_VERSION)]
+    for session in sessions:
+        out.append(bytes([BLOCK_SESSIONINFO]))
+        _write_utf(out, session.id)
+        out.append(struct.pack('>qq', session.start, session.dump))
+    for data in execution_data.values():
+        out.append(bytes([BLOCK_EXECUTIONDATA]))
+        out.append(struct.pack('>q', data.id))
+        _write_utf(out, data.name)
+        _write_varint(out, len(data.probes))
+        packed = bytearray((len(data.probes) + 7) // 8)
+        for i, hit in enumerate(data.probes):
+            if hit:
+                packed[i >> 3] |= 1 << (i & 7)
+        out.append(bytes(packed))
+    return b''.join(out)
+
+
+def get_sourcefile_packages(sourcefiles):
+    '''org/foo/Bar.java -> org/foo，默认包为空字符串'''
+    return {os.path.dirname(i) for i in sourcefiles}
+
+
+def filter_execution_data(execution_data, packages):
+    '''只保留 packages (jacoco 的 / 形式) 中的类'''
+    return {name: data for name, data in execution_data.items() if os.path.dirname(name) in packages}
+
+
+def restrict_coverage(coverage_data, sourcefiles):
+    """
+    只保留 sourcefiles 中源文件的覆盖率；类级别的数据保留这些源文件所在包中的全部类
+    """
+    packages = get_sourcefile_packages(sourcefiles)
+    restricted = {}
+    for package_name, package in coverage_data.items():
+        package_dir = package_name.replace('.', '/')
+        if package_dir not in packages:
+            continue
+        kept = {}
+        for name, value in package.items():
+            if name.endswith('.java') and (f'{package_dir}/{name}' if package_dir else name) not in sourcefiles:
+                continue
+            kept[name] = value
+        if kept:
+            restricted[package_name] = kept
+    return restricted
+
+
+def collect_exec_coverage(project_root, exec_path, sourcefiles, cli_jar):
+    """
+    Build coverage_data for the given source files straight from jacoco.exec, instead of
+    rendering the report of the whole project with `mvn jacoco:report`.
+
+    execution data 先按包过滤，然后只对这些包下的 class 文件调用 jacoco cli 进行分析。
+
+    Args:
+        project_root (str): 项目根目录
+        exec_path (str): jacoco.exec 路径
+        sourcefiles (set): 需要的源文件，形如 org/foo/Bar.java
+        cli_jar (str): org.jacoco.cli nodeps jar 的路径
+
+    Returns:
+        dict: 和 parse_coverage_xml 结构相同的覆盖率；分析失败时返回 None
+    """
+    if not os.path.exists(exec_path):
+        return None
+    try:
+        sessions, execution_data = read_exec_file(exec_path)
+    except ValueError as e:
+        logger.warning(f"Failed to read {exec_path}: {e}")
+        return None
+
+    classes_dir = os.path.join(project_root, 'target', 'classes')
+    packages = get_sourcefile_packages(sourcefiles)
+    class_dirs = [os.path.join(classes_dir, i) for i in sorted(packages) if i and os.path.isdir(os.path.join(classes_dir, i))]
+    if not class_dirs:
+        return {}
+
+    target_dir = os.path.dirname(exec_path)
+    filtered_exec_path = os.path.join(target_dir, 'jacoco-filtered.exec')
+    with open(filtered_exec_path, 'wb') as f:
+        f.write(dump_exec_data(sessions, filter_execution_data(execution_data, packages)))
+
+    xml_output = os.path.join(target_dir, 'jacoco-filtered.xml')
+    if os.path.exists(xml_output):
+        os.remove(xml_output)
+    command = ['java', '-jar', cli_jar, 'report', filtered_exec_path, '--xml', xml_output]
+    for class_dir in class_dirs:
+        command.extend(['--classfiles', class_dir])
+    cli_result = run_command(shlex.join(command), project_root, timeout=get_timeout('report'))
+    if cli_result.timed_out:
+        logger.warning(f"jacoco cli report timed out after {get_timeout('report')}s")
+        return None
+    if cli_result.returncode != 0 or not os.path.exists(xml_output):
+        logger.warning(f"jacoco cli report failed: {cli_result.stderr}")
+        return None
+    return restrict_coverage(parse_coverage_xml(xml_output), sourcefiles)
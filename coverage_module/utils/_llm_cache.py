@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG, code_base, logger
+
+
+def make_cache_key(model, temperature, max_tokens, messages):
+    """
+    Content address of one chat completion request.
+
+    system prompt 作为 messages 的第一条参与计算；json 按 key 排序，保证同样的请求得到同样的 key。
+    """
+    payload = json.dumps({
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "messages": messages,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent LLM response cache backed by SQLite.
+
+    以 make_cache_key 的结果为 key，重复运行同一个实验时直接复用之前的回复。
+    条目数超过 max_entries 时按最近访问时间淘汰 (LRU)。多个线程共享同一个连接，读写都在锁内。
+    条目数只在打开时 COUNT 一次，之后随插入和淘汰更新，put 时不再扫描整张表。
+    """
+    make_key = staticmethod(make_cache_key)
+
+    def __init__(self, db_path, max_entries=100000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self._lock:
+            # 按主键查找，替换已有的条目时条目数不变
+            exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            if not exists:
+                self._count += 1
+            self._evict()
+
+    def _evict(self):
+        if self._count <= self.max_entries:
+            return
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+            (self._count - self.max_entries,)
+        )
+        self._count -= cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_LLM_CACHE = None
+_LLM_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache():
+    '''配置中 llm_cache 为 false 时返回 None，关闭缓存'''
+    global _LLM_CACHE
+    if not CONFIG.get('llm_cache', True):
+        return None
+    with _LLM_CACHE_LOCK:
+        if _LLM_CACHE is None:
+            db_path = CONFIG.get('llm_cache_path', os.path.join(code_base, 'data', 'llm_cache.sqlite'))
+            _LLM_CACHE = LLMCache(db_path, CONFIG.get('llm_cache_max_entries', 100000))
+            logger.debug(f"LLM response cache at {db_path}, {len(_LLM_CACHE)} entries")
+        return _LLM_CACHE
@@ -0,0 +1,172 @@
+import atexit
+import json
+import os
+import shlex
+import sys
+import threading
+import time
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG, code_base, logger
+from utils._prepared_pom import prepare_pom_with_hash
+from utils._process import get_timeout, run_command
+
+
+# 本地仓库准备好之后写入的标记，记录对应的 pom 以及准备时测得的联网 / 离线耗时
+OFFLINE_MARKER = '.wiseut-offline.json'
+# mvn 每次都是新的 JVM，只跑很短的时间：只用 C1 编译，复用 CDS 归档，缩短启动时间
+DEFAULT_MAVEN_OPTS = '-XX:+TieredCompilation -XX:TieredStopAtLevel=1 -Xshare:auto'
+DEFAULT_MAVEN_THREADS = '1C'
+# go-offline 解析不到 clean / surefire provider 以及命令行上直接调用的插件，用一次不执行任何测试的构建补齐，
+# 同一条命令联网和离线各执行一次，两者的耗时差就是离线模式每次调用节省的时间
+WARMUP_ARGUMENTS = (
+    'clean -Dmaven.clean.skip=true '
+    'org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest=WiseUTOfflineWarmup '
+    '-Dsurefire.failIfNoSpecifiedTests=false -DfailIfNoSpecifiedTests=false -DfailIfNoTests=false '
+    'org.jacoco:jacoco-maven-plugin:report dependency:build-classpath'
+)
+
+# 原 pom 的 hash -> MavenOffline，准备失败时为 None (这次运行中不再重试)
+_OFFLINE = {}
+_OFFLINE_LOCK = threading.Lock()
+# 离线模式下的调用次数、总耗时以及估计节省的时间
+_STATS = {'invocations': 0, 'seconds': 0.0, 'saved': 0.0}
+_STATS_LOCK = threading.Lock()
+
+
+def get_repository_root():
+    return CONFIG.get('maven_repo_dir', os.path.join(code_base, 'data', 'm2'))
+
+
+class MavenOffline:
+    """
+    Options for running maven offline against a project-scoped local repository.
+
+    本地仓库以原 pom 的 hash 区分，同一个项目的多个 workspace 共用；准备好之后每次调用都带上
+    -o -T 以及 -Dmaven.repo.local (不执行测试时再加上 -q)，不再检查远程仓库的元数据和 SNAPSHOT 更新，没有网络时也能执行。
+    """
+    def __init__(self, repository, online_seconds, offline_seconds):
+        self.repository = repository
+        self.online_seconds = online_seconds
+        self.offline_seconds = offline_seconds
+
+    @property
+    def options(self):
+        threads = CONFIG.get('maven_threads', DEFAULT_MAVEN_THREADS)
+        options = f'-o -B -Dmaven.repo.local={shlex.quote(self.repository)}'
+        return f'{options} -T {threads}' if threads else options
+
+    @property
+    def quiet_options(self):
+        '''-q 会去掉 surefire 的 Tests run / Failures 等输出，只用于不执行测试的调用'''
+        return f'{self.options} -q'
+
+    @property
+    def env(self):
+        env = dict(os.environ)
+        env['MAVEN_OPTS'] = CONFIG.get('maven_opts', DEFAULT_MAVEN_OPTS)
+        return env
+
+    @property
+    def saved_per_invocation(self):
+        '''准备时同一条命令联网和离线的耗时差'''
+        return max(0.0, self.online_seconds - self.offline_seconds)
+
+
+def _run_timed(command, project_root, env=None):
+    '''准备阶段的每条命令和编译一样使用 compile 的超时，超时记为失败'''
+    start = time.time()
+    result = run_command(command, project_root, env=env, timeout=get_timeout('compile'))
+    if result.timed_out:
+        result.returncode = -1
+        result.stdout += f"\nTimed out after {get_timeout('compile')}s"
+    return result, time.time() - start
+
+
+def _load_marker(repository, source_hash):
+    try:
+        with open(os.path.join(repository, OFFLINE_MARKER), 'r', encoding='utf-8') as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if marker.get('source_hash') != source_hash:
+        return None
+    return MavenOffline(repository, marker['online_seconds'], marker['offline_seconds'])
+
+
+def _prepare_repository(project_root, pom_path, source_hash, repository):
+    '''把依赖和插件解析到 repository 中，并验证离线时能完成一次构建；失败时返回 None'''
+    logger.debug(f"Resolving maven dependencies of {pom_path} into {repository}")
+    os.makedirs(repository, exist_ok=True)
+    online_base = f'mvn -f {shlex.quote(pom_path)} -B -Dmaven.repo.local={shlex.quote(repository)}'
+    go_offline, go_offline_seconds = _run_timed(f'{online_base} dependency:go-offline', project_root)
+    if go_offline.returncode != 0:
+        logger.warning(f"dependency:go-offline failed for {project_root}, running maven online:\n{go_offline.stdout[-2000:]}")
+        return None
+
+    online, online_seconds = _run_timed(f'{online_base} {WARMUP_ARGUMENTS}', project_root)
+    # 联网时都没有完成，补齐的依赖和插件不完整，不写入标记，之后的运行照常联网执行
+    if online.returncode != 0:
+        logger.warning(f"Maven warm-up build failed for {project_root}, running maven online:\n{online.stdout[-2000:]}")
+        return None
+    offline = MavenOffline(repository, online_seconds, 0.0)
+    offline_result, offline_seconds = _run_timed(f'mvn -f {shlex.quote(pom_path)} {offline.options} {WARMUP_ARGUMENTS}', project_root, offline.env)
+    # 联网时能完成、离线时失败说明还有没有解析到的依赖
+    if offline_result.returncode != 0:
+        logger.warning(f"Offline maven build failed for {project_root}, running maven online:\n{offline_result.stdout[-2000:]}")
+        return None
+    offline.offline_seconds = offline_seconds
+
+    with open(os.path.join(repository, OFFLINE_MARKER), 'w', encoding='utf-8') as f:
+        json.dump({
+            'source_hash': source_hash,
+            'pom': pom_path,
+            'go_offline_seconds': go_offline_seconds,
+            'online_seconds': online_seconds,
+            'offline_seconds': offline_seconds,
+        }, f)
+    logger.debug(f"Prepared offline maven repository {repository}: {online_seconds:.1f}s online vs {offline_seconds:.1f}s offline per build")
+    return offline
+
+
+def get_maven_offline(project_root):
+    """
+    项目对应的离线设置，必要时先准备本地仓库 (需要网络，每个 pom 只准备一次，跨运行复用)
+
+    Returns:
+        MavenOffline；配置 maven_offline 为 false、没有 pom.xml 或者准备失败时返回 None，由调用方照常联网执行
+    """
+    if not CONFIG.get('maven_offline', True):
+        return None
+    pom_path, source_hash = prepare_pom_with_hash(project_root)
+    if source_hash is None:
+        return None
+    with _OFFLINE_LOCK:
+        if source_hash in _OFFLINE:
+            return _OFFLINE[source_hash]
+        repository = os.path.join(get_repository_root(), source_hash[:16])
+        offline = _load_marker(repository, source_hash)
+        if offline is None:
+            offline = _prepare_repository(project_root, pom_path, source_hash, repository)
+        _OFFLINE[source_hash] = offline
+        return offline
+
+
+def record_offline_invocation(offline, arguments, seconds):
+    with _STATS_LOCK:
+        _STATS['invocations'] += 1
+        _STATS['seconds'] += seconds
+        _STATS['saved'] += offline.saved_per_invocation
+    logger.debug(f"mvn {arguments.split(' -')[0]} took {seconds:.1f}s offline (~{offline.saved_per_invocation:.1f}s saved)")
+
+
+def report_offline_savings():
+    with _STATS_LOCK:
+        if _STATS['invocations'] == 0:
+            return
+        logger.info(
+            f"Offline maven: {_STATS['invocations']} invocations in {_STATS['seconds']:.1f}s, "
+            f"~{_STATS['saved']:.1f}s saved ({_STATS['saved'] / _STATS['invocations']:.1f}s per invocation)"
+        )
+
+atexit.register(report_offline_savings)
@@ -0,0 +1,89 @@
+from collections import defaultdict
+
+
+class MethodIndex:
+    """
+    Constant-time method resolution on top of method_map / class_map.
+
+    method_map 以 (方法全名, 参数类型 tuple) 为 key，精确匹配失败时原来的做法是找到方法所属的类，
+    再逐个比较类中方法的名字和参数个数；这里为每个类预先按 (名字, 参数个数) 和名字分组。
+    method_map 和 class_map 直接引用，不复制：extract_called_functions 会把生成的测试类加入 class_map，
+    查询时发现类对象被替换或者方法数量变化就重新建这个类的分组。
+    """
+    def __init__(self, method_map, class_map):
+        self.method_map = method_map
+        self.class_map = class_map
+        # 方法全名 -> 所属类的全名
+        self._owner_names = {}
+        # 类全名 -> (Class, 方法数量, {(名字, 参数个数): [Method]}, {名字: [Method]})
+        self._classes = {}
+        for method_name, _ in method_map:
+            self.owner_name(method_name)
+        for class_name in class_map:
+            self._class_entry(class_name)
+
+    def owner_name(self, method_name):
+        '''org.a.B.foo -> org.a.B，和 '.'.join(method_name.split('.')[:-1]) 相同'''
+        owner = self._owner_names.get(method_name)
+        if owner is None:
+            owner = self._owner_names[method_name] = method_name.rpartition('.')[0]
+        return owner
+
+    def owner_class(self, method_name):
+        return self.class_map.get(self.owner_name(method_name))
+
+    def _class_entry(self, class_name):
+        classs = self.class_map.get(class_name)
+        if classs is None:
+            return None
+        entry = self._classes.get(class_name)
+        if entry is None or entry[0] is not classs or entry[1] != len(classs.methods):
+            by_arity = defaultdict(list)
+            by_name = defaultdict(list)
+            for method in classs.methods:
+                by_arity[(method.name, len(method.parameters_list))].append(method)
+                by_name[method.name].append(method)
+            entry = self._classes[class_name] = (classs, len(classs.methods), by_arity, by_name)
+        return entry
+
+    def get(self, signature):
+        '''signature: (方法全名, 参数类型 tuple)，精确匹配'''
+        return self.method_map.get(signature)
+
+    def methods_by_arity(self, class_name, method_name, arity):
+        entry = self._class_entry(class_name)
+        return entry[2].get((method_name, arity), []) if entry is not None else []
+
+    def methods_by_name(self, class_name, method_name):
+        entry = self._class_entry(class_name)
+        return entry[3].get(method_name, []) if entry is not None else []
+
+    def resolve(self, signature):
+        '''
+        精确匹配，找不到时退回到所属类中名字相同、参数个数相同的方法 (粗粒度，参数类型推断得不准时也能匹配上)。
+        返回 Method 列表，所属的类不在 class_map 中时为空。
+        '''
+        method = self.method_map.get(signature)
+        if method is not None:
+            return [method]
+        method_name, arguments_list = signature
+        return self.methods_by_arity(self.owner_name(method_name), method_name, len(arguments_list))
+
+
+# 当前项目的索引；项目是逐个处理的，只保留最近一个，避免持有之前项目的全部对象
+_METHOD_INDEX = None
+
+
+def build_method_index(method_map, class_map):
+    '''get_packages 之后调用一次'''
+    global _METHOD_INDEX
+    _METHOD_INDEX = MethodIndex(method_map, class_map)
+    return _METHOD_INDEX
+
+
+def get_method_index(method_map, class_map):
+    '''返回这两个 map 对应的索引，还没有建立时在这里建立'''
+    index = _METHOD_INDEX
+    if index is None or index.method_map is not method_map or index.class_map is not class_map:
+        index = build_method_index(method_map, class_map)
+    return index
@@ -4,7 +4,6 @@ import pickle
 import re
 import sys
 
-import chardet
 import javalang
 import javalang.tree
 
@@ -12,6 +11,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
+from utils._encoding import decode_java_source
 from utils._java_parser import (
     parse_import_stmts_from_file_code,
     parse_methods_from_class_node,
@@ -181,9 +181,7 @@ def aggeragate_imports_mvn(project_src_root_dir, class_sig, imports, methods):
     try:
         with open(focal_class_file, 'rb') as file:
             raw_data = file.read()
-        result = chardet.detect(raw_data)
-        encoding = result['encoding']
-        focal_content = raw_data.decode(encoding)
+        focal_content, _ = decode_java_source(raw_data)
         focal_class_import.extend(parse_import_stmts_from_file_code(focal_content))
     except UnicodeDecodeError as e:
         print(f"UnicodeDecodeError: {e}")
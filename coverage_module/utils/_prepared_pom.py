@@ -0,0 +1,122 @@
+import hashlib
+import os
+import shlex
+import sys
+import tempfile
+import threading
+
+sys.path.extend([".", ".."])
+from lxml import etree
+from loguru import logger
+
+from utils._add_dependency_in_mvn import add_maven_dependencies_for_jdk, find_pom_xml
+from utils._process import get_surefire_fork_timeout
+
+
+# 和 pom.xml 放在同一个目录，parent 的 relativePath、modules 以及 ${basedir} 都和原来一致
+PREPARED_POM_NAME = '.wiseut-pom.xml'
+PREPARED_POM_JDK = 'jdk11'
+# 写在生成的 pom 末尾，记录它是由哪个版本的 pom.xml (以及 surefire 超时) 生成的
+SOURCE_HASH_MARKER = 'wiseut-source-pom-sha256:'
+
+# pom.xml 路径 -> (_prepared_key, 生成的 pom 路径或者 None)
+_PREPARED = {}
+_PREPARE_LOCK = threading.Lock()
+
+
+def _pom_hash(pom_content):
+    return hashlib.sha256((PREPARED_POM_JDK + '\0' + pom_content).encode('utf-8')).hexdigest()
+
+
+def _prepared_key(source_hash):
+    '''生成的 pom 还取决于补丁用到的配置 (surefire 的超时)'''
+    return f'{source_hash}:{get_surefire_fork_timeout()}'
+
+
+def _read_source_hash(prepared_path):
+    '''生成的 pom 中记录的原 pom hash；文件不存在或者不是生成的 pom 时返回 None'''
+    try:
+        with open(prepared_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except OSError:
+        return None
+    marker = content.rfind(SOURCE_HASH_MARKER)
+    if marker == -1:
+        return None
+    return content[marker + len(SOURCE_HASH_MARKER):].split('-->')[0].strip()
+
+
+def _validate_pom(pom_path):
+    '''生成的 pom 必须能解析，并且根结点是 project'''
+    try:
+        root = etree.parse(pom_path).getroot()
+    except Exception as e:
+        logger.error(f"Prepared pom {pom_path} is not valid xml: {e}")
+        return False
+    if etree.QName(root).localname != 'project':
+        logger.error(f"Prepared pom {pom_path} has no <project> root")
+        return False
+    return True
+
+
+def _generate_prepared_pom(pom_path, pom_content, source_hash):
+    '''复制原 pom，在副本上添加依赖和插件，校验之后原子地替换为 PREPARED_POM_NAME'''
+    pom_dir = os.path.dirname(pom_path)
+    prepared_path = os.path.join(pom_dir, PREPARED_POM_NAME)
+    fd, tmp_path = tempfile.mkstemp(dir=pom_dir, prefix=PREPARED_POM_NAME, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(pom_content)
+        success, _ = add_maven_dependencies_for_jdk(PREPARED_POM_JDK, tmp_path, get_surefire_fork_timeout())
+        if not success or not _validate_pom(tmp_path):
+            logger.error(f"Failed to prepare {pom_path}, using it unchanged")
+            return None
+        with open(tmp_path, 'a', encoding='utf-8') as f:
+            f.write(f'\n<!-- {SOURCE_HASH_MARKER} {_prepared_key(source_hash)} -->\n')
+        os.replace(tmp_path, prepared_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.debug(f"Prepared {prepared_path}")
+    return prepared_path
+
+
+def prepare_pom(project_root):
+    """
+    Patched copy of the project's pom.xml that every maven invocation builds with (`mvn -f`).
+
+    之前每次调用 mvn 都要把依赖和插件写进 pom.xml 再还原，重复解析和序列化 xml，并且同时运行的 mvn 会互相覆盖。
+    现在每个 pom.xml 只生成一次补丁之后的副本，按原 pom 的内容 hash 缓存 (内存中以及副本末尾的标记)，原 pom.xml 不再被修改。
+
+    Returns:
+        生成的 pom 的路径；没有 pom.xml 时返回 None，生成失败时返回原 pom.xml 的路径
+    """
+    return prepare_pom_with_hash(project_root)[0]
+
+
+def prepare_pom_with_hash(project_root):
+    '''同 prepare_pom，另外返回原 pom 的 hash (没有 pom.xml 时为 None)，可以作为依赖这个 pom 的其他缓存的 key'''
+    pom_path = find_pom_xml(project_root)
+    if not pom_path:
+        return None, None
+    with open(pom_path, 'r', encoding='utf-8') as f:
+        pom_content = f.read()
+    source_hash = _pom_hash(pom_content)
+    with _PREPARE_LOCK:
+        cached = _PREPARED.get(pom_path)
+        if cached is not None and cached[0] == _prepared_key(source_hash) and (cached[1] is None or os.path.exists(cached[1])):
+            return cached[1] or pom_path, source_hash
+        prepared_path = os.path.join(os.path.dirname(pom_path), PREPARED_POM_NAME)
+        if _read_source_hash(prepared_path) != _prepared_key(source_hash):
+            prepared_path = _generate_prepared_pom(pom_path, pom_content, source_hash)
+        _PREPARED[pom_path] = (_prepared_key(source_hash), prepared_path)
+        return prepared_path or pom_path, source_hash
+
+
+def mvn_command(project_root, arguments):
+    '''`mvn -f <生成的 pom> arguments`；项目中没有 pom.xml 时和原来一样直接执行 mvn，由 mvn 报错'''
+    pom_path = prepare_pom(project_root)
+    if pom_path is None:
+        logger.error(f"pom.xml not found in {project_root}")
+        return f"mvn {arguments}"
+    return f"mvn -f {shlex.quote(pom_path)} {arguments}"
@@ -0,0 +1,59 @@
+import os
+import signal
+import subprocess
+import sys
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG
+
+
+# 各阶段的默认超时 (秒)，配置中 timeouts 的同名项覆盖，0 或 null 表示不限制
+DEFAULT_TIMEOUTS = {
+    'compile': 600,    # mvn compile / test-compile，runner 中单独编译测试类，以及依赖解析
+    'test': 900,       # 执行一个测试类 (mvn test 或者 runner)
+    'report': 300,     # jacoco:report
+    'suite': 7200,     # runner 中一次执行项目已有的全部测试
+}
+# surefire 的 forkedProcessTimeoutInSeconds，比 test 阶段的超时短，让 surefire 先结束 fork 出的 JVM
+DEFAULT_SUREFIRE_FORK_TIMEOUT = 600
+
+
+def get_timeout(phase):
+    timeout = CONFIG.get('timeouts', {}).get(phase, DEFAULT_TIMEOUTS.get(phase))
+    return timeout if timeout else None
+
+
+def get_surefire_fork_timeout():
+    return CONFIG.get('surefire_fork_timeout', DEFAULT_SUREFIRE_FORK_TIMEOUT)
+
+
+def kill_process_group(process):
+    '''杀掉 start_new_session 启动的进程及其所有子进程 (mvn fork 出的 surefire JVM 等)'''
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_command(command, cwd, env=None, timeout=None):
+    """
+    在单独的进程组中执行 shell 命令，超时或者被中断时杀掉整个进程组，不会留下还在运行的子进程。
+
+    Returns:
+        subprocess.CompletedProcess，另外带有 timed_out；超时时 stdout / stderr 是超时之前的输出
+    """
+    process = subprocess.Popen(command, shell=True, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True)
+    timed_out = False
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        kill_process_group(process)
+        stdout, stderr = process.communicate()
+    except BaseException:
+        kill_process_group(process)
+        process.wait()
+        raise
+    result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+    result.timed_out = timed_out
+    return result
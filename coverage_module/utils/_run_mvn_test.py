@@ -1,53 +1,77 @@
 import sys
 import os
+import time
 
 sys.path.extend([".", ".."])
 import subprocess
 from loguru import logger
 import xml.etree.ElementTree as ET
 
-from utils._add_dependency_in_mvn import find_pom_xml, add_maven_dependencies_for_jdk
+from utils._prepared_pom import mvn_command as build_mvn_command
+from utils._maven_offline import get_maven_offline, record_offline_invocation
+from utils._process import get_surefire_fork_timeout, get_timeout, run_command
+
+
+def run_mvn(project_root, arguments, phase, offline=True):
+    """
+    在 project_root 中执行 `mvn arguments`，使用 prepare_pom 生成的 pom；本地仓库准备好之后离线执行 (offline 为 False 时总是联网)。
+
+    离线时除了执行测试 (test / suite) 都带 -q，mvn 不再输出 BUILD SUCCESS / BUILD FAILURE，这里按返回值补上一行，
+    调用方仍然按输出判断结果；执行测试时不带 -q，保留 surefire 的 Tests run / Failures / There was a timeout 等输出。
+    phase: compile / test / suite / report，决定超时 (get_timeout)；超时时整个进程组被杀掉，返回值的 timed_out 为 True
+    """
+    timeout = get_timeout(phase)
+    maven_offline = get_maven_offline(project_root) if offline else None
+    if maven_offline is None:
+        mvn_result = run_command(build_mvn_command(project_root, arguments), project_root, timeout=timeout)
+    else:
+        quiet = phase not in ('test', 'suite')
+        options = maven_offline.quiet_options if quiet else maven_offline.options
+        start = time.time()
+        mvn_result = run_command(build_mvn_command(project_root, f"{options} {arguments}"), project_root, env=maven_offline.env, timeout=timeout)
+        record_offline_invocation(maven_offline, arguments, time.time() - start)
+        if quiet:
+            mvn_result.stdout += "\nBUILD SUCCESS\n" if mvn_result.returncode == 0 else "\nBUILD FAILURE\n"
+    if mvn_result.timed_out:
+        logger.warning(f"mvn {arguments} in {project_root} timed out after {timeout}s")
+    return mvn_result
+
+
+def is_timeout(mvn_result):
+    '''mvn 本身超时，或者 surefire 因为 forkedProcessTimeoutInSeconds 结束了测试 JVM'''
+    return mvn_result.timed_out or "There was a timeout" in mvn_result.stdout
 
 
 def run_mvn_test(args):
     directory, test_class, test_method = args
-    pom_path = find_pom_xml(directory)
-    if not pom_path:
-        logger.error(f"pom.xml not found in {directory}")
-        exit(1)
-    success, pom_content = add_maven_dependencies_for_jdk("jdk11", pom_path)
-    if not success:
-        logger.error('add pom dependency failed!!!')
-        
     
     # 构建命令
     if test_class and test_method:
-        mvn_command = f"mvn clean org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}#{test_method}"
+        mvn_arguments = f"clean org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}#{test_method}"
     elif test_class:
-        mvn_command = f"mvn clean org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}"
+        mvn_arguments = f"clean org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}"
     else:
-        mvn_command = f"mvn clean org.jacoco:jacoco-maven-plugin:prepare-agent test"
+        mvn_arguments = f"clean org.jacoco:jacoco-maven-plugin:prepare-agent test"
 
-    jacoco_report_command = 'mvn org.jacoco:jacoco-maven-plugin:report'
-    # 改变到指定目录
-    os.chdir(directory)
+    # pom 中没有配置 surefire 时，forkedProcessTimeoutInSeconds 由这个属性决定
+    mvn_arguments += f" -Dsurefire.timeout={get_surefire_fork_timeout()}"
 
-    # 运行命令
+    # 运行命令，通过 cwd 指定目录 (不使用 os.chdir，保证多个 worker 可以同时执行)
     # javac_result = subprocess.run('javac -version', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    mvn_result = subprocess.run(mvn_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    _ = subprocess.run(jacoco_report_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # 不指定测试类时执行整个测试集，用 suite 的超时
+    mvn_result = run_mvn(directory, mvn_arguments, 'test' if test_class else 'suite')
+    if not mvn_result.timed_out:
+        _ = run_mvn(directory, "org.jacoco:jacoco-maven-plugin:report", 'report')
 
     # 收集输出和错误信息
     mvn_stdout = mvn_result.stdout
     mvn_stderr = mvn_result.stderr
 
-    # 把原始的pom.xml写回
-    with open(pom_path, 'w') as f:
-        f.write(pom_content)
-
     # 检查结果
     jacoco_report_output = os.path.join(directory, 'target/site/jacoco/jacoco.xml')
-    if "BUILD SUCCESS" in mvn_stdout:
+    if is_timeout(mvn_result):
+        test_result = "Timeout"
+    elif "BUILD SUCCESS" in mvn_stdout:
         if not os.path.exists(jacoco_report_output):
             logger.error('Please ensure that maven and jacoco are properly configured!')
             test_result = "Failed Compilation"
@@ -73,29 +97,20 @@ def run_mvn_test(args):
     }
 
 def run_mvn_compile(project_root):
-    directory = project_root
-    pom_path = find_pom_xml(directory)
-    if not pom_path:
-        logger.error(f"pom.xml not found in {directory}")
-        exit(1)
-    success, pom_content = add_maven_dependencies_for_jdk("jdk11", pom_path)
-    if not success:
-        logger.error('add pom dependency failed!!!')
-    
-    mvn_command = f"mvn clean compile"
-    os.chdir(project_root)
-    mvn_result = subprocess.run(mvn_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    mvn_result = run_mvn(project_root, f"clean compile", 'compile')
     
     mvn_stdout = mvn_result.stdout
     mvn_stderr = mvn_result.stderr
     
-    # 把原始的pom.xml写回
-    with open(pom_path, 'w') as f:
-        f.write(pom_content)
-    
     return mvn_stdout, mvn_stderr
 
-def run_mvn_test_no_clean(args):
+def run_mvn_clean_test_compile(project_root):
+    '''clean 之后编译源码和项目中已有的测试，不执行测试'''
+    mvn_result = run_mvn(project_root, f"clean test-compile", 'compile')
+    return mvn_result.stdout, mvn_result.stderr
+
+def run_mvn_test_no_clean(args, report=True):
+    '''report 为 False 时不生成 jacoco.xml，只保留 target/jacoco.exec 由调用方自行分析'''
     directory, test_class, test_method = args
     
     # 清空jacoco.exec和jacoco.xml文件
@@ -108,32 +123,34 @@ def run_mvn_test_no_clean(args):
     
     # 构建命令 注意 这里不clean
     if test_class and test_method:
-        mvn_command = f"mvn org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}#{test_method}"
+        mvn_arguments = f"org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}#{test_method}"
     elif test_class:
-        mvn_command = f"mvn org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}"
+        mvn_arguments = f"org.jacoco:jacoco-maven-plugin:prepare-agent test -Dtest={test_class}"
     else:
-        mvn_command = f"mvn org.jacoco:jacoco-maven-plugin:prepare-agent test"
+        mvn_arguments = f"org.jacoco:jacoco-maven-plugin:prepare-agent test"
 
-    jacoco_report_command = 'mvn org.jacoco:jacoco-maven-plugin:report'
-    # 改变到指定目录
-    os.chdir(directory)
+    # pom 中没有配置 surefire 时，forkedProcessTimeoutInSeconds 由这个属性决定
+    mvn_arguments += f" -Dsurefire.timeout={get_surefire_fork_timeout()}"
 
-    # 运行命令
+    # 运行命令，通过 cwd 指定目录
     # javac_result = subprocess.run('javac -version', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    mvn_result = subprocess.run(mvn_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    _ = subprocess.run(jacoco_report_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    mvn_result = run_mvn(directory, mvn_arguments, 'test')
+    if report and not mvn_result.timed_out:
+        _ = run_mvn(directory, "org.jacoco:jacoco-maven-plugin:report", 'report')
 
     # 收集输出和错误信息
     mvn_stdout = mvn_result.stdout
     mvn_stderr = mvn_result.stderr
     
     # 检查结果
-    jacoco_report_output = os.path.join(directory, 'target/site/jacoco/jacoco.xml')
-    if "BUILD SUCCESS" in mvn_stdout:
-        assert os.path.exists(jacoco_report_output)
+    coverage_output = jacoco_report_output if report else jacoco_exec_path
+    if is_timeout(mvn_result):
+        test_result = "Timeout"
+    elif "BUILD SUCCESS" in mvn_stdout:
+        assert os.path.exists(coverage_output)
         test_result = "Passed"
     elif "BUILD FAILURE" in mvn_stdout or "Tests run:" in mvn_stdout and "Failures:" in mvn_stdout:
-        if not os.path.exists(jacoco_report_output):
+        if not os.path.exists(coverage_output):
             test_result = "Failed Compilation"
             pass
         else:
@@ -150,3 +167,28 @@ def run_mvn_test_no_clean(args):
         "stdout": mvn_stdout,
         "stderr": mvn_stderr
     }
+
+
+def run_mvn_jacoco_report(project_root):
+    '''根据已有的 target/jacoco.exec 生成 target/site/jacoco/jacoco.xml'''
+    mvn_result = run_mvn(project_root, f"org.jacoco:jacoco-maven-plugin:report", 'report')
+    return mvn_result.stdout, mvn_result.stderr
+
+def run_mvn_test_compile(project_root):
+    '''只编译测试代码，不clean，也不执行测试'''
+    mvn_result = run_mvn(project_root, f"test-compile", 'compile')
+    return mvn_result.stdout, mvn_result.stderr
+
+def run_mvn_build_classpath(project_root, output_file):
+    '''解析项目 test scope 的完整 classpath，写入 output_file'''
+    mvn_result = run_mvn(project_root, f"dependency:build-classpath -Dmdep.includeScope=test -Dmdep.outputFile={output_file}", 'compile')
+
+    return mvn_result.stdout, mvn_result.stderr
+
+def run_mvn_dependency_copy(project_root, artifact, output_dir):
+    '''把单个 artifact (groupId:artifactId:version[:packaging[:classifier]]) 复制到 output_dir'''
+    mvn_result = run_mvn(project_root, f"dependency:copy -Dartifact={artifact} -DoutputDirectory={output_dir}", 'compile')
+    # runner 额外需要的 jar 不是项目的依赖，离线仓库中可能没有
+    if mvn_result.returncode != 0:
+        mvn_result = run_mvn(project_root, f"dependency:copy -Dartifact={artifact} -DoutputDirectory={output_dir}", 'compile', offline=False)
+    return mvn_result.stdout, mvn_result.stderr
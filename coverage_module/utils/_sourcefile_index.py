@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+
+class SourcefileIndex:
+    """
+    (包名, 源文件名) -> 该文件中的方法，和 jacoco 覆盖率中 coverage[包名][源文件名] 的 key 相同。
+
+    update_coverage 从覆盖率报告出发，只处理报告中出现的文件，不再遍历所有方法。
+    方法的 line_range 需要和 jacoco 统计的行 (total_line) 取交集；total_line 只取决于编译后的类，
+    一次运行中不会变化，所以每个文件只在第一次出现在报告中时处理一次。
+    """
+    def __init__(self, methods):
+        self.methods = methods
+        self.size = len(methods)
+        self._files = defaultdict(list)
+        for method in methods:
+            if method.belong_file is None:
+                continue
+            self._files[(method.get_package_name(), method.belong_file.file_name)].append(method)
+        self._normalized = set()
+
+    def methods_in(self, package_name, sourcefile_name):
+        return self._files.get((package_name, sourcefile_name))
+
+    def is_normalized(self, package_name, sourcefile_name):
+        return (package_name, sourcefile_name) in self._normalized
+
+    def normalize(self, package_name, sourcefile_name, total_bits):
+        '''文件中每个方法只保留 jacoco 统计到的行'''
+        key = (package_name, sourcefile_name)
+        for method in self._files.get(key, ()):
+            method.line_bits &= total_bits
+        self._normalized.add(key)
+
+
+# id(方法集合) -> SourcefileIndex；update_coverage 传入的是整个项目或者某个包的方法集合，数量有限
+_SOURCEFILE_INDEXES = {}
+
+
+def get_sourcefile_index(methods):
+    '''返回这个方法集合对应的索引，集合被替换或者大小变化时重新建立'''
+    index = _SOURCEFILE_INDEXES.get(id(methods))
+    if index is None or index.methods is not methods or index.size != len(methods):
+        index = _SOURCEFILE_INDEXES[id(methods)] = SourcefileIndex(methods)
+    return index
+
+
+def reset_sourcefile_indexes():
+    '''开始处理新项目时调用，不再持有之前项目的方法'''
+    _SOURCEFILE_INDEXES.clear()
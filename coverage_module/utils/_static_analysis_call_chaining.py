@@ -1,8 +1,14 @@
+from bisect import bisect_left, bisect_right
 from collections import defaultdict, deque
 import copy
 import queue
 from tree_sitter import Language, Parser
+try:
+    from tree_sitter import QueryCursor
+except ImportError:  # tree-sitter < 0.24：captures 在 Query 上
+    QueryCursor = None
 import os
+import re
 import sys
 
 
@@ -23,27 +29,141 @@ parser = Parser()
 parser.language = JAVA_LANGUAGE
 
 
+# 各个分析 pass 需要的结点，查询只编译一次；遍历由 tree-sitter 在 C 中完成，不再逐个结点递归
+QUERY_SOURCES = {
+    'package': '(package_declaration (scoped_identifier) @package)',
+    'imports': '(import_declaration) @import',
+    'classes': '[(class_declaration) (interface_declaration) (enum_declaration)] @class',
+    'methods': '[(method_declaration) (constructor_declaration)] @method',
+    'members': '[(class_declaration) (interface_declaration) (enum_declaration) (method_declaration) (constructor_declaration)] @member',
+    'fields': '[(class_declaration) (interface_declaration) (enum_declaration) (field_declaration) (constant_declaration)] @field',
+    'variables': '[(formal_parameter) (spread_parameter) (local_variable_declaration)] @variable',
+    'invocations': '[(method_invocation) (object_creation_expression)] @invocation',
+    'branches': '[(if_statement) (while_statement) (switch_expression) (for_statement)] @branch',
+    'assignments': '[(assignment_expression) (variable_declarator)] @assignment',
+    'references': '[(identifier) (method_invocation)] @reference',
+}
+
+
+def _compile_query(source):
+    if hasattr(JAVA_LANGUAGE, 'query'):
+        return JAVA_LANGUAGE.query(source)
+    from tree_sitter import Query
+    return Query(JAVA_LANGUAGE, source)
+
+
+QUERIES = {name: _compile_query(source) for name, source in QUERY_SOURCES.items()}
+# 每次查询都要遍历整棵树，ParsedFile 把所有查询合并成一个，整个文件只遍历一次，再按 capture 的名字分开
+FILE_QUERY = _compile_query('\n'.join(QUERY_SOURCES.values()))
+CAPTURE_TO_QUERY = {re.search(r'@(\w+)', source).group(1): name for name, source in QUERY_SOURCES.items()}
+
+
+def _run_query(query, node):
+    '''兼容不同版本的 tree-sitter：captures 可能在 QueryCursor 或 Query 上，返回值可能是 dict 或 (node, name) 列表'''
+    captures = QueryCursor(query).captures(node) if QueryCursor is not None else query.captures(node)
+    if isinstance(captures, dict):
+        return captures
+    grouped = defaultdict(list)
+    for capture_node, capture_name in captures:
+        grouped[capture_name].append(capture_node)
+    return grouped
+
+
+def _pre_order(nodes):
+    # 起点相同时外层结点在前，和递归遍历的顺序一致
+    nodes.sort(key=lambda i: (i.start_byte, -i.end_byte))
+    return nodes
+
+
+def query_nodes(query_name, node):
+    '''Nodes captured by QUERIES[query_name] inside node (node itself included), in pre-order.'''
+    captures = _run_query(QUERIES[query_name], node)
+    return _pre_order([i for capture_nodes in captures.values() for i in capture_nodes])
+
+
+def walk_query(query_name, node, visit, parsed_file=None):
+    '''
+    按先序访问 query 捕获的结点；visit 返回 True 时跳过该结点的子树，和原来的递归中提前 return 的效果相同。
+    给出 node 所在的 parsed_file 时从整个文件的捕获结果中按字节范围取结点，不再为每个子树单独执行查询。
+    '''
+    nodes = parsed_file.nodes_in(query_name, node) if parsed_file is not None else query_nodes(query_name, node)
+    skip_end = -1
+    for child in nodes:
+        if child.start_byte < skip_end:
+            continue
+        if visit(child):
+            skip_end = child.end_byte
+
+
+def _is_descendant(child, node):
+    while child is not None and child.start_byte >= node.start_byte and child.end_byte <= node.end_byte:
+        if child == node:
+            return True
+        child = child.parent
+    return False
+
+
+class ParsedFile:
+    """
+    A java source file parsed exactly once.
+
+    持有 tree 和 utf-8 字节，各个分析 pass 共享同一棵树，通过 captures 使用预编译的查询。
+    """
+    def __init__(self, source_code):
+        self.source_code = source_code
+        self.source_bytes = bytes(source_code, "utf8")
+        self.tree = parser.parse(self.source_bytes)
+        self.root_node = self.tree.root_node
+        self._captures = {}
+        self._capture_starts = {}
+
+    def captures(self, query_name):
+        if not self._captures:
+            captures = _run_query(FILE_QUERY, self.root_node)
+            self._captures = {name: [] for name in QUERY_SOURCES}
+            for capture_name, nodes in captures.items():
+                self._captures[CAPTURE_TO_QUERY[capture_name]] = _pre_order(list(nodes))
+        return self._captures[query_name]
+
+    def nodes_in(self, query_name, node):
+        '''和 query_nodes(query_name, node) 的结果相同，node 必须属于这个文件'''
+        nodes = self.captures(query_name)
+        if query_name not in self._capture_starts:
+            self._capture_starts[query_name] = [i.start_byte for i in nodes]
+        starts = self._capture_starts[query_name]
+        start_byte, end_byte = node.start_byte, node.end_byte
+        result = []
+        for index in range(bisect_left(starts, start_byte), bisect_right(starts, end_byte)):
+            child = nodes[index]
+            if child.end_byte > end_byte:
+                continue
+            # 和 node 共享边界的结点可能是祖先或者相邻的空结点，沿 parent 确认它在 node 的子树中
+            if (child.start_byte == start_byte or child.end_byte == end_byte) and not _is_descendant(child, node):
+                continue
+            result.append(child)
+        return result
+
+    @property
+    def package(self):
+        nodes = self.captures('package')
+        return nodes[0].text.decode() if nodes else None
+
+
 # return package 名字
 def find_package(node):  
-    if node.type == 'package_declaration':  
-        for child in node.children:  
-            if child.type == 'scoped_identifier':  
-                return child.text.decode()  
-    for child in node.children:  
-        result = find_package(child)  
-        if result is not None:  
-            return result  
-    return None  
+    nodes = query_nodes('package', node)
+    return nodes[0].text.decode() if nodes else None
 
 def find_package_use_source_code(source_node):
-    tree = parser.parse(bytes(source_node, "utf8"))
-    root_node = tree.root_node
-    package_name = find_package(root_node)
-    return package_name
+    return ParsedFile(source_node).package
         
 # method_map = {}    
 
-def find_import(node, single_file, package_map, method_map):
+def find_import(node, single_file, package_map, method_map, parsed_file=None):
+    for import_node in (parsed_file.nodes_in('imports', node) if parsed_file is not None else query_nodes('imports', node)):
+        _find_import(import_node, single_file, package_map, method_map)
+
+def _find_import(node, single_file, package_map, method_map):
     #import com.exampke.classA;
     if node.type == 'import_declaration':
         # if package.name == 'org.jfree.chart.renderer.xy':
@@ -82,25 +202,28 @@ def find_import(node, single_file, package_map, method_map):
             # if package.name == 'org.jfree.chart.renderer.xy':
             #     print(node.text.decode())
             #     print(f'假{class_name} : {import_node.text.decode()}')
-    for child in node.children:
-        find_import(child, single_file, package_map, method_map)
 
 
 def get_package_import(single_file, source_code, all_packages):
-    tree = parser.parse(bytes(source_code, "utf8"))
-    root_node = tree.root_node
+    '''source_code 可以是源码，也可以是已经解析过的 ParsedFile'''
+    parsed_file = source_code if isinstance(source_code, ParsedFile) else ParsedFile(source_code)
+    root_node = parsed_file.root_node
     package_map = {}
     for single_package in all_packages:
         package_map[single_package.name] = single_package
     
     method_map = {} #存储所有的方法
-    find_import(root_node, single_file, package_map, method_map)
+    find_import(root_node, single_file, package_map, method_map, parsed_file)
 
 # str = 'import okhttp3.*;'
 # single_file = File(str, str, None)
 # get_package_import(single_file, str, [])
 # 找到一个包里所有的类
-def find_classes(node, package, out_class_name, class_queue, single_file):
+def find_classes(node, package, out_class_name, class_queue, single_file, parsed_file=None):
+    # 找到的类不再深入，内部类由 class_queue 处理
+    walk_query('classes', node, lambda class_node: _add_class(class_node, package, out_class_name, class_queue, single_file), parsed_file)
+
+def _add_class(node, package, out_class_name, class_queue, single_file):
     # 暂时没有加record_declaration，新特性
     if node.type in ['class_declaration', 'interface_declaration', 'enum_declaration']:
         
@@ -125,11 +248,11 @@ def find_classes(node, package, out_class_name, class_queue, single_file):
         #         if child.type == 'type_identifier':
         #             superclass_name = child.text.decode()
         #     classs.add_father_class_name(f'{package.name}.{superclass_name}')
-        return
-    for child in node.children:
-        find_classes(child, package, out_class_name, class_queue, single_file)
+        return True
+    return False
         
-def find_father_class(node, classs):
+def find_father_class_name(node):
+    '''返回类声明中父类 (或第一个父接口的最后一个类型) 的原始名字，没有时返回 None'''
     if node.type in ['class_declaration', 'interface_declaration', 'enum_declaration']:
         if node.child_by_field_name('superclass') is not None:
             superclass_node = node.child_by_field_name('superclass')
@@ -139,12 +262,8 @@ def find_father_class(node, classs):
                     superclass_name = child.text.decode()
             # print('yes')
             if superclass_name == "":
-                return
-            if superclass_name in classs.import_map:
-                classs.add_father_class_name(classs.import_map[superclass_name])
-            else:
-                classs.add_father_class_name(f'{classs.belong_package.name}.{superclass_name}')
-            return
+                return None
+            return superclass_name
         superclass_node = None
         for child in node.children:
             if child.type == 'extends_interfaces':
@@ -154,7 +273,7 @@ def find_father_class(node, classs):
                 superclass_node = child
                 break
         if superclass_node is None:
-            return
+            return None
         
         type_node = None
         for child in superclass_node.children:
@@ -162,22 +281,31 @@ def find_father_class(node, classs):
                 type_node = child
                 break
         if type_node is None:
-            return
+            return None
         
         superclass_name = None
         for child in type_node.children:
             if child.type == 'type_identifier':
                 superclass_name = child.text.decode()
-        if superclass_name is None:
-            return
-        if superclass_name in classs.import_map:
-            classs.add_father_class_name(classs.import_map[superclass_name])
-        else:
-            classs.add_father_class_name(f'{classs.belong_package.name}.{superclass_name}')
-        return
+        return superclass_name
     
     for child in node.children:
-        find_father_class(child, classs)
+        result = find_father_class_name(child)
+        if result is not None:
+            return result
+    return None
+
+def set_father_class_name(classs, superclass_name):
+    '''根据 import_map 把父类的原始名字解析成全名'''
+    if superclass_name is None:
+        return
+    if superclass_name in classs.import_map:
+        classs.add_father_class_name(classs.import_map[superclass_name])
+    else:
+        classs.add_father_class_name(f'{classs.belong_package.name}.{superclass_name}')
+
+def find_father_class(node, classs):
+    set_father_class_name(classs, find_father_class_name(node))
         
 #辅助函数： 根据type获取完整类名，或者数组，或者int double，这里面向的是定义方法时候的参数列表
 def get_type_to_full_name(node, method):
@@ -197,10 +325,13 @@ def get_type_to_full_name(node, method):
     return node.text.decode()
 
 # 找一个类里所有的方法
-def find_method(node, classs, package, single_file):
+def find_method(node, classs, package, single_file, parsed_file=None):
+    walk_query('members', node, lambda member_node: _add_method(member_node, classs, package, single_file), parsed_file)
+
+def _add_method(node, classs, package, single_file):
     # 不考虑子类里面的方法
     if node.type in ['class_declaration', 'interface_declaration', 'enum_declaration']:
-        return
+        return True
     if node.type in ['constructor_declaration', 'method_declaration']:
         method_modifier = None
         is_target = False
@@ -222,7 +353,7 @@ def find_method(node, classs, package, single_file):
         name_node = node.child_by_field_name('name')
         parameters_node = node.child_by_field_name('parameters')
         if name_node is None or parameters_node is None:
-            return
+            return True
         name = name_node.text.decode() #方法的名字
         for child in parameters_node.children:            
             if child.type == 'formal_parameter':  # 形式参数
@@ -242,19 +373,20 @@ def find_method(node, classs, package, single_file):
         
         if node.type == 'constructor_declaration':
             classs.add_init(method)
-        
-    for child in node.children:
-        find_method(child, classs, package, single_file)
+    return False
 
 # 找到一个类里面所有的变量类型, 不找方法里面的
-def find_class_variable(node, variable_map, classs):
+def find_class_variable(node, variable_map, classs, parsed_file=None):
+    walk_query('fields', node, lambda child: _find_class_variable(child, variable_map, classs), parsed_file)
+
+def _find_class_variable(node, variable_map, classs):
     import_map = classs.import_map
     if node.type in ['class_declaration', 'interface_declaration', 'enum_declaration']:
-        return
+        return True
     if node.type in ['field_declaration', 'constant_declaration']: # String s = getName(a, b);
         type_node = node.child_by_field_name('type')
         if type_node is None:
-            return
+            return True
         if type_node.type in ['integral_type', 'floating_point_type']: # 类似 int a = 1;
             for variable_node in node.children: # 一条赋值语句中可能有多个赋值语句
                 if variable_node.type != 'variable_declarator':
@@ -307,7 +439,7 @@ def find_class_variable(node, variable_map, classs):
                     type_name = child.text.decode()
                     break
             if type_name is None:
-                return
+                return True
             
             for variable_node in node.children:
                 if variable_node.type != 'variable_declarator':
@@ -323,16 +455,18 @@ def find_class_variable(node, variable_map, classs):
                 variable_map[variable_name] = type_node.text.decode()
                 
                 
-    for child in node.children:
-        find_class_variable(child, variable_map, classs)
+    return False
         
 # 找方法里面的变量类型，和类的加到一起，和类的区别是方法还要考虑传参中的变量
-def find_method_variable(node, variable_map, method):
+def find_method_variable(node, variable_map, method, parsed_file=None):
+    walk_query('variables', node, lambda child: _find_method_variable(child, variable_map, method), parsed_file)
+
+def _find_method_variable(node, variable_map, method):
     import_map = method.import_map
     if node.type == 'formal_parameter': # 方法声明时候传入的参数
         variable_node = node.child_by_field_name('type') #  exampke.classA
         if variable_node is None:
-            return
+            return True
         variable_type = get_type_to_full_name(variable_node, method)
         variable_name = node.child_by_field_name('name').text.decode()
         variable_map[variable_name] = variable_type
@@ -357,7 +491,7 @@ def find_method_variable(node, variable_map, method):
         # print(node.text.decode())
         type_node = node.child_by_field_name('type')
         if type_node is None:
-            return
+            return True
         if type_node.type in ['integral_type', 'floating_point_type']: # 类似 int a = 1;
             for variable_node in node.children: # 一条赋值语句中可能有多个赋值语句
                 if variable_node.type != 'variable_declarator':
@@ -409,7 +543,7 @@ def find_method_variable(node, variable_map, method):
                     type_name = child.text.decode()
                     break
             if type_name is None:
-                return
+                return True
             
             for variable_node in node.children:
                 if variable_node.type != 'variable_declarator':
@@ -423,8 +557,7 @@ def find_method_variable(node, variable_map, method):
                 variable_name = variable_node.child_by_field_name('name').text.decode() # s = getName(a, b) -> s
                 # # print(variable_name)
                 variable_map[variable_name] = type_node.text.decode()
-    for child in node.children:
-        find_method_variable(child, variable_map, method)
+    return False
 
 # 辅助函数：获取方法调用时传入参数的类型
 def get_type_of_method_invocation(node, classs, variable_map, package, method_map, class_map, method_cache):
@@ -549,7 +682,10 @@ def get_method_return(method_name, arguments_list, package, method_map):
     
 
 # 找所有的方法调用
-def find_method_invocation(node, classs, method, variable_map, package, method_map, class_map, method_cache):
+def find_method_invocation(node, classs, method, variable_map, package, method_map, class_map, method_cache, parsed_file=None):
+    walk_query('invocations', node, lambda child: _find_method_invocation(child, classs, method, variable_map, package, method_map, class_map, method_cache), parsed_file)
+
+def _find_method_invocation(node, classs, method, variable_map, package, method_map, class_map, method_cache):
     import_map = method.import_map
     if node.type == 'method_invocation': # 直接的方法调用
         if node.text.decode() in method_cache:   
@@ -575,12 +711,14 @@ def find_method_invocation(node, classs, method, variable_map, package, method_m
         # # print(arguments_list)
         method.add_call_method_name(method_name, arguments_list)
     
-    for child in node.children:
-        find_method_invocation(child, classs, method, variable_map, package, method_map, class_map, method_cache)
+    return False
         
         
 # 辅助函数：找到结点中的变量和函数
-def get_node_variable_and_method(node, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache):
+def get_node_variable_and_method(node, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache, parsed_file=None):
+    walk_query('references', node, lambda child: _get_node_variable_and_method(child, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache), parsed_file)
+
+def _get_node_variable_and_method(node, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache):
     if node.type == 'identifier':
         name = node.text.decode()
         # print(variable_map)
@@ -594,32 +732,35 @@ def get_node_variable_and_method(node, classs, variable_map, variable_list, meth
             method_cache[node.text.decode()] = (method_name, arguments_list)
         method_list.append((method_name, tuple(arguments_list)))
         
-    for child in node.children:
-        get_node_variable_and_method(child, classs,variable_map, variable_list, method_list, package, method_map, class_map, method_cache)  
-    pass
+    return False
 
     
 # 找和分支有关的变量和方法
-def find_branch_related(node, method, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache):
+def find_branch_related(node, method, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache, parsed_file=None):
+    walk_query('branches', node, lambda child: _find_branch_related(child, method, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache, parsed_file), parsed_file)
+
+def _find_branch_related(node, method, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache, parsed_file):
     if node.type in ['if_statement', 'while_statement', 'switch_expression', 'for_statement']:
         condition_node = node.child_by_field_name('condition') 
         if condition_node is None:
-            return
+            return True
         # print(f'#######{condition_node.text.decode()}')
-        get_node_variable_and_method(condition_node, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache)
+        get_node_variable_and_method(condition_node, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache, parsed_file)
         pass
     
-    for child in node.children:
-        find_branch_related(child, method, classs, variable_map, variable_list, method_list, package, method_map, class_map, method_cache)   
+    return False
     
 # 找和每个变量有关的方法和变量  
 #                                       变量名->类型   变量名->相关函数和变量
-def find_variable_related(node, classs, variable_map, variable_related, package, method_map, class_map, method_cache):
+def find_variable_related(node, classs, variable_map, variable_related, package, method_map, class_map, method_cache, parsed_file=None):
+    walk_query('assignments', node, lambda child: _find_variable_related(child, classs, variable_map, variable_related, package, method_map, class_map, method_cache, parsed_file), parsed_file)
+
+def _find_variable_related(node, classs, variable_map, variable_related, package, method_map, class_map, method_cache, parsed_file):
     if node.type == 'assignment_expression':
         left_node = node.child_by_field_name('left')
         right_node = node.child_by_field_name('right')
         if right_node is None or left_node is None:
-            return
+            return True
         # print('yeyeyeyeye')
         name = left_node.text.decode()
         # print(name)
@@ -630,13 +771,13 @@ def find_variable_related(node, classs, variable_map, variable_related, package,
                     'variable': []
                 }
             l = list()
-            get_node_variable_and_method(right_node,  classs, variable_map, l, variable_related[name]['method'], package, method_map, class_map,method_cache)
-            get_node_variable_and_method(right_node,  classs, variable_map, variable_related[name]['variable'], variable_related[name]['method'], package, method_map, class_map, method_cache)
+            get_node_variable_and_method(right_node,  classs, variable_map, l, variable_related[name]['method'], package, method_map, class_map,method_cache, parsed_file)
+            get_node_variable_and_method(right_node,  classs, variable_map, variable_related[name]['variable'], variable_related[name]['method'], package, method_map, class_map, method_cache, parsed_file)
     if node.type ==  'variable_declarator':
         left_node = node.child_by_field_name('name')
         right_node = node.child_by_field_name('value')
         if right_node is None or left_node is None:
-            return
+            return True
         name = left_node.text.decode()
         if name in variable_map:
             if name not in variable_related:
@@ -644,10 +785,9 @@ def find_variable_related(node, classs, variable_map, variable_related, package,
                     'method': [],
                     'variable': []
                 }
-            get_node_variable_and_method(right_node,  classs, variable_map, variable_related[name]['variable'], variable_related[name]['method'], package, method_map, class_map, method_cache)
+            get_node_variable_and_method(right_node,  classs, variable_map, variable_related[name]['variable'], variable_related[name]['method'], package, method_map, class_map, method_cache, parsed_file)
     
-    for child in node.children:
-        find_variable_related(child, classs, variable_map, variable_related, package, method_map, class_map, method_cache)
+    return False
         
 
 # 给源码，找到所有的类和方法存到包里面          
@@ -664,19 +804,174 @@ def add_classes_and_methods_in_package(package, source_code, single_file):
         None
     """
     # Rest of the code...
-    tree = parser.parse(bytes(source_code, "utf8"))
-    root_node = tree.root_node
+    parsed_file = source_code if isinstance(source_code, ParsedFile) else ParsedFile(source_code)
+    _add_classes_and_methods(package, parsed_file.root_node, single_file)
+
+def _add_classes_and_methods(package, root_node, single_file, parsed_file=None):
     class_queue = queue.Queue()
-    find_classes(root_node, package, None, class_queue, single_file)
+    find_classes(root_node, package, None, class_queue, single_file, parsed_file)
     while not class_queue.empty():
         now_class, now_node = class_queue.get()
         out_class_name = now_class.name_no_package
-        find_classes(now_node, package, out_class_name, class_queue, single_file)
-        find_method(now_node, now_class, package, single_file)
+        find_classes(now_node, package, out_class_name, class_queue, single_file, parsed_file)
+        find_method(now_node, now_class, package, single_file, parsed_file)
+
+CLASS_DECLARATION_TYPES = ('class_declaration', 'interface_declaration', 'enum_declaration')
+METHOD_DECLARATION_TYPES = ('constructor_declaration', 'method_declaration')
+
+def find_imports(node, imports, parsed_file=None):
+    '''按出现顺序收集 import：('*', 包名) 或者 ('=', 类名, 全名)，和 find_import 的处理方式一致'''
+    for import_node in (parsed_file.nodes_in('imports', node) if parsed_file is not None else query_nodes('imports', node)):
+        flag = False
+        name_node = None
+        for child in import_node.children:
+            if child.type == 'asterisk':
+                flag = True
+            if child.type == 'scoped_identifier' or child.type == 'identifier':
+                name_node = child
+        if name_node is None:
+            continue
+        if flag:
+            imports.append(('*', name_node.text.decode()))
+        else:
+            class_name_node = name_node.child_by_field_name('name')
+            class_name = class_name_node.text.decode() if class_name_node is not None else name_node.text.decode()
+            imports.append(('=', class_name, name_node.text.decode()))
+
+def extract_file_facts(source_code):
+    """
+    Extract everything get_packages needs from one java file that depends only on its content.
+    source_code 可以是源码，也可以是已经解析过的 ParsedFile。
+
+    结果只包含基本类型，可以 pickle 之后按文件内容的 hash 缓存；类和方法按在文件中出现的位置排序，
+    源码文本以 utf-8 字节偏移的形式保存。
+
+    Returns:
+        dict: package 为 None 时表示文件没有 package 声明
+    """
+    parsed_file = source_code if isinstance(source_code, ParsedFile) else ParsedFile(source_code)
+    package_name = parsed_file.package
+    if not package_name:
+        return {'package': None}
+    
+    package = Package(package_name)
+    single_file = File('', parsed_file.source_code, package)
+    _add_classes_and_methods(package, parsed_file.root_node, single_file, parsed_file)
+    
+    imports = []
+    find_imports(parsed_file.root_node, imports, parsed_file)
+    
+    classes = []
+    for classs in sorted(single_file.classes, key=lambda i: i.node.start_byte):
+        methods = []
+        for method in sorted(classs.methods, key=lambda i: i.node.start_byte):
+            node = method.node
+            methods.append({
+                'name': method.name_no_package,
+                'parameters': list(method.parameters_list),
+                'return_type': method.return_type,
+                'is_target': method.is_target,
+                'is_init': method in classs.init,
+                'span': (node.start_byte, node.end_byte),
+                'lines': (node.start_point[0] + 1, node.end_point[0] + 1),
+            })
+        classes.append({
+            'name': classs.name_no_package,
+            'span': (classs.node.start_byte, classs.node.end_byte),
+            'superclass': find_father_class_name(classs.node),
+            'methods': methods,
+        })
+    return {'package': package_name, 'imports': imports, 'classes': classes}
+
+def build_classes_and_methods_from_facts(package, single_file, facts, source_bytes):
+    """
+    extract_file_facts 的逆过程：创建 Class 和 Method 对象并加入 package / single_file，
+    效果和 add_classes_and_methods_in_package 相同，但是不需要解析源码。node 为 None，需要时由 attach_nodes 补上。
+
+    Returns:
+        classes: 和 facts['classes'] 顺序一致的 Class 列表
+        methods: 按 facts 中的顺序展开的 Method 列表
+    """
+    classes = []
+    methods = []
+    for class_facts in facts['classes']:
+        class_name = class_facts['name']
+        start, end = class_facts['span']
+        classs = Class(f'{package.name}.{class_name}', package, class_name, source_bytes[start:end].decode(), None)
+        package.add_class(classs)
+        single_file.add_class(classs)
+        package.import_map[class_name] = f'{package.name}.{class_name}'
+        classes.append(classs)
+        
+        for method_facts in class_facts['methods']:
+            name = method_facts['name']
+            start, end = method_facts['span']
+            method = Method(name, classs.name + '.' + name, package, classs, list(method_facts['parameters']), source_bytes[start:end].decode(), method_facts['return_type'], None)
+            if method_facts['is_target']:
+                method.set_target()
+            classs.add_method(method)
+            package.add_method(method)
+            single_file.add_method(method)
+            if method_facts['is_init']:
+                classs.add_init(method)
+            first_line, last_line = method_facts['lines']
+            method.set_line_span(first_line, last_line)
+            methods.append(method)
+    return classes, methods
+
+def apply_imports(single_file, imports, package_map):
+    '''按 extract_file_facts 收集的 import 更新 single_file.import_map，和 get_package_import 的结果相同'''
+    for single_import in imports:
+        if single_import[0] == '*':
+            package = package_map.get(single_import[1])
+            if package is not None:
+                for classs in package.classes:
+                    single_file.import_map[classs.name_no_package] = classs.name
+        else:
+            single_file.import_map[single_import[1]] = single_import[2]
+
+def attach_nodes(source_code, classes, methods, facts):
+    '''把 tree-sitter 的结点按字节范围挂回从缓存构建的 Class / Method 上；source_code 没有解析过时在这里解析'''
+    parsed_file = source_code if isinstance(source_code, ParsedFile) else ParsedFile(source_code)
+    nodes = {}
+    for node in parsed_file.captures('members'):
+        nodes[(node.type in METHOD_DECLARATION_TYPES, node.start_byte, node.end_byte)] = node
+    for classs, class_facts in zip(classes, facts['classes']):
+        classs.node = nodes[(False,) + tuple(class_facts['span'])]
+    method_facts = [i for class_facts in facts['classes'] for i in class_facts['methods']]
+    for method, single_facts in zip(methods, method_facts):
+        method.node = nodes[(True,) + tuple(single_facts['span'])]
+    return parsed_file
+
+def collect_call_facts(classes, methods):
+    '''find_call_method 对 Class / Method 产生的全部结果，可以 pickle'''
+    return {
+        'classes': [classs.variable_map for classs in classes],
+        'methods': [(method.variable_map, method.called_method_name, method.branch_related_called_methods_name) for method in methods],
+    }
+
+def apply_call_facts(classes, methods, call_facts):
+    for classs, variable_map in zip(classes, call_facts['classes']):
+        classs.variable_map = variable_map
+    for method, (variable_map, called_method_name, branch_related_called_methods_name) in zip(methods, call_facts['methods']):
+        method.variable_map = variable_map
+        method.called_method_name = set(called_method_name)
+        method.branch_related_called_methods_name = set(branch_related_called_methods_name)
 
 # 给源码，找到方法中调用的其他方法
+def _parsed_file_of(item):
+    '''Class / Method 所在文件的 ParsedFile，没有时返回 None，退回到对子树单独查询'''
+    return item.belong_file.parsed_file if item.belong_file is not None else None
+
+def _in_source_order(items):
+    '''
+    按所在文件和在文件中的位置排序。method_cache 以调用的源码文本为 key 在方法之间共享，
+    遍历 set 的顺序依赖对象的地址，排序之后分析结果才是确定的。
+    '''
+    return sorted(items, key=lambda i: (i.belong_file.file_path if i.belong_file is not None else '', i.node.start_byte, i.name))
+
 def find_call_method(package, method_map, class_map):
-    for classs in package.classes:
+    for classs in _in_source_order(package.classes):
         if classs.name == 'org.jfree.chart.axis.Axis':
             a = 1
         class_node = classs.node
@@ -684,33 +979,35 @@ def find_call_method(package, method_map, class_map):
         if boby_node is None:
             continue
         variable_map = {}
-        find_class_variable(boby_node, variable_map, classs)
+        find_class_variable(boby_node, variable_map, classs, _parsed_file_of(classs))
         classs.add_variable_map(variable_map)
         
-        for method in classs.methods:
+        for method in _in_source_order(classs.methods):
             method_node = method.node
-            method_variable_map = copy.deepcopy(variable_map)
-            find_method_variable(method_node, method_variable_map, method)
+            # 变量表的值都是字符串，浅拷贝即可
+            method_variable_map = dict(variable_map)
+            find_method_variable(method_node, method_variable_map, method, _parsed_file_of(method))
             method.add_variable_map(method_variable_map)
     
     method_cache = {}
-    for classs in package.classes:
+    for classs in _in_source_order(package.classes):
         class_node = classs.node
         variable_map = classs.variable_map
         
-        for method in classs.methods:
+        for method in _in_source_order(classs.methods):
             method_node = method.node
             method_variable_map = method.variable_map
+            # 继承来的方法属于父类所在的文件
+            parsed_file = _parsed_file_of(method)
             # find_method_variable(method_node, method_variable_map, method)
             # method.add_variable_map(method_variable_map)
-            find_method_invocation(method_node, classs, method, method_variable_map, package, method_map, class_map, method_cache)
+            find_method_invocation(method_node, classs, method, method_variable_map, package, method_map, class_map, method_cache, parsed_file)
             variable_list = []
             method_list = []
-            find_branch_related(method_node, method, classs, method_variable_map, variable_list, method_list, package, method_map, class_map, method_cache)
+            find_branch_related(method_node, method, classs, method_variable_map, variable_list, method_list, package, method_map, class_map, method_cache, parsed_file)
             variable_related = {}
-            find_variable_related(method_node,  classs, method_variable_map, variable_related, package, method_map, class_map, method_cache)
-            variable_related_copy = copy.deepcopy(variable_related)
-            for var, info in variable_related_copy.items():
+            find_variable_related(method_node,  classs, method_variable_map, variable_related, package, method_map, class_map, method_cache, parsed_file)
+            for var, info in list(variable_related.items()):
                 for to_var in info['variable']:
                     if to_var not in variable_related:
                         variable_related[to_var] = {
@@ -742,23 +1039,18 @@ def extract_called_functions(source_code, all_packages, method_map, class_map):
     Returns:
         list: A list of called functions.
     """
-    tree = parser.parse(bytes(source_code, "utf8"))
-    root_node = tree.root_node
-    package_name = find_package_use_source_code(source_code)
+    parsed_file = ParsedFile(source_code)
+    root_node = parsed_file.root_node
+    package_name = parsed_file.package
     package = Package(package_name)
     
     single_file = File('path', source_code, package)
+    single_file.parsed_file = parsed_file
 
     
-    class_queue = queue.Queue()
-    find_classes(root_node, package, None, class_queue, single_file)
-    while not class_queue.empty():
-        now_class, now_node = class_queue.get()
-        out_class_name = now_class.name_no_package
-        find_classes(now_node, package, out_class_name, class_queue, single_file)
-        find_method(now_node, now_class, package, single_file)
+    _add_classes_and_methods(package, root_node, single_file, parsed_file)
     
-    get_package_import(single_file, source_code, all_packages)
+    get_package_import(single_file, parsed_file, all_packages)
     
     src_package = None
     for pack in all_packages:
@@ -782,14 +1074,14 @@ def extract_called_functions(source_code, all_packages, method_map, class_map):
         if boby_node is None:
             continue
         variable_map = {}
-        find_class_variable(boby_node, variable_map, classs)
+        find_class_variable(boby_node, variable_map, classs, parsed_file)
         classs.add_variable_map(variable_map)
         
         for method in classs.methods:
             method_node = method.node
-            method_variable_map = copy.deepcopy(variable_map)
-            find_method_variable(method_node, method_variable_map, method)
-            find_method_invocation(method_node, classs, method, method_variable_map, package, method_map, class_map, method_cache)
+            method_variable_map = dict(variable_map)
+            find_method_variable(method_node, method_variable_map, method, parsed_file)
+            find_method_invocation(method_node, classs, method, method_variable_map, package, method_map, class_map, method_cache, parsed_file)
             
             for par in method.called_method_name:
                 case_called_functions.append(par)
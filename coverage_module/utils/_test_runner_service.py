@@ -0,0 +1,455 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import select
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG, code_base, logger
+from utils._analyze_jacoco_output import parse_coverage_json
+from utils._process import get_timeout, kill_process_group
+from utils._run_mvn_test import run_mvn_build_classpath, run_mvn_dependency_copy, run_mvn_test_compile
+from utils._write_test_class import get_test_class_path
+
+
+RUNNER_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'runner', 'WiseUTRunner.java')
+RUNNER_MAIN_CLASS = 'WiseUTRunner'
+RESPONSE_PREFIX = '@@WISEUT@@ '
+
+JACOCO_VERSION = '0.8.12'
+ASM_VERSION = '9.7'  # jacoco 0.8.12 对应的 asm 版本
+
+_RUNNERS = {}
+_UNAVAILABLE = set()
+_RUNNERS_LOCK = threading.Lock()
+_COMPILE_LOCK = threading.Lock()
+
+
+def get_runner_dir():
+    '''runner 编译产物、额外依赖以及日志的存放位置'''
+    return CONFIG.get('runner_dir', os.path.join(code_base, 'data', 'runner'))
+
+
+def _project_key(project_root):
+    project_root = os.path.normpath(project_root)
+    digest = hashlib.md5(project_root.encode('utf-8')).hexdigest()[:8]
+    return f'{os.path.basename(project_root)}_{digest}'
+
+
+def _find_jar_version(classpath_entries, artifact_id):
+    '''在 classpath 中查找 artifact_id-<version>.jar，返回 version'''
+    pattern = re.compile('^' + re.escape(artifact_id) + r'-(\d[\w.\-]*)\.jar$')
+    for entry in classpath_entries:
+        match = pattern.match(os.path.basename(entry))
+        if match:
+            return match.group(1)
+    return None
+
+
+def _resolve_runner_tools(project_root, classpath_entries, lib_dir):
+    """
+    准备 runner 额外需要的 jar: jacoco agent / core, asm, 以及与项目 junit-platform-engine 版本一致的 launcher
+
+    Returns:
+        agent_jar: jacoco agent 的路径
+        tool_jars: 需要追加到 runner classpath 上的其他 jar
+    """
+    artifacts = [
+        (f'org.jacoco:org.jacoco.agent:{JACOCO_VERSION}:jar:runtime', f'org.jacoco.agent-{JACOCO_VERSION}-runtime.jar'),
+        (f'org.jacoco:org.jacoco.core:{JACOCO_VERSION}', f'org.jacoco.core-{JACOCO_VERSION}.jar'),
+        (f'org.ow2.asm:asm:{ASM_VERSION}', f'asm-{ASM_VERSION}.jar'),
+        (f'org.ow2.asm:asm-commons:{ASM_VERSION}', f'asm-commons-{ASM_VERSION}.jar'),
+        (f'org.ow2.asm:asm-tree:{ASM_VERSION}', f'asm-tree-{ASM_VERSION}.jar'),
+    ]
+    if _find_jar_version(classpath_entries, 'junit-platform-launcher') is None:
+        engine_version = _find_jar_version(classpath_entries, 'junit-platform-engine')
+        if engine_version is None:
+            raise RuntimeError('No JUnit Platform engine found on the test classpath')
+        artifacts.append((f'org.junit.platform:junit-platform-launcher:{engine_version}', f'junit-platform-launcher-{engine_version}.jar'))
+
+    jar_paths = []
+    for artifact, jar_name in artifacts:
+        jar_path = os.path.join(lib_dir, jar_name)
+        if not os.path.exists(jar_path):
+            run_mvn_dependency_copy(project_root, artifact, lib_dir)
+        if not os.path.exists(jar_path):
+            raise RuntimeError(f'Failed to resolve {artifact}')
+        jar_paths.append(jar_path)
+    return jar_paths[0], jar_paths[1:]
+
+
+def _compile_runner(compile_classpath, classes_dir):
+    '''编译 runner/WiseUTRunner.java，源码没有变化时直接复用'''
+    with _COMPILE_LOCK:
+        class_file = os.path.join(classes_dir, RUNNER_MAIN_CLASS + '.class')
+        if os.path.exists(class_file) and os.path.getmtime(class_file) >= os.path.getmtime(RUNNER_SOURCE):
+            return
+        os.makedirs(classes_dir, exist_ok=True)
+        javac_command = ['javac', '-encoding', 'UTF-8', '-d', classes_dir, '-cp', os.pathsep.join(compile_classpath), RUNNER_SOURCE]
+        javac_result = subprocess.run(javac_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if javac_result.returncode != 0:
+            raise RuntimeError(f'Failed to compile the test runner:\n{javac_result.stderr}')
+
+
+class TestRunnerService:
+    """
+    A long-lived JVM that executes test classes on the JUnit Platform with the JaCoCo agent attached.
+
+    The JVM is started once per project with the resolved test classpath and receives requests
+    over its stdin, so each test only pays for the test itself instead of two Maven boots.
+    """
+    def __init__(self, project_root, classpath, agent_jar, scratch_dir, log_path):
+        self.project_root = project_root
+        self.classes_dir = os.path.join(project_root, 'target', 'classes')
+        self.test_classes_dir = os.path.join(project_root, 'target', 'test-classes')
+        self.scratch_dir = scratch_dir
+        self.classpath = classpath
+        self.agent_jar = agent_jar
+        self.log_path = log_path
+        self.process = None
+        self._log_file = None
+        self._lock = threading.Lock()
+        # stdout 直接按 fd 读取 (select 需要知道是否还有没读的数据)，没有读完的一行留在这里
+        self._buffer = bytearray()
+
+    def start(self):
+        command = [
+            'java',
+            f'-javaagent:{self.agent_jar}=output=none',
+            '-cp', os.pathsep.join(self.classpath),
+            RUNNER_MAIN_CLASS,
+            self.classes_dir,
+            self.test_classes_dir,
+            self.scratch_dir,
+        ]
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+        self._buffer = bytearray()
+        # 单独的进程组，超时或者关闭时连同测试代码启动的子进程一起结束
+        self.process = subprocess.Popen(command, cwd=self.project_root, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._log_file, text=True, encoding='utf-8', bufsize=1, start_new_session=True)
+        ready = self._read_response()
+        if ready is None or not ready.get('ready'):
+            self.close()
+            raise RuntimeError(f'Test runner failed to start, see {self.log_path}')
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _read_line(self, deadline):
+        '''读取 stdout 的下一行；到 deadline (time.monotonic) 还没有读到完整的一行时抛出 TimeoutError，runner 退出时返回 None'''
+        fd = self.process.stdout.fileno()
+        scanned = 0
+        while True:
+            end = self._buffer.find(b'\n', scanned)
+            if end != -1:
+                line = bytes(self._buffer[:end])
+                del self._buffer[:end + 1]
+                return line.decode('utf-8')
+            scanned = len(self._buffer)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                    raise TimeoutError
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                return None
+            self._buffer.extend(chunk)
+
+    def _read_response(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            line = self._read_line(deadline)
+            if line is None:
+                return None
+            if line.startswith(RESPONSE_PREFIX):
+                return json.loads(line[len(RESPONSE_PREFIX):])
+
+    def _request(self, request_line, timeout=None):
+        """
+        timeout 秒之内没有响应时 (例如生成的测试中有死循环) 杀掉 runner，返回 {"error", "timeout": True}；
+        之后 get_test_runner 会重新启动一个 runner。
+        等待响应和超时后的 kill 在同一个线程中，已经读到的响应不会因为超时被丢弃。
+        """
+        with self._lock:
+            if not self.is_alive():
+                return None
+            try:
+                self.process.stdin.write(request_line + '\n')
+                self.process.stdin.flush()
+                return self._read_response(timeout)
+            except TimeoutError:
+                kill_process_group(self.process)
+                self.process.wait()
+                return {'error': f'timed out after {timeout}s', 'timeout': True}
+            except (BrokenPipeError, OSError):
+                return None
+
+    def compile_test_source(self, source_path):
+        """
+        Compile a single test source file with the in-process javac into the scratch dir.
+
+        Returns:
+            dict: {"success", "diagnostics", "output"}, 或者 {"error"}；runner 已经退出时返回 None
+        """
+        return self._request(f'COMPILE\t{source_path}', get_timeout('compile'))
+
+    def run_test_class(self, test_class_sig, sourcefiles=None):
+        """
+        Run a single, already compiled, test class.
+
+        Args:
+            sourcefiles: 只需要这些源文件 (org/foo/Bar.java) 的覆盖率，None 表示整个项目
+
+        Returns:
+            dict: {"result", "tests", "coverage", "stdout", "stderr"}, 或者 {"error"}；runner 已经退出时返回 None
+        """
+        if sourcefiles is None:
+            return self._request(f'RUN\t{test_class_sig}', get_timeout('test'))
+        return self._request(f'RUN\t{test_class_sig}\t{",".join(sorted(sourcefiles))}', get_timeout('test'))
+
+    def run_test_methods(self, test_class_sig, sourcefiles=None):
+        """
+        Run a single, already compiled, test class and split the coverage per test method.
+
+        Returns:
+            dict: {"result", "tests", "methods": {method: {"result", "coverage"}}, "stdout", "stderr"}, 或者 {"error"}；
+                  runner 已经退出时返回 None
+        """
+        if sourcefiles is None:
+            return self._request(f'RUNEACH\t{test_class_sig}', get_timeout('test'))
+        return self._request(f'RUNEACH\t{test_class_sig}\t{",".join(sorted(sourcefiles))}', get_timeout('test'))
+
+    def run_test_suite(self, test_class_sigs, sourcefiles=None):
+        """
+        Run several already compiled test classes in one launcher execution, splitting the coverage per test class.
+
+        Returns:
+            dict: {"result", "tests", "classes": {test class: {"result", "coverage"}}, "missing", "stdout", "stderr"},
+                  或者 {"error"}；runner 已经退出时返回 None
+        """
+        if sourcefiles is None:
+            return self._request(f'RUNSUITE\t{",".join(test_class_sigs)}', get_timeout('suite'))
+        return self._request(f'RUNSUITE\t{",".join(test_class_sigs)}\t{",".join(sorted(sourcefiles))}', get_timeout('suite'))
+
+    def close(self):
+        if self.process is not None:
+            if self.is_alive():
+                try:
+                    self.process.stdin.write('QUIT\n')
+                    self.process.stdin.flush()
+                    self.process.wait(timeout=10)
+                except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+                    kill_process_group(self.process)
+                    self.process.wait()
+            self.process = None
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+
+def get_jacoco_cli_jar(project_root):
+    '''jacoco cli (nodeps)，用于在 mvn 路径下直接分析 jacoco.exec；解析失败时返回 None'''
+    lib_dir = os.path.join(get_runner_dir(), 'lib')
+    cli_jar = os.path.join(lib_dir, f'org.jacoco.cli-{JACOCO_VERSION}-nodeps.jar')
+    if not os.path.exists(cli_jar):
+        os.makedirs(lib_dir, exist_ok=True)
+        run_mvn_dependency_copy(project_root, f'org.jacoco:org.jacoco.cli:{JACOCO_VERSION}:jar:nodeps', lib_dir)
+    return cli_jar if os.path.exists(cli_jar) else None
+
+
+def start_test_runner(project_root):
+    runner_dir = get_runner_dir()
+    lib_dir = os.path.join(runner_dir, 'lib')
+    os.makedirs(lib_dir, exist_ok=True)
+    project_key = _project_key(project_root)
+
+    classpath_file = os.path.join(runner_dir, f'{project_key}.classpath')
+    if os.path.exists(classpath_file):
+        os.remove(classpath_file)
+    run_mvn_build_classpath(project_root, classpath_file)
+    if not os.path.exists(classpath_file):
+        raise RuntimeError(f'Failed to resolve the test classpath of {project_root}')
+    with open(classpath_file, 'r', encoding='utf-8') as f:
+        dependency_classpath = [i for i in f.read().strip().split(os.pathsep) if i != '']
+
+    agent_jar, tool_jars = _resolve_runner_tools(project_root, dependency_classpath, lib_dir)
+
+    runner_classes_dir = os.path.join(runner_dir, 'classes')
+    _compile_runner(dependency_classpath + tool_jars, runner_classes_dir)
+
+    # target/test-classes 不放在 classpath 上，由 runner 每次请求单独加载
+    classpath = [runner_classes_dir, os.path.join(project_root, 'target', 'classes')] + dependency_classpath + tool_jars
+    scratch_dir = os.path.join(runner_dir, 'scratch', project_key)
+    runner = TestRunnerService(project_root, classpath, agent_jar, scratch_dir, os.path.join(runner_dir, f'{project_key}.log'))
+    runner.start()
+    return runner
+
+
+def get_test_runner(project_root):
+    """
+    返回 project_root 对应的常驻 runner，必要时启动；配置关闭或者启动失败时返回 None，由调用方退回到 mvn
+    """
+    if CONFIG.get('test_backend', 'runner') != 'runner':
+        return None
+    with _RUNNERS_LOCK:
+        if project_root in _UNAVAILABLE:
+            return None
+        runner = _RUNNERS.get(project_root)
+        if runner is not None and runner.is_alive():
+            return runner
+        if runner is not None:
+            runner.close()
+        try:
+            logger.debug(f"Starting test runner for {project_root}")
+            runner = start_test_runner(project_root)
+        except Exception as e:
+            logger.warning(f"Test runner unavailable for {project_root}, falling back to maven: {e}")
+            _UNAVAILABLE.add(project_root)
+            return None
+        _RUNNERS[project_root] = runner
+        return runner
+
+
+def close_test_runner(project_root):
+    '''项目重新编译之后 runner 已经加载的类会过期，关闭后下次使用时重新启动'''
+    with _RUNNERS_LOCK:
+        runner = _RUNNERS.pop(project_root, None)
+        if runner is not None:
+            runner.close()
+
+
+def shutdown_test_runners():
+    with _RUNNERS_LOCK:
+        for runner in _RUNNERS.values():
+            runner.close()
+        _RUNNERS.clear()
+
+atexit.register(shutdown_test_runners)
+
+
+def format_failures(tests):
+    failures = [i for i in tests if i['status'] == 'FAILED']
+    report = [f"Tests run: {len([i for i in tests if i['status'] != 'SKIPPED'])}, Failures: {len(failures)}"]
+    for test in failures:
+        report.append(f"{test['name']} ({test['id']})\n{test['trace'] or ''}")
+    return '\n'.join(report)
+
+
+def format_diagnostics(diagnostics):
+    '''按照 maven-compiler-plugin 的格式输出 javac 诊断信息，和 mvn 的编译输出保持一致'''
+    lines = []
+    for diagnostic in diagnostics:
+        level = 'ERROR' if diagnostic['kind'] == 'ERROR' else 'WARNING'
+        lines.append(f"[{level}] {diagnostic['source']}:[{diagnostic['line']},{diagnostic['column']}] {diagnostic['message']}")
+    return '\n'.join(lines)
+
+
+def _compile_with_runner(runner, directory, test_root_dir, test_class):
+    """
+    用 runner 中常驻的 javac 只编译当前生成的测试类，没有可用编译器时退回到 mvn test-compile；
+    编译超时时记为编译失败，不再用 mvn 重新编译
+
+    Returns:
+        success, stdout, stderr, diagnostics
+    """
+    response = runner.compile_test_source(get_test_class_path(directory, test_root_dir, test_class))
+    if response is None:
+        return None
+    if response.get('timeout'):
+        logger.warning(f"Test runner timed out compiling {test_class}")
+        return False, '', response['error'], None
+    if 'error' in response:
+        mvn_stdout, mvn_stderr = run_mvn_test_compile(directory)
+        return "BUILD SUCCESS" in mvn_stdout, mvn_stdout, mvn_stderr, None
+    return response['success'], format_diagnostics(response['diagnostics']), response['output'], response['diagnostics']
+
+
+def run_runner_test(args):
+    """
+    run_mvn_test_no_clean 的替代实现：单独编译生成的测试类之后交给常驻 runner 执行
+
+    Args:
+        args: (directory, test_root_dir, test_class, sourcefiles)，sourcefiles 为 None 时收集整个项目的覆盖率
+
+    Returns:
+        dict: 和 run_mvn_test_no_clean 相同的结果，另外带有 coverage、tests 以及 diagnostics；runner 不可用时返回 None
+    """
+    directory, test_root_dir, test_class, sourcefiles = args
+    runner = get_test_runner(directory)
+    if runner is None:
+        return None
+
+    compile_result = _compile_with_runner(runner, directory, test_root_dir, test_class)
+    if compile_result is None:
+        return None
+    compiled, compile_stdout, compile_stderr, diagnostics = compile_result
+    if not compiled:
+        return {
+            "directory": directory,
+            "test_class": test_class,
+            "test_method": None,
+            "result": "Failed Compilation",
+            "stdout": compile_stdout,
+            "stderr": compile_stderr,
+            "coverage": None,
+            "diagnostics": diagnostics,
+        }
+
+    response = runner.run_test_class(test_class, sourcefiles)
+    if response is not None and response.get('timeout'):
+        # 交给 mvn 重新执行同样会超时，直接记为 Timeout
+        logger.warning(f"Test runner timed out on {test_class}")
+        return {
+            "directory": directory,
+            "test_class": test_class,
+            "test_method": None,
+            "result": "Timeout",
+            "stdout": compile_stdout,
+            "stderr": response['error'],
+            "coverage": None,
+            "diagnostics": diagnostics,
+        }
+    if response is None or 'error' in response:
+        logger.warning(f"Test runner failed on {test_class}, falling back to maven: {response.get('error') if response else 'runner exited'}")
+        return None
+
+    return {
+        "directory": directory,
+        "test_class": test_class,
+        "test_method": None,
+        "result": response['result'],
+        "stdout": response['stdout'] + '\n' + format_failures(response['tests']),
+        "stderr": response['stderr'],
+        "coverage": parse_coverage_json(response['coverage']),
+        "tests": response['tests'],
+        "diagnostics": diagnostics,
+    }
+
+
+def run_runner_suite(project_root, test_class_sigs):
+    """
+    在常驻 runner 中一次执行多个已经编译好的测试类，按测试类拆分结果
+
+    Returns:
+        dict: 测试类 -> {"result", "coverage"}，无法加载的测试类不在其中；runner 不可用或者执行失败时返回 None
+    """
+    runner = get_test_runner(project_root)
+    if runner is None:
+        return None
+    response = runner.run_test_suite(test_class_sigs)
+    if response is None or 'error' in response:
+        logger.warning(f"Test runner failed on the test suite of {project_root}: {response.get('error') if response else 'runner exited'}")
+        return None
+    if response['missing']:
+        logger.debug(f"Test classes not found in target/test-classes: {response['missing']}")
+    return {
+        test_class: {
+            "result": class_result['result'],
+            "coverage": parse_coverage_json(class_result['coverage']),
+        }
+        for test_class, class_result in response['classes'].items()
+    }
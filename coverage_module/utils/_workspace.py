@@ -0,0 +1,73 @@
+import os
+import shutil
+import sys
+import threading
+
+sys.path.extend([".", ".."])
+from data.Config import CONFIG, code_base, logger
+
+
+# 并行执行时保护共享的 Method / Class / TestProgram 状态 (覆盖率、策略、调用关系)，以及结果文件的写入。
+# 只在读写这些状态时持有，调用大模型和执行测试时释放。单线程时没有竞争，开销可以忽略。
+STATE_LOCK = threading.RLock()
+
+# 不进入 workspace 的目录：target 由每个 worker 自己构建
+SKIPPED_DIRS = {'target', '.git', '.idea', '.svn'}
+# 会被原地改写的文件需要复制，不能和原项目共享 inode；pom.xml 不再被改写 (mvn 使用 prepare_pom 生成的副本)
+COPIED_FILES = set()
+
+
+def get_workspace_root():
+    return CONFIG.get('workspace_dir', os.path.join(code_base, 'data', 'workspaces'))
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # 跨文件系统或者不支持硬链接时退回到复制
+        shutil.copy2(src, dst)
+
+
+def create_workspace(project_root, workspace_path, copied_dirs=()):
+    """
+    Clone the project under test into workspace_path as a cheap copy-on-write tree.
+
+    源码等只读文件使用硬链接；copied_dirs 中的目录
+    (例如测试源码目录，生成的测试类会写在这里) 复制一份；target 不复制，由 worker 自己构建。
+
+    Args:
+        project_root (str): 原项目路径
+        workspace_path (str): workspace 路径，已经存在时会被重新创建
+        copied_dirs (Iterable[str]): 相对 project_root 的、需要完整复制的目录
+    """
+    if os.path.exists(workspace_path):
+        shutil.rmtree(workspace_path)
+    copied_dirs = [os.path.normpath(i) for i in copied_dirs]
+    for root, dirs, files in os.walk(project_root):
+        dirs[:] = [i for i in dirs if i not in SKIPPED_DIRS]
+        rel_root = os.path.relpath(root, project_root)
+        target_root = os.path.normpath(os.path.join(workspace_path, rel_root))
+        os.makedirs(target_root, exist_ok=True)
+        copy_all = any(rel_root == i or rel_root.startswith(i + os.sep) for i in copied_dirs)
+        for file_name in files:
+            src = os.path.join(root, file_name)
+            dst = os.path.join(target_root, file_name)
+            if copy_all or file_name in COPIED_FILES or os.path.islink(src):
+                shutil.copy2(src, dst, follow_symlinks=False)
+            else:
+                _link_or_copy(src, dst)
+    logger.debug(f"Created workspace {workspace_path}")
+    return workspace_path
+
+
+def create_workspaces(project_name, project_root, count, copied_dirs=()):
+    '''为每个 worker 创建一个独立的 workspace，返回路径列表'''
+    workspace_root = get_workspace_root()
+    os.makedirs(workspace_root, exist_ok=True)
+    return [create_workspace(project_root, os.path.join(workspace_root, f'{project_name}_w{i}'), copied_dirs) for i in range(count)]
+
+
+def remove_workspaces(workspaces):
+    for workspace_path in workspaces:
+        shutil.rmtree(workspace_path, ignore_errors=True)
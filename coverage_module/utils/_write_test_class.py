@@ -14,6 +14,12 @@ def _write_content_to_file(file_path, content):
         file.write(content)
 
 
+def get_test_class_path(project_root, test_root_dir, test_class_sig):
+    '''测试类源文件在项目中的路径'''
+    class_name = test_class_sig.split('.')[-1]
+    package_name = test_class_sig[:-len(class_name) - 1]
+    return os.path.join(project_root, test_root_dir, package_name.replace('.', os.sep), f"{class_name}.java")
+
 def write_test_class(project_root, test_root_dir, test_class_sig, test_class_content, log=False):
     # 获取实现文件内容
     implementation_content = test_class_content
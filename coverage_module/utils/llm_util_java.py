@@ -5,27 +5,26 @@ import random
 from data.Config import example_response, example_test, CONFIG
 from core.base_test_program import TestProgram
 from core.chatbot import ChatBot
-from utils._coverage_utils import get_coverage_data
+from utils._llm_cache import get_llm_cache
+from core.line_bitmap import bits_to_lines
 from utils._java_parser import parse_fields_from_class_code, parse_import_stmts_from_file_code
 
 
 def select_examples(target_function, all_programs):
     selected_examples = list()
-    line_range = set(target_function.line_range)
+    line_bits = target_function.line_bits
+    line_count = target_function.line_count()
 
     chosen_covered_lines = set()
     # find the test with highest cov rate
     for single_case in all_programs:
-        covered_all = get_coverage_data(single_case.coverage, target_function.belong_package.name, target_function.belong_file.file_name)
-        if not covered_all:
+        covered_bits = single_case.covered_line_bits(target_function.belong_package.name, target_function.belong_file.file_name)
+        if covered_bits is None:
             continue
-        case_cover = covered_all.get('coverage_line')
+        function_executed_bits = covered_bits & line_bits
+        function_executed_rate = function_executed_bits.bit_count() / line_count
         
-        executed_lines = set(case_cover)
-        function_executed_lines = executed_lines.intersection(line_range)
-        function_executed_rate = len(function_executed_lines) / len(line_range)
-        
-        single_case.set_single_func_cov_lines(function_executed_lines)
+        single_case.set_single_func_cov_lines(bits_to_lines(function_executed_bits))
         single_case.set_single_func_cov_rate(function_executed_rate)
     # 按cov从大到小排序
     sorted_by_cov = sorted(all_programs, key=lambda x: x.single_func_cov_rate)
@@ -381,7 +380,7 @@ def construct_prompt(single_target, all_conditions, direct_selected_examples, cl
     elif is_indirect_available:
         available_callee_chains = [i for i in single_target.using_callee_chains if i[0].direct_programs]
         chosen_chain = random.choice(available_callee_chains)
-        single_target.used_callee_chains.append(chosen_chain)
+        single_target.used_callee_chains.add(chosen_chain.chain_id)
         start_function = chosen_chain[0]
         
         # 注意这里用的是start_function的direct program
@@ -443,7 +442,7 @@ def invoke_llm(single_target, context, prompt, prompt_cache_dict, debugging_mode
     stage2_response = ''
     try:
         if not debugging_mode:
-            chat_bot = ChatBot(api_base=CONFIG['api_base'], model=CONFIG['model'], api_key=CONFIG['api_key'])
+            chat_bot = ChatBot(api_base=CONFIG['api_base'], model=CONFIG['model'], api_key=CONFIG['api_key'], cache=get_llm_cache(), timeout=CONFIG.get('llm_timeout', 120), max_retries=CONFIG.get('llm_max_retries', 4))
             stage1_prompt = construct_summarize_function_prompt_add_import(single_target, package_name, context)
             if stage1_prompt in prompt_cache_dict.keys():
                 stage1_response = prompt_cache_dict.get(stage1_prompt)
@@ -1,18 +1,24 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from queue import Queue
 
-import chardet
-
 from core.base_file import File
 from core.base_method import Method
 from core.base_package import Package
 from core.base_test_program import TestProgram
 from data.Config import CONFIG
-from utils._coverage_utils import analyze_method_signature_for_coverage, analyze_class_signature_for_coverage, update_coverage
-from utils._data_preparation import load_focal_method, load_java_tests, load_focal_class
-from utils._static_analysis_call_chaining import add_classes_and_methods_in_package, extract_called_functions, find_call_method, find_father_class, find_package_use_source_code, get_package_import
+from utils._coverage_utils import update_coverage
+from utils._data_preparation import focal_method_key, load_focal_class_index, load_focal_method_index, load_java_tests
+from utils._baseline_snapshot import get_baseline_snapshot
+from utils._analysis_cache import content_hash, get_analysis_cache, project_fingerprint
+from utils._encoding import decode_java_source
+from utils._method_index import build_method_index, get_method_index
+from utils._sourcefile_index import reset_sourcefile_indexes
+from utils._call_chains import build_call_chain_engine
+from utils._static_analysis_call_chaining import ParsedFile, apply_call_facts, apply_imports, attach_nodes, build_classes_and_methods_from_facts, collect_call_facts, extract_called_functions, extract_file_facts, find_call_method, set_father_class_name
 from utils._write_test_class import clear_test_class, save_test_class, write_test_class
-from utils.test_excute_utils import write_test_class_and_execute
+from utils.test_excute_utils import execute_existing_suite, write_test_class_and_execute
 
 from data.Config import logger, CONFIG
 
@@ -28,34 +34,98 @@ def find_java_files(directory):
 
     return java_files
 
-def get_packages(project_path, src_path):
+
+def _extract_java_source(raw_data, encoding=None, keep_tree=True):
+    '''
+    解码并提取单个文件的静态分析结果，可以在子进程中执行。
+    返回 (源码, 分析结果, ParsedFile, 解码时的异常)；keep_tree 为 False 时不返回 ParsedFile (tree-sitter 的结点不能 pickle)。
+    '''
+    try:
+        java_content, encoding = decode_java_source(raw_data, encoding)
+    except Exception as e:
+        return None, None, None, e
+    parsed_file = ParsedFile(java_content)
+    facts = extract_file_facts(parsed_file)
+    facts['encoding'] = encoding
+    return java_content, facts, parsed_file if keep_tree else None, None
+
+
+def _extract_java_sources(raw_datas, encoding, workers):
+    '''workers 大于 1 时用进程池并行提取；结果的顺序和输入一致，与 worker 数量无关'''
+    if workers <= 1 or len(raw_datas) <= 1:
+        return [_extract_java_source(raw_data, encoding) for raw_data in raw_datas]
+    chunksize = max(1, len(raw_datas) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_extract_java_source, raw_datas, repeat(encoding), repeat(False), chunksize=chunksize))
+
+
+def get_packages(project_path, src_path, workers=None, encoding=None):
+    '''
+    workers: 提取单个文件分析结果的进程数，None 时读取配置中的 analysis_workers (默认 1，不使用进程池)
+    encoding: 源码不是 utf-8 时优先尝试的编码，通常来自 path_mappings 中项目的 encoding
+    '''
+    if workers is None:
+        workers = CONFIG.get('analysis_workers', 1)
     all_files = []
     all_packages_map = {}
     method_map = {} 
     class_map = {}
+    # 每个文件对应的 (相对路径, File, 静态分析的结果, Class 列表, Method 列表)
+    file_records = []
+    file_hashes = {}
+    # 这次解析过的文件，调用分析需要结点时直接复用，不再解析第二次；进程池中解析的文件需要在调用分析时重新解析
+    parsed_files = {}
     
     #获取所有的类和方法
     all_package_path = os.path.join(project_path, src_path)
-    java_files = find_java_files(all_package_path)
+    # 按文件内容的 hash 缓存每个文件的分析结果 (包括解码使用的编码)，内容不变的文件不需要再检测编码和解析
+    analysis_cache = get_analysis_cache(all_package_path)
+    # 排序之后文件的处理顺序不依赖文件系统
+    java_files = sorted(find_java_files(all_package_path))
+    sources = []
     for java_path in java_files:
         try:
             with open(java_path, 'rb') as file:
                 raw_data = file.read()
-            # 检测文件编码
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-            java_content = raw_data.decode(encoding)
-        except UnicodeDecodeError as e:
-            print(f"UnicodeDecodeError: {e}")
-            continue
         except Exception as e:
             print(f"An error occurred: {e}")
             continue
-        
-        package_name = find_package_use_source_code(java_content)
+        file_hash = content_hash(raw_data)
+        facts = analysis_cache.get_file_facts(file_hash) if analysis_cache is not None else None
+        sources.append((java_path, raw_data, file_hash, facts))
+    
+    # 没有命中缓存的文件之间互不依赖，可以并行地解码和解析
+    missing = [raw_data for java_path, raw_data, file_hash, facts in sources if facts is None]
+    extracted = iter(_extract_java_sources(missing, encoding, workers))
+    if missing:
+        logger.debug(f"Extracted {len(missing)} of {len(sources)} java files with {workers} analysis workers")
+    
+    for java_path, raw_data, file_hash, facts in sources:
+        parsed_file = None
+        if facts is not None:
+            try:
+                java_content = raw_data.decode(facts['encoding'])
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                continue
+        else:
+            java_content, facts, parsed_file, error = next(extracted)
+            if error is not None:
+                if isinstance(error, UnicodeDecodeError):
+                    print(f"UnicodeDecodeError: {error}")
+                else:
+                    print(f"An error occurred: {error}")
+                continue
+            if analysis_cache is not None:
+                analysis_cache.put_file_facts(file_hash, facts)
+        package_name = facts['package']
         
         if not package_name:
             continue 
+        rel_path = os.path.relpath(java_path, all_package_path)
+        file_hashes[rel_path] = file_hash
+        if parsed_file is not None:
+            parsed_files[rel_path] = parsed_file
         
         single_package_path = package_name.replace('.', os.path.sep)
         single_package_path = os.path.join(all_package_path, single_package_path)
@@ -71,14 +141,14 @@ def get_packages(project_path, src_path):
         all_files.append(single_file)
         
         # 初步分析类和方法，没有处理调用关系
-        add_classes_and_methods_in_package(single_package, java_content, single_file)
+        classes, methods = build_classes_and_methods_from_facts(single_package, single_file, facts, java_content.encode('utf8'))
+        file_records.append((rel_path, single_file, facts, classes, methods))
 
     all_packages = list(all_packages_map.values())
     
     #获取了每个文件的import，这一步放在这里是因为需要先分析所有的类里面的的方法，方便处理import *的情况
-    for single_file in all_files:
-        java_content = single_file.content
-        get_package_import(single_file, java_content, all_packages)
+    for rel_path, single_file, facts, classes, methods in file_records:
+        apply_imports(single_file, facts['imports'], all_packages_map)
         
         for classs in single_file.belong_package.classes:
             single_file.import_map[classs.name_no_package] = classs.name
@@ -110,9 +180,9 @@ def get_packages(project_path, src_path):
                 method.set_method_signature()
                 
     #处理父子类
-    for single_file in all_files:
-        for classs in single_file.classes:
-            find_father_class(classs.node, classs)
+    for rel_path, single_file, facts, classes, methods in file_records:
+        for classs, class_facts in zip(classes, facts['classes']):
+            set_father_class_name(classs, class_facts['superclass'])
                 
     for single_file in all_files:
         for classs in single_file.classes:
@@ -151,111 +221,65 @@ def get_packages(project_path, src_path):
     
     all_packages = list(all_packages_map.values())  
     
-    # 处理每一个method的行范围
+    # 每一个method的行范围在 build_classes_and_methods_from_facts 中已经设置
     for single_package in all_packages:
         for method in single_package.methods:
-            method_node = method.node
-            for i in range(method_node.start_point[0], method_node.end_point[0] + 1):
-                method.line_range.add(i + 1)
-                method.line_number.add(str(i + 1))
             name = method.name
             arguments_list = tuple(method.parameters_list)
             method_map[(name, arguments_list)]= method
     
-    # 处理每一个method的调用关系
-    for single_package in all_packages: 
-        find_call_method(single_package, method_map, class_map)
-        package_name = single_package.name
+    # 处理每一个method的调用关系，依赖整个项目的类和方法，只有所有文件都没有变化时才能复用缓存
+    fingerprint = project_fingerprint(file_hashes)
+    call_facts = analysis_cache.get_calls(fingerprint) if analysis_cache is not None else None
+    if call_facts is not None:
+        for rel_path, single_file, facts, classes, methods in file_records:
+            apply_call_facts(classes, methods, call_facts[rel_path])
+    else:
+        for rel_path, single_file, facts, classes, methods in file_records:
+            single_file.parsed_file = attach_nodes(parsed_files.get(rel_path, single_file.content), classes, methods, facts)
+        for single_package in all_packages: 
+            find_call_method(single_package, method_map, class_map)
+            package_name = single_package.name
+        if analysis_cache is not None:
+            analysis_cache.put_calls(fingerprint, {rel_path: collect_call_facts(classes, methods) for rel_path, single_file, facts, classes, methods in file_records})
+    if analysis_cache is not None:
+        analysis_cache.save()
 
     all_packages = list(all_packages_map.values()) 
     return all_packages, method_map, class_map
 
-def find_all_chains(start_node, visited=None, path=None, depth=0, max_depth=10):
-    if visited is None:
-        visited = set()
-    if path is None:
-        path = [start_node]
-
-    # Stop the recursion if the max depth is reached
-    if depth > max_depth:
-        return []
-    
-    # path = path + [start_node]
-    visited.add(start_node)
-    start_node.set_target()
-    
-    all_paths = []
-
-    for next_node in start_node.called_methods:
-        # print(f"{start_node.name} -> {next_node.name}")
-        if next_node not in visited:
-            new_paths = find_all_chains(next_node, visited | {next_node}, path + [next_node], depth + 1, max_depth)
-            # tmp_path = path + [start_node]
-            tmp_path = path + [next_node]
-            next_node.add_callee_chain(tmp_path)
-            all_paths.extend(new_paths)
-        else:
-            # Detect cycle - stop the path here to avoid infinite loop
-            cycle_index = path.index(next_node)
-            # tmp_path = path + [start_node]
-            tmp_path = path[:cycle_index] + [next_node]
-            next_node.add_callee_chain(tmp_path)
-            all_paths.append(path)
-    
-    # 如果 start_node.called_methods 是空的，添加当前路径
-    if not start_node.called_methods:
-        all_paths.append(path)
-        
-    return all_paths
-
 def setup_single_package(all_methods_in_package, method_map, class_map):
+    method_index = get_method_index(method_map, class_map)
     for single_method in all_methods_in_package:
         for name_and_arguments_list in single_method.called_method_name:
-            called_methods = []
-            if name_and_arguments_list in method_map:
-                called_methods = [method_map[name_and_arguments_list]]
             # 粗粒度 已经实现对于名字相同的方法，通过参数列表长度锁定
-            else:
-                called_class_name = '.'.join(name_and_arguments_list[0].split('.')[:-1])
-                called_class = class_map.get(called_class_name)
-                if called_class is None:
-                    continue
-                method_name = name_and_arguments_list[0]
-                arguments_list = list(name_and_arguments_list[1])
-                arguments_list_len = len(arguments_list)
-                called_methods = []
-                for maybe_method in called_class.methods:
-                    if method_name == maybe_method.name and arguments_list_len == len(maybe_method.parameters_list):
-                        called_methods.append(maybe_method)
-                    
+            called_methods = method_index.resolve(name_and_arguments_list)
+            if not called_methods:
+                continue
+            called_class = method_index.owner_class(name_and_arguments_list[0])
             for called_method in called_methods:
                 single_method.add_called_method(called_method)
                 called_method.add_callee_method(single_method)
-                called_class_name = '.'.join(name_and_arguments_list[0].split('.')[:-1])
-                called_class = class_map.get(called_class_name)
                 single_method.add_called_method_and_class(single_method, called_class)
                         
 
         for name_and_arguments_list in single_method.branch_related_called_methods_name:
-            branch_related_called_method = None
-            if name_and_arguments_list in method_map:
-                branch_related_called_method = method_map[name_and_arguments_list]
+            branch_related_called_method = method_index.get(name_and_arguments_list)
                 
             if branch_related_called_method is not None:
                 single_method.add_branch_related_called_method(branch_related_called_method)
-                branch_related_called_class_name = '.'.join(name_and_arguments_list[0].split('.')[:-1])
-                branch_related_called_class = class_map.get(branch_related_called_class_name)
+                branch_related_called_class = method_index.owner_class(name_and_arguments_list[0])
                 single_method.add_branch_related_called_methods_and_class(branch_related_called_method, branch_related_called_class)
 
-    for single_method in all_methods_in_package:
-        paths_from_single_func = find_all_chains(single_method)
-        for i in paths_from_single_func:
-            if len(i[1:]) != 0:
-                single_method.add_called_chain(i[1:])
-    pass
+    # 调用链不再为每个方法预先枚举，由 CallChainEngine 在选择策略时按需生成
+    engine = build_call_chain_engine(all_methods_in_package)
+    # 和之前一样，从这些方法出发能调用到的方法都作为目标
+    for single_method in engine.reachable:
+        single_method.set_target()
 
 
 def setup_existing_cases(all_methods_in_package, project_name, all_packages, method_map, class_map, debugging_mode=False):
+    '''执行已有的测试并更新覆盖率；返回是否每个已有测试都得到了覆盖率 (否则基线不完整，不应保存快照)'''
     # projcet路径如下
     project_root = CONFIG['path_mappings'][project_name]['loc']
     test_root_dir = CONFIG['path_mappings'][project_name]['test']
@@ -268,16 +292,27 @@ def setup_existing_cases(all_methods_in_package, project_name, all_packages, met
     # test_packages = ['org.llm']
     # existing_cases_in_module = [i for i in existing_cases_in_module if '.'.join(i['test_class_sig'].split('.')[:-1]) in test_packages]
 
+    # 已有测试一次编译、一次执行，按测试类拆分覆盖率；不可用时逐个 mvn clean test
+    suite_results = None
+    if CONFIG.get('baseline_suite', True) and existing_cases_in_module:
+        suite_results = execute_existing_suite(project_root, [i['test_class_sig'] for i in existing_cases_in_module])
+
+    complete = True
     for index, test_info in enumerate(existing_cases_in_module):
         try:
             (project_root, test_root_dir, test_class_sig, test_content) = (test_info['project_root'], test_info['test_root_dir'], test_info['test_class_sig'], test_info['test_class'])
             
             coverage_data = None
-            result = write_test_class_and_execute(project_root, test_root_dir, test_class_sig, test_content, 'clean test', True)
-            coverage_data = result['coverage']
+            if suite_results is not None:
+                result = suite_results.get(test_class_sig)
+                coverage_data = result['coverage'] if result is not None else None
+            else:
+                result = write_test_class_and_execute(project_root, test_root_dir, test_class_sig, test_content, 'clean test', True)
+                coverage_data = result['coverage']
             
             if coverage_data is None:
                 logger.debug(f"Failed to execute test case {test_class_sig}")
+                complete = False
                 continue
             else:
                 logger.debug(f"Successfully executed test case {test_class_sig}")
@@ -288,7 +323,9 @@ def setup_existing_cases(all_methods_in_package, project_name, all_packages, met
             update_coverage(all_methods_in_package, method_map, class_map, new_test_case, case_called_functions)
         except Exception as e:
             print('异常提示:', e)  # 输出异常信息
+            complete = False
             continue 
+    return complete
 
 
 def setup_all_packages(project_name, all_packages, method_map, class_map, debugging_mode):
@@ -302,12 +339,23 @@ def setup_all_packages(project_name, all_packages, method_map, class_map, debugg
     logger.debug(f"Finish extracting context for {project_name}")
     
     logger.debug(f"Begin processing existing cases for {project_name}")
-    setup_existing_cases(all_methods_in_package, project_name, all_packages, method_map, class_map, debugging_mode)
+    # 源码和已有测试都没有变化时直接从快照恢复基线，不再执行已有的测试
+    snapshot = get_baseline_snapshot(project_name, debugging_mode)
+    if snapshot is None or not snapshot.restore(all_methods_in_package, class_map):
+        complete = setup_existing_cases(all_methods_in_package, project_name, all_packages, method_map, class_map, debugging_mode)
+        # 部分测试没有得到覆盖率 (runner 不可用、超时、编译失败等) 时不保存，下次运行重新执行
+        if snapshot is not None and complete:
+            snapshot.save(all_methods_in_package)
+        elif snapshot is not None:
+            logger.warning(f"Baseline of {project_name} is incomplete, not saving a snapshot")
     logger.debug(f"Finish processing existing cases for {project_name}")
 
 
-def analyze_project(project_name, debugging_mode=False):
-    all_packages, method_map, class_map = get_packages(CONFIG['path_mappings'][project_name]['loc'], CONFIG['path_mappings'][project_name]['src'])
+def analyze_project(project_name, debugging_mode=False, analysis_workers=None):
+    project_config = CONFIG['path_mappings'][project_name]
+    all_packages, method_map, class_map = get_packages(project_config['loc'], project_config['src'], analysis_workers, project_config.get('encoding'))
+    build_method_index(method_map, class_map)
+    reset_sourcefile_indexes()
     setup_all_packages(project_name, all_packages, method_map, class_map, debugging_mode)
     return all_packages, method_map, class_map
 
@@ -316,26 +364,27 @@ def get_callable_methods(project_name, single_package, collect_type):
     callable_methods = []
     all_methods_in_package = single_package.methods
     
+    # focal method / focal class 在整个项目中只读一次，按 (包名, 类名, ...) 建立索引，每个方法查一次即可
     if collect_type == 'method':
-        focal_method_sigs = load_focal_method(project_name, single_package.name)
+        focal_method_index = load_focal_method_index(project_name)
         for method in all_methods_in_package:
-            (_, _, class_name, _, method_name, parameter_tuple) = analyze_method_signature_for_coverage(method.signature)
-            for focal_method, method_head in focal_method_sigs:
-                (_, _, f_class_name, _, f_method_name, f_parameter_tuple) = analyze_method_signature_for_coverage(focal_method)
-                if class_name == f_class_name and method_name == f_method_name and len(parameter_tuple) == len(f_parameter_tuple):
-                    if method_head != "":
-                        method.test_head = method_head + '\n    @Test\n    public void testEmpty(){\n        assertTrue(True);\n    }\n}'
-                    callable_methods.append(method)
+            method_heads = focal_method_index.get(focal_method_key(method.signature))
+            if not method_heads:
+                continue
+            for method_head in method_heads:
+                if method_head != "":
+                    method.test_head = method_head + '\n    @Test\n    public void testEmpty(){\n        assertTrue(True);\n    }\n}'
+            callable_methods.append(method)
     elif collect_type == 'class':
-        focal_class_sigs = load_focal_class(project_name, single_package.name)
+        focal_class_index = load_focal_class_index(project_name)
         for method in all_methods_in_package:
-            (_, _, class_name, _, method_name, parameter_tuple) = analyze_method_signature_for_coverage(method.signature)
-            for focal_class, class_head in focal_class_sigs:
-                (_, _, f_class_name, _) = analyze_class_signature_for_coverage(focal_class)
-                if class_name == f_class_name:
-                    if class_head != "":
-                        method.test_head = method_head + '\n    @Test\n    public void testEmpty(){\n        assertTrue(True);\n    }\n}'
-                    callable_methods.append(method)
+            class_heads = focal_class_index.get(focal_method_key(method.signature)[:2])
+            if not class_heads:
+                continue
+            for class_head in class_heads:
+                if class_head != "":
+                    method.test_head = class_head + '\n    @Test\n    public void testEmpty(){\n        assertTrue(True);\n    }\n}'
+            callable_methods.append(method)
         
     else:
         callable_methods = [i for i in all_methods_in_package if i.is_target == True]
@@ -344,7 +393,7 @@ def get_callable_methods(project_name, single_package, collect_type):
         #     callable_methods = callable_methods[0 : 5]
         #     logger.info(f'Only run 5 focal methods.')
     
-    callable_methods = [ii for ii in callable_methods if len(ii.covered_lines) < len(ii.line_range)]
+    callable_methods = [ii for ii in callable_methods if ii.covered_count() < ii.line_count()]
     callable_methods = list(set(callable_methods))
     return callable_methods
 
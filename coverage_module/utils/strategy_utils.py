@@ -1,34 +1,18 @@
+from utils._call_chains import get_call_chain_engine
+
+
 def are_last_three_sets_same(lst):
     if len(lst) < 2:
         return False
     return lst[-1] == lst[-2]
 
-def find_shortest_chains(chains):
-    shortest_chains = list()
-    min_length = min(len(chain) for chain in chains)
-    shortest_chains = [chain for chain in chains if len(chain) == min_length]
-    
-    return shortest_chains
-
 def called_chain_filtering(single_func):
-    callee_chains = [i for i in single_func.callee_chains if i not in single_func.used_callee_chains]
-    # 处理callee_chains
-    startpoint_chains = {}
-    for chain in callee_chains:
-        startpoint = chain[0]  # 链的起点
-
-        if startpoint not in startpoint_chains:
-            startpoint_chains[startpoint] = []
-
-        startpoint_chains[startpoint].append(chain)
-
-    callee_chains.clear()
-    for chains_with_same_startpoint in startpoint_chains.values():
-        shortest_callee_chains = find_shortest_chains(chains_with_same_startpoint)
-        callee_chains.extend(shortest_callee_chains)
-        # 处理 shortest_callee_chain
-    # 注意这里用深拷贝
-    single_func.using_callee_chains = callee_chains
+    # 每个起点只保留最短的、还没有用过的调用链；调用链由 CallChainEngine 按需生成，短的在前
+    engine = get_call_chain_engine()
+    if engine is None:
+        single_func.using_callee_chains = []
+        return
+    single_func.using_callee_chains = engine.shortest_chains(single_func, exclude=single_func.used_callee_chains)
     
 
 def update_strategies(strtegies_rounds, single_target, direct_selected_examples):
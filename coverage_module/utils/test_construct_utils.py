@@ -102,6 +102,16 @@ def construct_test_class(single_target, total_imports, fields, setup_methods, cl
     
     return test_class_content, test_class_sig
 
+def construct_batch_test_class(single_target, total_imports, fields, setup_methods, classes, uts):
+    '''把同一次生成的多个测试方法放进同一个测试类，共享 imports、fields 和 setup'''
+    class_name = single_target.belong_class.name
+    diff_id = generate_random_string(16)
+    test_class_name = single_target.name_no_package + diff_id + 'BatchTest'
+    test_class_name = test_class_name[0].upper() + test_class_name[1:]
+    test_class_content, test_class_sig = assemble_single_ut_test_class_mvn(class_name, total_imports, setup_methods, fields, uts, classes, test_class_name)
+    
+    return test_class_content, test_class_sig
+
 def generate_random_string(length):
     '''生成随机字符串，表示diff_id'''
     characters = string.ascii_letters + string.digits  # 包含大写字母、小写字母和数字
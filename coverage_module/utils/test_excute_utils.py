@@ -1,55 +1,133 @@
 import copy
+import re
 import sys
 
 from utils._coverage_utils import update_coverage
+from utils._method_index import get_method_index
 from utils._output_analyser import assemble_single_ut_test_class_mvn
 from utils._static_analysis_call_chaining import extract_called_functions
-from utils.test_construct_utils import construct_test_class
+from utils.test_construct_utils import construct_batch_test_class, construct_test_class
 
 sys.path.extend([".", ".."])
 from core.base_test_program import TestProgram
+from data.Config import CONFIG
 from utils._write_test_class import *
 from utils._run_mvn_test import *
-from utils._analyze_jacoco_output import parse_coverage_xml
+from utils._analyze_jacoco_output import parse_coverage_json, parse_coverage_xml
+from utils._test_runner_service import close_test_runner, format_diagnostics, format_failures, get_jacoco_cli_jar, get_test_runner, run_runner_suite, run_runner_test
+from utils._jacoco_exec_reader import collect_exec_coverage
+from utils._fingerprint import source_tree_fingerprint
+from utils._workspace import STATE_LOCK
 
 
-def write_test_class_and_execute(project_root, test_root_dir, test_class_sig, test_class_content, type, existing=False):   
+def write_test_class_and_execute(project_root, test_root_dir, test_class_sig, test_class_content, type, existing=False, sourcefiles=None):   
+    '''sourcefiles 不为 None 时只收集这些源文件 (org/foo/Bar.java) 的覆盖率'''
     write_test_class(project_root, test_root_dir, test_class_sig, test_class_content)
     
+    # 优先交给常驻的 runner 执行，runner 不可用时退回到 mvn
+    result = None
+    if type == 'only test':
+        result = run_runner_test((project_root, test_root_dir, test_class_sig, sourcefiles))
+    if result is None:
+        result = run_mvn_and_collect_coverage(project_root, test_class_sig, type, sourcefiles)
+    
+    # 删除测试类
+    if not existing:
+        clear_test_class(project_root, test_root_dir, test_class_sig)
+    # logger.info(f"Report: {result['result']}")
+    
+    return result
+
+def run_mvn_and_collect_coverage(project_root, test_class_sig, type, sourcefiles=None):
+    # 只需要部分源文件时跳过 jacoco:report，直接分析 jacoco.exec
+    cli_jar = get_jacoco_cli_jar(project_root) if type == 'only test' and sourcefiles is not None else None
     if type == 'clean test':
         result = run_mvn_test((project_root, test_class_sig, None))
     elif type == 'only test':
-        result = run_mvn_test_no_clean((project_root, test_class_sig, None))
+        result = run_mvn_test_no_clean((project_root, test_class_sig, None), report=cli_jar is None)
     
-    if result['result'] == 'Passed':
-        coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'))
-    elif result['result'] == 'Failed Compilation':
+    if result['result'] == 'Passed' or result['result'] == 'Failed Execution':
+        if cli_jar is not None:
+            coverage_info = collect_exec_coverage(project_root, os.path.join(result['directory'], 'target/jacoco.exec'), sourcefiles, cli_jar)
+            if coverage_info is None:
+                run_mvn_jacoco_report(project_root)
+                coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'))
+        else:
+            coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'))
+    elif result['result'] == 'Failed Compilation' or result['result'] == 'Timeout':
         coverage_info = None
-    elif result['result'] == 'Failed Execution':
-        coverage_info = parse_coverage_xml(os.path.join(result['directory'], 'target/site/jacoco/jacoco.xml'))
     else:
         coverage_info = None
         raise NotImplementedError("Unknown result. Please check.")
     result['coverage'] = coverage_info
-    # 删除测试类
-    if not existing:
-        clear_test_class(project_root, test_root_dir, test_class_sig)
-    # logger.info(f"Report: {result['result']}")
-    
     return result
 
+# project_root -> (源码指纹, 上一次成功的编译结果)
+_BUILD_CACHE = {}
+
 def build_project(project_root):
-    '''mvn clean compile项目'''
+    '''mvn clean compile项目，源码没有变化并且 target/classes 还在时直接复用上一次的结果'''
+    fingerprint = source_tree_fingerprint(project_root)
+    cached = _BUILD_CACHE.get(project_root)
+    if cached is not None and cached[0] == fingerprint and os.path.isdir(os.path.join(project_root, 'target', 'classes')):
+        return cached[1]
+    
+    # clean 会删除 runner 正在使用的 target/classes
+    close_test_runner(project_root)
     mvn_stdout, mvn_stderr = run_mvn_compile(project_root)
     compile_result = {
         "compile": True if "BUILD SUCCESS" in mvn_stdout else False,
         "stdout": mvn_stdout,
         "stderr": mvn_stderr
     }
+    if compile_result['compile']:
+        _BUILD_CACHE[project_root] = (fingerprint, compile_result)
+    else:
+        _BUILD_CACHE.pop(project_root, None)
 
     return compile_result
 
-def process_test_case(single_target, all_packages, method_map, class_map, test_class_content, compile_res):
+def execute_existing_suite(project_root, test_class_sigs):
+    '''
+    项目中已有的测试类只编译一次，再在 runner 中一次执行，按测试类返回 {"result", "coverage"}；
+    编译失败或者 runner 不可用时返回 None，由调用方逐个执行
+    '''
+    if CONFIG.get('test_backend', 'runner') != 'runner':
+        return None
+    # clean 会删除 runner 正在使用的 target/classes
+    close_test_runner(project_root)
+    _BUILD_CACHE.pop(project_root, None)
+    mvn_stdout, _ = run_mvn_clean_test_compile(project_root)
+    if "BUILD SUCCESS" not in mvn_stdout:
+        logger.warning(f"Failed to compile the existing tests of {project_root}")
+        return None
+    return run_runner_suite(project_root, test_class_sigs)
+
+def get_coverage_sourcefiles(single_target, case_called_functions, method_map, class_map):
+    '''
+    update_coverage 只会用到待测函数所在包的源文件以及测试中调用到的函数所在的源文件，收集覆盖率时只需要这些
+    '''
+    sourcefiles = set()
+    def add_sourcefile(package, file):
+        if package is None or file is None:
+            return
+        package_dir = package.name.replace('.', '/')
+        sourcefiles.add(f'{package_dir}/{file.file_name}' if package_dir else file.file_name)
+
+    for file in single_target.belong_package.files:
+        add_sourcefile(single_target.belong_package, file)
+    method_index = get_method_index(method_map, class_map)
+    for func in case_called_functions:
+        called_function = method_index.get(func)
+        if called_function is not None:
+            add_sourcefile(called_function.belong_package, called_function.belong_file)
+            continue
+        # update_coverage 只会在所属类里找名字相同的方法，它们所在的文件就够了
+        for maybe_method in method_index.methods_by_name(method_index.owner_name(func[0]), func[0]):
+            add_sourcefile(maybe_method.belong_package, maybe_method.belong_file)
+    return sourcefiles
+
+def process_test_case(single_target, all_packages, method_map, class_map, test_class_content, compile_res, case_called_functions=None):
     compile_err = compile_res["stdout"]
     exec_err = compile_res["stderr"]
     is_compiled = False
@@ -62,7 +140,8 @@ def process_test_case(single_target, all_packages, method_map, class_map, test_c
         is_compiled = True
         if coverage is not None:
             new_test_case = TestProgram(content=test_class_content, target_function=single_target, coverage=coverage)
-            case_called_functions = extract_called_functions(test_class_content, all_packages, method_map, class_map)
+            if case_called_functions is None:
+                case_called_functions = extract_called_functions(test_class_content, all_packages, method_map, class_map)
             
             update_coverage(all_methods_in_package, method_map, class_map, new_test_case, case_called_functions, is_llm=True)
             
@@ -70,13 +149,214 @@ def process_test_case(single_target, all_packages, method_map, class_map, test_c
                 res = 'better!'
         else: # 执行错误，没有覆盖率
             pass   
+    elif compile_res["result"] == 'Timeout': # 执行超时，单独记录，不计入编译错误
+        is_compiled = True
+        res = 'Timeout'
     else: # 编译错误
         pass
     return compile_err, exec_err, is_compiled, res
 
 def compile_and_collect_coverage_test(single_target, project_root, test_root_dir, test_class_content, test_class_sig, all_packages, method_map, class_map):
     
-    compile_res = write_test_class_and_execute(project_root, test_root_dir, test_class_sig, test_class_content, 'only test')
-    compile_err, exec_err, is_compiled, res = process_test_case(single_target, all_packages, method_map, class_map, test_class_content, compile_res)
+    # 执行测试时不持有 STATE_LOCK，其余对共享状态的读写都需要加锁
+    with STATE_LOCK:
+        case_called_functions = extract_called_functions(test_class_content, all_packages, method_map, class_map)
+        sourcefiles = get_coverage_sourcefiles(single_target, case_called_functions, method_map, class_map)
+    compile_res = write_test_class_and_execute(project_root, test_root_dir, test_class_sig, test_class_content, 'only test', sourcefiles=sourcefiles)
+    with STATE_LOCK:
+        compile_err, exec_err, is_compiled, res = process_test_case(single_target, all_packages, method_map, class_map, test_class_content, compile_res, case_called_functions)
     return compile_err, exec_err, is_compiled, res
 
+TEST_METHOD_PATTERN = re.compile(r'\bvoid\s+(\w+)\s*\(')
+
+def _rename_test_method(ut, method_name, new_name):
+    return re.sub(r'\bvoid\s+' + re.escape(method_name) + r'\s*\(', lambda m: m.group(0).replace(method_name, new_name), ut, count=1)
+
+def _locate_uts(test_class_content, uts):
+    '''每个 ut 在组装后的测试类中所占的行号范围 (start, end)；组装时改动了某个 ut (找不到原文) 时返回 None'''
+    ranges = []
+    search_from = 0
+    for ut in uts:
+        pos = test_class_content.find(ut, search_from)
+        if pos == -1:
+            return None
+        start = test_class_content.count('\n', 0, pos) + 1
+        ranges.append((start, start + ut.count('\n')))
+        search_from = pos + len(ut)
+    return ranges
+
+def _failed_compilation(project_root, test_class_sig, diagnostics, output):
+    return {
+        "directory": project_root,
+        "test_class": test_class_sig,
+        "test_method": None,
+        "result": "Failed Compilation",
+        "stdout": format_diagnostics(diagnostics),
+        "stderr": output,
+        "coverage": None,
+        "diagnostics": diagnostics,
+    }
+
+def _recompile_single(runner, project_root, test_root_dir, test_class_content, test_class_sig):
+    '''
+    单独编译某个测试方法逐个执行时的测试类，得到和逐个执行时相同的编译结果 (行号、文件名都对应这个测试类)
+
+    Returns:
+        编译失败 (或超时) 的结果；单独编译能通过或者 runner 不可用时返回 None
+    '''
+    write_test_class(project_root, test_root_dir, test_class_sig, test_class_content)
+    response = runner.compile_test_source(get_test_class_path(project_root, test_root_dir, test_class_sig))
+    clear_test_class(project_root, test_root_dir, test_class_sig)
+    if response is not None and response.get('timeout'):
+        return _timed_out(project_root, test_class_sig, None, response['error'])
+    if response is None or 'error' in response or response['success']:
+        return None
+    return _failed_compilation(project_root, test_class_sig, response['diagnostics'], response['output'])
+
+def _timed_out(project_root, test_class_sig, test_method, error):
+    return {
+        "directory": project_root,
+        "test_class": test_class_sig,
+        "test_method": test_method,
+        "result": "Timeout",
+        "stdout": '',
+        "stderr": error,
+        "coverage": None,
+    }
+
+def batch_execute_test_cases(single_target, project_root, test_root_dir, total_imports, fields, setup_methods, classes, uts, sourcefiles, single_test_classes=None):
+    """
+    把同一次大模型回复中的所有测试方法放进一个测试类，只编译、执行一次，由 runner 按测试方法切分覆盖率。
+    编译错误位于某个测试方法内时，剔除这些方法后重试；错误位于共享部分 (imports、fields、setup 等) 时，
+    单独执行每个测试类同样会失败，所有测试方法都记为编译失败。
+    编译失败的测试方法用各自逐个执行时的测试类 (single_test_classes，[(content, sig)]，None 时重新生成) 单独再编译一次，
+    记录的编译错误和逐个执行时一致，而不是批量测试类中的行号。
+
+    Returns:
+        list: 和 uts 一一对应的执行结果，结构同 write_test_class_and_execute 的返回值；runner 不可用时返回 None
+    """
+    runner = get_test_runner(project_root)
+    if runner is None:
+        return None
+
+    # 同名的测试方法单独执行时互不影响，放进同一个类之前需要重命名
+    method_names = []
+    for ut in uts:
+        match = TEST_METHOD_PATTERN.search(ut)
+        if match is None:
+            return None
+        method_names.append(match.group(1))
+    batch_uts = []
+    batch_names = []
+    for ut, method_name in zip(uts, method_names):
+        new_name = method_name
+        suffix = 1
+        while new_name in batch_names:
+            suffix += 1
+            new_name = f'{method_name}_{suffix}'
+        batch_uts.append(ut if new_name == method_name else _rename_test_method(ut, method_name, new_name))
+        batch_names.append(new_name)
+
+    results = [None] * len(uts)
+    remaining = list(range(len(uts)))
+    test_class_sig = None
+    while remaining:
+        remaining_uts = [batch_uts[i] for i in remaining]
+        test_class_content, test_class_sig = construct_batch_test_class(single_target, total_imports, fields, setup_methods, classes, remaining_uts)
+        write_test_class(project_root, test_root_dir, test_class_sig, test_class_content)
+        response = runner.compile_test_source(get_test_class_path(project_root, test_root_dir, test_class_sig))
+        if response is not None and response.get('timeout'):
+            # runner 已经被杀掉，逐个重新编译同样会超时
+            logger.warning(f"Test runner timed out compiling {test_class_sig}")
+            clear_test_class(project_root, test_root_dir, test_class_sig)
+            for i in remaining:
+                results[i] = _timed_out(project_root, test_class_sig, batch_names[i], response['error'])
+            return results
+        if response is None or 'error' in response:
+            clear_test_class(project_root, test_root_dir, test_class_sig)
+            return None
+        if response['success']:
+            break
+        clear_test_class(project_root, test_root_dir, test_class_sig)
+
+        errors = [i for i in response['diagnostics'] if i['kind'] == 'ERROR']
+        located = _locate_uts(test_class_content, remaining_uts)
+        if located is None:
+            # 无法把编译错误对应到测试方法，交给逐个执行
+            logger.debug(f"Test methods not found verbatim in {test_class_sig}, executing test cases one by one")
+            return None
+        ut_ranges = list(zip(remaining, located))
+        failed = {}
+        shared_errors = []
+        for diagnostic in errors:
+            owner = next((i for i, (start, end) in ut_ranges if start <= diagnostic['line'] <= end), None)
+            if owner is None:
+                shared_errors.append(diagnostic)
+            else:
+                failed.setdefault(owner, []).append(diagnostic)
+        failed_indexes = remaining if shared_errors or not failed else list(failed)
+        logger.debug(f"Recompiling {len(failed_indexes)} test methods that do not compile on their own")
+        for i in failed_indexes:
+            if single_test_classes is not None:
+                single_content, single_sig = single_test_classes[i]
+            else:
+                single_content, single_sig = construct_test_class(single_target, total_imports, fields, setup_methods, classes, uts[i])
+            results[i] = _recompile_single(runner, project_root, test_root_dir, single_content, single_sig)
+            if results[i] is None:
+                # 单独编译能通过 (或者 runner 不可用)，批量的结果不可信，交给逐个执行
+                return None
+        if shared_errors or not failed:
+            return results
+        remaining = [i for i in remaining if i not in failed]
+
+    if not remaining:
+        return results
+    response = runner.run_test_methods(test_class_sig, sourcefiles)
+    clear_test_class(project_root, test_root_dir, test_class_sig)
+    if response is not None and response.get('timeout'):
+        # 不知道是哪个测试方法卡住了，逐个执行至少还要再等一次超时，剩下的方法都记为 Timeout
+        logger.warning(f"Test runner timed out on {test_class_sig}")
+        for i in remaining:
+            results[i] = _timed_out(project_root, test_class_sig, batch_names[i], response['error'])
+        return results
+    if response is None or 'error' in response:
+        logger.warning(f"Test runner failed on {test_class_sig}, executing test cases one by one")
+        return None
+
+    for i in remaining:
+        method_pattern = re.compile(r':' + re.escape(batch_names[i]) + r'\(')
+        method_tests = [t for t in response['tests'] if method_pattern.search(t['id'])]
+        method_result = response['methods'].get(batch_names[i])
+        results[i] = {
+            "directory": project_root,
+            "test_class": test_class_sig,
+            "test_method": batch_names[i],
+            # 没有执行 (例如被 @Disabled) 时和单独执行一样按失败处理
+            "result": method_result['result'] if method_result is not None else 'Failed Execution',
+            "stdout": response['stdout'] + '\n' + format_failures(method_tests),
+            "stderr": response['stderr'],
+            "coverage": parse_coverage_json(method_result['coverage'] if method_result is not None else {}),
+            "tests": method_tests,
+        }
+    return results
+
+def batch_compile_and_collect_coverage_tests(single_target, project_root, test_root_dir, total_imports, fields, setup_methods, classes, uts, all_packages, method_map, class_map):
+    """
+    batch_execute_test_cases 的包装：为每个 ut 生成和逐个执行时相同的测试类 (用于记录结果)，并分析其调用的函数。
+
+    Returns:
+        list: 每个 ut 对应 (test_class_content, test_class_sig, case_called_functions, compile_res)；不可用时返回 None
+    """
+    with STATE_LOCK:
+        single_test_classes = []
+        sourcefiles = set()
+        for single_ut in uts:
+            test_class_content, test_class_sig = construct_test_class(single_target, total_imports, fields, setup_methods, classes, single_ut)
+            case_called_functions = extract_called_functions(test_class_content, all_packages, method_map, class_map)
+            sourcefiles.update(get_coverage_sourcefiles(single_target, case_called_functions, method_map, class_map))
+            single_test_classes.append((test_class_content, test_class_sig, case_called_functions))
+    
+    batch_results = batch_execute_test_cases(single_target, project_root, test_root_dir, total_imports, fields, setup_methods, classes, uts, sourcefiles, [single[:2] for single in single_test_classes])
+    if batch_results is None:
+        return None
+    return [single + (compile_res,) for single, compile_res in zip(single_test_classes, batch_results)]
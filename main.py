@@ -12,6 +12,18 @@ def main(config):
         choices=["coverage", "refine", "defect"],
         help="Which module to run.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of targets processed in parallel by the coverage module, each in its own project workspace.",
+    )
+    parser.add_argument(
+        "--analysis-workers",
+        type=int,
+        default=None,
+        help="Number of processes used by the coverage module to parse source files during static analysis.",
+    )
     args = parser.parse_args()
 
     if args.module == "coverage":
@@ -19,7 +31,7 @@ def main(config):
         from coverage_module.starter_mvn import coverage_entry  # entry for coverage
         from coverage_module.collect_coverage import collect_cov  # utils for collect cov
 
-        coverage_entry()
+        coverage_entry(workers=args.workers, analysis_workers=args.analysis_workers)
         collect_cov()
 
     elif args.module == "refine":